@@ -0,0 +1,351 @@
+"""Binding overhead benchmarks: cycsound against the ctcsound reference.
+
+Measures the per-call cost of the most used API functions and the
+throughput of full offline renders, for each available backend, and
+optionally saves the results as JSON to compare runs:
+
+    python benchmarks/run.py --json results.json
+    python benchmarks/run.py --compare results.json   # exit 1 on regression
+
+ctcsound is imported if installed, otherwise loaded from docs/ctcsound.py
+(which requires numpy); it is skipped when neither works.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+TESTS = ROOT / "tests"
+
+ORC = """
+sr = 44100
+ksmps = 32
+nchnls = 2
+0dbfs = 1
+
+chn_k "amp", 3
+gitab ftgen 1, 0, 4096, 10, 1
+
+instr 1
+    kamp chnget "amp"
+    aout oscil kamp, 440
+    outs aout, aout
+endin
+
+instr 2
+endin
+"""
+
+SCORE = "i1 0 36000"
+# starts at the next k-cycle and ends within three, on the no-op instrument
+EVENT = [2, 0, 0.001, 1, 2, 3]
+# Events wait in Csound's sorted list until a k-cycle runs, so their cases
+# run a fixed number of calls per run, the list being flushed in between.
+EVENT_CASES = {"score_event"}
+EVENT_CALLS = 1000
+FLUSH_CYCLES = 3
+RENDERS = ["test1.csd", "diskgrain.csd"]
+
+
+class Backend:
+    """Adapter giving both bindings the same small interface."""
+
+    name = None
+
+    def create(self):
+        raise NotImplementedError
+
+    def prepare(self, cs):
+        """Compile the benchmark orchestra and start performing."""
+        raise NotImplementedError
+
+    def cases(self, cs):
+        """Returns {case name: callable} for a started instance."""
+        raise NotImplementedError
+
+    def flush(self, cs):
+        """Perform the k-cycles that dispatch and end pending events."""
+        raise NotImplementedError
+
+    def render(self, path):
+        """Render a CSD offline; returns the seconds of audio rendered."""
+        raise NotImplementedError
+
+
+class Cycsound(Backend):
+    name = "cycsound"
+
+    def __init__(self):
+        import cycsound
+        self.mod = cycsound
+
+    def create(self):
+        cs = self.mod.Csound()
+        cs.set_message_level(0)
+        for option in ("-n", "-d", "-m0"):
+            cs.set_option(option)
+        return cs
+
+    def prepare(self, cs):
+        cs.compile_orc(ORC)
+        cs.read_score(SCORE)
+        cs.start()
+
+    def cases(self, cs):
+        amp = cs.control_channel("amp")
+        cached = self.create()
+        cached.enable_orc_cache()
+        return {
+            "perform_ksmps": cs.perform_ksmps,
+            "set_control_channel": lambda: cs.set_control_channel("amp", 0.5),
+            "get_control_channel": lambda: cs.get_control_channel("amp"),
+            "get_control_channels": lambda: cs.get_control_channels(("amp",)),
+            "control_channel_handle_set": lambda: setattr(amp, "value", 0.5),
+            "control_channel_handle_get": lambda: amp.value,
+            "table_get": lambda: cs.table_get(1, 100),
+            "table_set": lambda: cs.table_set(1, 100, 0.5),
+            "score_event": lambda: cs.score_event("i", EVENT),
+            "compile_orc": lambda: cs.compile_orc("instr 3\nendin\n"),
+            "compile_orc_cached": lambda: cached.compile_orc("instr 3\nendin\n"),
+            "eval_code": lambda: cs.eval_code("return 1"),
+        }
+
+    def flush(self, cs):
+        for _ in range(FLUSH_CYCLES):
+            cs.perform_ksmps()
+
+    def render(self, path):
+        cs = self.mod.Csound()
+        cs.set_message_level(0)
+        cs.set_host_implemented_audio_io(1, 0)
+        for option in ("-d", "-m0", f"--env:SSDIR={path.parent}"):
+            cs.set_option(option)
+        cs.compile_csd(str(path))
+        cs.run()
+        seconds = cs.get_score_time()
+        cs.cleanup()
+        return seconds
+
+
+class Ctcsound(Backend):
+    name = "ctcsound"
+
+    def __init__(self):
+        try:
+            import ctcsound
+        except ImportError:
+            spec = importlib.util.spec_from_file_location(
+                "ctcsound", ROOT / "docs" / "ctcsound.py")
+            ctcsound = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(ctcsound)
+        self.mod = ctcsound
+
+    def create(self):
+        cs = self.mod.Csound()
+        cs.setMessageLevel(0)
+        for option in ("-n", "-d", "-m0"):
+            cs.setOption(option)
+        return cs
+
+    def prepare(self, cs):
+        cs.compileOrc(ORC)
+        cs.readScore(SCORE)
+        cs.start()
+
+    def cases(self, cs):
+        return {
+            "perform_ksmps": cs.performKsmps,
+            "set_control_channel": lambda: cs.setControlChannel("amp", 0.5),
+            "get_control_channel": lambda: cs.controlChannel("amp"),
+            "table_get": lambda: cs.tableGet(1, 100),
+            "table_set": lambda: cs.tableSet(1, 100, 0.5),
+            "score_event": lambda: cs.scoreEvent("i", EVENT),
+            "compile_orc": lambda: cs.compileOrc("instr 3\nendin\n"),
+            "eval_code": lambda: cs.evalCode("return 1"),
+        }
+
+    def flush(self, cs):
+        for _ in range(FLUSH_CYCLES):
+            cs.performKsmps()
+
+    def render(self, path):
+        cs = self.mod.Csound()
+        cs.setMessageLevel(0)
+        cs.setHostImplementedAudioIO(1, 0)
+        for option in ("-d", "-m0", f"--env:SSDIR={path.parent}"):
+            cs.setOption(option)
+        cs.compileCsd(str(path))
+        cs.start()
+        cs.perform()
+        seconds = cs.scoreTime()
+        cs.cleanup()
+        return seconds
+
+
+BACKENDS = {"cycsound": Cycsound, "ctcsound": Ctcsound}
+
+
+def time_call(func, repeat, min_time, setup=None, number=None):
+    """Returns (number of calls per run, per-call seconds of each run).
+
+    setup is called, untimed, before every run; number defaults to the
+    smallest power of two taking at least min_time.
+    """
+    timer = timeit.Timer(func, setup=setup or "pass")
+    if number is None:
+        number = 1
+        while True:
+            if timer.timeit(number) >= min_time:
+                break
+            number *= 2
+    runs = timer.repeat(repeat=repeat, number=number)
+    return number, [t / number for t in runs]
+
+
+def bench_calls(backend, args):
+    cs = backend.create()
+    backend.prepare(cs)
+    results = []
+    for name, func in backend.cases(cs).items():
+        if args.filter and args.filter not in name:
+            continue
+        if name in EVENT_CASES:
+            number, per_call = time_call(func, args.repeat, args.min_time,
+                                         setup=lambda: backend.flush(cs),
+                                         number=EVENT_CALLS)
+        else:
+            number, per_call = time_call(func, args.repeat, args.min_time)
+        results.append({
+            "backend": backend.name,
+            "name": name,
+            "kind": "call",
+            "number": number,
+            "min_ns": min(per_call) * 1e9,
+            "median_ns": statistics.median(per_call) * 1e9,
+        })
+        report(results[-1])
+    return results
+
+
+def bench_renders(backend, args):
+    results = []
+    for csd in RENDERS:
+        name = f"render:{csd}"
+        if args.filter and args.filter not in name:
+            continue
+        path = TESTS / csd
+        walls = []
+        seconds = 0.0
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            seconds = backend.render(path)
+            walls.append(time.perf_counter() - start)
+        results.append({
+            "backend": backend.name,
+            "name": name,
+            "kind": "render",
+            "audio_seconds": seconds,
+            "min_ns": min(walls) * 1e9,
+            "median_ns": statistics.median(walls) * 1e9,
+            "realtime_factor": seconds / min(walls) if min(walls) else 0.0,
+        })
+        report(results[-1])
+    return results
+
+
+def report(result):
+    line = (f"{result['backend']:<10} {result['name']:<28} "
+            f"{format_ns(result['min_ns']):>10} min {format_ns(result['median_ns']):>10} median")
+    if result["kind"] == "render":
+        line += f"  {result['realtime_factor']:.1f}x realtime"
+    print(line, flush=True)
+
+
+def format_ns(ns):
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.2f} {unit}"
+    return f"{ns:.0f} ns"
+
+
+def metadata():
+    meta = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+    try:
+        import cycsound
+        meta["csound_version"] = cycsound.get_version()
+    except ImportError:
+        pass
+    return meta
+
+
+def compare(results, baseline_path, threshold):
+    """Prints the ratio to a baseline; returns the regressed benchmarks."""
+    baseline = json.loads(Path(baseline_path).read_text())
+    previous = {(r["backend"], r["name"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nCompared to {baseline_path}:")
+    for result in results:
+        old = previous.get((result["backend"], result["name"]))
+        if old is None:
+            continue
+        ratio = result["min_ns"] / old["min_ns"] if old["min_ns"] else 1.0
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(result)
+        print(f"{result['backend']:<10} {result['name']:<28} {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["all", *BACKENDS], default="all")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="Minimum duration of one run, in seconds")
+    parser.add_argument("--no-render", action="store_true", help="Skip the render benchmarks")
+    parser.add_argument("--json", help="Save the results to this file")
+    parser.add_argument("--compare", help="Compare with the results saved in this file")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative slowdown reported as a regression (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    names = list(BACKENDS) if args.backend == "all" else [args.backend]
+    results = []
+    for name in names:
+        try:
+            backend = BACKENDS[name]()
+        except Exception as e:  # binding or libcsound not available
+            print(f"{name:<10} skipped: {e}", file=sys.stderr)
+            continue
+        results.extend(bench_calls(backend, args))
+        if not args.no_render:
+            results.extend(bench_renders(backend, args))
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(
+            {"meta": metadata(), "results": results}, indent=2) + "\n")
+        print(f"\nSaved {len(results)} results to {args.json}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
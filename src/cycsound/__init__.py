@@ -14,8 +14,23 @@ from cycsound._core import (
     # Enums (cpdef enums from Csound API)
     Status,
     FileType,
+    ChannelType,
     # Classes
     Csound,
+    CsoundPerformanceThread,
+    CsoundGroup,
+    AsyncCsound,
+    CsoundPool,
+    AudioBuffer,
+    FunctionTable,
+    ControlChannel,
+    AudioChannel,
+    CircularBuffer,
+    RingAudio,
+    MidiInputQueue,
+    MidiOutputCapture,
+    Tree,
+    SoundFileWriter,
 )
 
 __all__ = [
@@ -29,5 +44,20 @@ __all__ = [
     "Mask",
     "Status",
     "FileType",
+    "ChannelType",
     "Csound",
+    "CsoundPerformanceThread",
+    "CsoundGroup",
+    "AsyncCsound",
+    "CsoundPool",
+    "AudioBuffer",
+    "FunctionTable",
+    "ControlChannel",
+    "AudioChannel",
+    "CircularBuffer",
+    "RingAudio",
+    "MidiInputQueue",
+    "MidiOutputCapture",
+    "Tree",
+    "SoundFileWriter",
 ]
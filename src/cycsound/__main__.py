@@ -3,13 +3,20 @@ cycsound CLI - Command-line interface for Csound operations.
 
 Usage:
     cycsound play <file.csd>       Play a CSD file
-    cycsound render <file.csd>     Render CSD to audio file
+    cycsound render <file.csd>...  Render CSD files to audio files
     cycsound info                  Show Csound version info
     cycsound check <file.csd>      Validate a CSD file
+    cycsound bench <file.csd>      Measure performance without audio output
 """
 
 import argparse
+import glob
+import json
+import math
+import os
+import statistics
 import sys
+import time
 from pathlib import Path
 
 from cycsound import Csound, get_version, get_api_version
@@ -51,11 +58,8 @@ def cmd_play(args):
         print(f"Error: Failed to compile {csd_path}", file=sys.stderr)
         return 1
 
-    cs.start()
-
     try:
-        while not cs.perform_ksmps():
-            pass
+        cs.run()
     except KeyboardInterrupt:
         print("\nInterrupted by user")
 
@@ -63,26 +67,230 @@ def cmd_play(args):
     return 0
 
 
+_SAMPLE_TYPE_OPTIONS = {"float32": "-f", "int16": "-s", "int24": "-3"}
+
+
+def _render_job(csd_path, output_path, format=None, sample_rate=None, ksmps=None, quiet=True,
+                sample_type=None, native=False):
+    """Render one CSD file.
+
+    With native, the audio file is written by cycsound's SoundFileWriter
+    instead of Csound. Runs in a worker process for parallel renders.
+    Returns a tuple of (error message or None, seconds of audio rendered,
+    elapsed seconds).
+    """
+    start = time.perf_counter()
+    cs = Csound()
+
+    # Set options
+    if native:
+        cs.set_option("-n")  # Csound writes nothing, see render_to_file()
+    else:
+        cs.set_option(f"-o{output_path}")
+
+    if format and not native:
+        cs.set_option(f"--format={format}")
+
+    if sample_type and not native:
+        cs.set_option(_SAMPLE_TYPE_OPTIONS[sample_type])
+
+    if sample_rate:
+        cs.set_option(f"-r{sample_rate}")
+
+    if ksmps:
+        cs.set_option(f"-k{ksmps}")
+
+    if quiet:
+        _setup_quiet(cs)
+
+    # Compile and perform
+    if cs.compile_csd(str(csd_path)) != 0:
+        return f"Failed to compile {csd_path}", 0.0, time.perf_counter() - start
+
+    error = None
+    try:
+        if native:
+            cs.render_to_file(output_path, format=format, sample_type=sample_type or "int16")
+        elif cs.run() != 0:
+            error = f"Failed to render {csd_path}"
+    except (OSError, ValueError, RuntimeError) as e:
+        error = f"Failed to render {csd_path}: {e}"
+    finally:
+        seconds = cs.get_score_time()
+        cs.cleanup()
+
+    return error, seconds, time.perf_counter() - start
+
+
+def _render_inputs(args):
+    """Expand the render inputs (files, glob patterns and the manifest) into
+    a list of (csd path, output path or None) jobs.
+    """
+    inputs = []
+    for pattern in args.files:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else []
+        inputs.extend((Path(f), None) for f in matches or [pattern])
+
+    if args.manifest:
+        # one job per line: "input.csd [output]", paths relative to the manifest
+        manifest = Path(args.manifest)
+        for line in manifest.read_text().splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split("\t") if "\t" in line else line.split(None, 1)
+            csd_path = manifest.parent / parts[0].strip()
+            output = manifest.parent / parts[1].strip() if len(parts) > 1 else None
+            inputs.append((csd_path, output))
+
+    return inputs
+
+
+def _output_path(csd_path, output, args, batch):
+    """Determine the output filename of a render job."""
+    if output:
+        return output
+    if args.output and batch:
+        return Path(args.output) / csd_path.with_suffix(".wav").name
+    if args.output:
+        return args.output
+    return csd_path.with_suffix(".wav")
+
+
 def cmd_render(args):
-    """Render a CSD file to an audio file."""
-    csd_path = Path(args.file)
+    """Render one or more CSD files to audio files."""
+    try:
+        inputs = _render_inputs(args)
+    except OSError as e:
+        print(f"Error: Cannot read manifest: {e}", file=sys.stderr)
+        return 1
+
+    if not inputs:
+        print("Error: No CSD files to render", file=sys.stderr)
+        return 1
+
+    batch = len(inputs) > 1 or args.jobs != 1
+    if not batch:
+        return _render_single(inputs[0][0], _output_path(*inputs[0], args, False), args)
+
+    jobs = []
+    failed = 0
+    for csd_path, output in inputs:
+        if not csd_path.exists():
+            print(f"FAIL  {csd_path}: File not found", file=sys.stderr)
+            failed += 1
+        else:
+            jobs.append((csd_path, _output_path(csd_path, output, args, True)))
+
+    # e.g. a/x.csd and b/x.csd with -o DIR: the jobs would overwrite each other
+    seen = {}
+    for csd_path, output_path in jobs:
+        key = Path(output_path).resolve()
+        if key in seen:
+            print(f"Error: {seen[key]} and {csd_path} both render to {output_path}",
+                  file=sys.stderr)
+            return 1
+        seen[key] = csd_path
+
+    if args.output:
+        Path(args.output).mkdir(parents=True, exist_ok=True)
+
+    options = dict(format=args.format, sample_rate=args.sample_rate, ksmps=args.ksmps,
+                   sample_type=args.sample_type, native=args.native)
+    workers = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    total_seconds = 0.0
+    start = time.perf_counter()
+
+    try:
+        for (csd_path, output_path), (error, seconds, elapsed) in _run_render_jobs(
+                jobs, workers, options):
+            total_seconds += seconds
+            if error:
+                failed += 1
+                print(f"FAIL  {csd_path}: {error}", file=sys.stderr)
+            elif not args.quiet:
+                factor = seconds / elapsed if elapsed > 0 else 0.0
+                print(f"OK    {csd_path} -> {output_path} "
+                      f"({seconds:.2f}s in {elapsed:.2f}s, {factor:.1f}x realtime)")
+    except KeyboardInterrupt:
+        print("\nInterrupted by user", file=sys.stderr)
+        return 1
+
+    wall = time.perf_counter() - start
+    if not args.quiet:
+        factor = total_seconds / wall if wall > 0 else 0.0
+        print(f"Rendered {len(inputs) - failed}/{len(inputs)} files: "
+              f"{total_seconds:.2f}s of audio in {wall:.2f}s "
+              f"({factor:.1f}x realtime, -j {workers})")
+
+    return 1 if failed else 0
+
+
+def _run_render_jobs(jobs, workers, options):
+    """Yield ((csd path, output path), result) as render jobs complete,
+    using a pool of worker processes, each with its own Csound instance.
+    """
+    if workers == 1:
+        for job in jobs:
+            yield job, _render_job(*job, **options)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(jobs) or 1))
+    try:
+        futures = {pool.submit(_render_job, *job, **options): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:  # worker crashed
+                result = (str(e) or type(e).__name__, 0.0, 0.0)
+            yield futures[future], result
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _render_single(csd_path, output_path, args):
+    """Render a single CSD file in this process."""
     if not csd_path.exists():
         print(f"Error: File not found: {csd_path}", file=sys.stderr)
         return 1
 
-    # Determine output filename
-    if args.output:
-        output_path = args.output
-    else:
-        output_path = csd_path.with_suffix(".wav")
+    if not args.quiet:
+        print(f"Rendering: {csd_path} -> {output_path}")
 
-    cs = Csound()
+    try:
+        error, _, _ = _render_job(csd_path, output_path, args.format,
+                                  args.sample_rate, args.ksmps, args.quiet,
+                                  args.sample_type, args.native)
+    except KeyboardInterrupt:
+        print("\nInterrupted by user", file=sys.stderr)
+        return 1
+
+    if error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+
+    if not args.quiet:
+        print(f"Done: {output_path}")
+
+    return 0
+
+
+_BENCH_CHUNK = 1000  # k-cycles per perform_ksmps_n() call
+_BENCH_SAMPLES = 1 << 20  # k-cycle durations kept for the percentiles
 
-    # Set options
-    cs.set_option(f"-o{output_path}")
 
-    if args.format:
-        cs.set_option(f"--format={args.format}")
+def _bench_run(csd_path, args):
+    """Perform a CSD once, without audio output, timing every k-cycle.
+
+    Only the perform loop is timed, not creating and compiling the
+    instance. Returns a dict with the seconds of audio performed, the
+    wall and CPU time, the k-cycle statistics and durations, sr and ksmps.
+    """
+    cs = Csound()
+    cs.set_option("-n")  # No audio output
+    cs.set_host_implemented_audio_io(1, 0)  # ... even if the CSD asks for -odac
 
     if args.sample_rate:
         cs.set_option(f"-r{args.sample_rate}")
@@ -90,31 +298,131 @@ def cmd_render(args):
     if args.ksmps:
         cs.set_option(f"-k{args.ksmps}")
 
-    if args.quiet:
-        _setup_quiet(cs)
-    else:
-        print(f"Rendering: {csd_path} -> {output_path}")
+    _setup_quiet(cs)
 
-    # Compile and perform
-    result = cs.compile_csd(str(csd_path))
-    if result != 0:
-        print(f"Error: Failed to compile {csd_path}", file=sys.stderr)
+    if cs.compile_csd(str(csd_path)) != 0 or cs.start() != 0:
+        raise RuntimeError(f"Failed to compile {csd_path}")
+
+    limit = int(args.duration * cs.get_kr() + 0.5) if args.duration else -1
+    # k-cycles are timed in C; longer runs keep a uniform sample of them
+    cs.enable_cycle_stats(samples=limit if limit >= 0 else _BENCH_SAMPLES)
+    remaining = limit
+
+    try:
+        start_cpu = time.process_time()
+        start = time.perf_counter()
+        # the k-cycles run without the GIL, in chunks to allow Ctrl-C
+        while remaining != 0:
+            chunk = _BENCH_CHUNK if remaining < 0 else min(remaining, _BENCH_CHUNK)
+            done = cs.perform_ksmps_n(chunk)
+            remaining -= done if remaining > 0 else 0
+            if done < chunk:
+                break
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - start_cpu
+    finally:
+        seconds = cs.get_score_time()
+        sr, ksmps = cs.get_sr(), cs.get_ksmps()
+        stats = cs.get_cycle_stats()
+        cycles = cs.get_cycle_times()
+        cs.cleanup()
+
+    return dict(seconds=seconds, wall=wall, cpu=cpu, stats=stats, cycles=cycles,
+                sr=sr, ksmps=ksmps)
+
+
+def _percentile(values, q):
+    """Nearest-rank percentile of a sorted sequence."""
+    if not values:
+        return 0.0
+    return values[max(math.ceil(q * len(values) / 100) - 1, 0)]
+
+
+def _peak_rss():
+    """Peak resident set size of this process in bytes, or None."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def cmd_bench(args):
+    """Measure how fast a CSD file performs, without writing audio."""
+    csd_path = Path(args.file)
+    if not csd_path.exists():
+        print(f"Error: File not found: {csd_path}", file=sys.stderr)
         return 1
 
-    cs.start()
+    if args.repeat < 1 or args.warmup < 0:
+        print("Error: --repeat must be at least 1 and --warmup not negative",
+              file=sys.stderr)
+        return 1
 
+    runs = []
     try:
-        while not cs.perform_ksmps():
-            pass
+        for i in range(args.warmup + args.repeat):
+            run = _bench_run(csd_path, args)
+            if i >= args.warmup:
+                runs.append(run)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
     except KeyboardInterrupt:
         print("\nInterrupted by user", file=sys.stderr)
-        cs.cleanup()
         return 1
 
-    cs.cleanup()
+    walls = sorted(run["wall"] for run in runs)
+    wall = statistics.median(walls)
+    cpu = statistics.median(run["cpu"] for run in runs)
+    seconds = runs[-1]["seconds"]
+    sr, ksmps = runs[-1]["sr"], runs[-1]["ksmps"]
+    budget = ksmps / sr
+    stats = [run["stats"] for run in runs]
+    count = sum(s["count"] for s in stats)
+    cycles = sorted(t for run in runs for t in run["cycles"])
+
+    result = {
+        "file": str(csd_path),
+        "warmup": args.warmup,
+        "repeat": args.repeat,
+        "sr": sr,
+        "ksmps": ksmps,
+        "audio_seconds": seconds,
+        "kcycles": stats[-1]["count"],
+        "wall": {"median": wall, "min": walls[0], "max": walls[-1]},
+        "cpu": cpu,
+        "realtime_factor": seconds / wall if wall > 0 else 0.0,
+        "cpu_load": cpu / seconds if seconds > 0 else 0.0,
+        "kcycle": {
+            "budget": budget,
+            "p50": _percentile(cycles, 50),
+            "p99": _percentile(cycles, 99),
+            "max": max(s["max"] for s in stats),
+            "mean": sum(s["total"] for s in stats) / count if count else 0.0,
+            "misses": sum(s["misses"] for s in stats),
+        },
+        "peak_rss": _peak_rss(),
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
 
-    if not args.quiet:
-        print(f"Done: {output_path}")
+    us = 1e6
+    kcycle = result["kcycle"]
+    print(f"Benchmark: {csd_path} ({args.repeat} runs, {args.warmup} warmup)")
+    print(f"  audio:     {seconds:.2f}s ({result['kcycles']} k-cycles, "
+          f"sr {sr:g}, ksmps {ksmps})")
+    print(f"  wall:      {wall:.3f}s median ({walls[0]:.3f}s - {walls[-1]:.3f}s)")
+    print(f"  cpu:       {cpu:.3f}s ({result['cpu_load']:.1%} of realtime)")
+    print(f"  realtime:  {result['realtime_factor']:.1f}x")
+    print(f"  k-cycle:   p50 {kcycle['p50'] * us:.1f}us, p99 {kcycle['p99'] * us:.1f}us, "
+          f"max {kcycle['max'] * us:.1f}us "
+          f"(budget {budget * us:.1f}us, {kcycle['misses']} over)")
+    if result["peak_rss"] is not None:
+        print(f"  peak RSS:  {result['peak_rss'] / 2**20:.1f} MiB")
 
     return 0
 
@@ -214,7 +522,9 @@ Examples:
   cycsound play myscore.csd           Play a CSD file
   cycsound render myscore.csd         Render to myscore.wav
   cycsound render -o out.wav file.csd Render to specific file
+  cycsound render -j 8 -o out/ '*.csd' Render in 8 worker processes
   cycsound check myscore.csd          Validate CSD syntax
+  cycsound bench --json myscore.csd   Measure realtime factor and CPU load
   cycsound info                       Show Csound version
 """,
     )
@@ -236,15 +546,50 @@ Examples:
     play_parser.set_defaults(func=cmd_play)
 
     # Render command
-    render_parser = subparsers.add_parser("render", help="Render CSD to audio file")
-    render_parser.add_argument("file", help="CSD file to render")
-    render_parser.add_argument("-o", "--output", help="Output audio file")
+    render_parser = subparsers.add_parser("render", help="Render CSD files to audio files")
+    render_parser.add_argument("files", nargs="*", help="CSD files (or glob patterns) to render")
+    render_parser.add_argument(
+        "-o", "--output", help="Output audio file (output directory for several files)"
+    )
+    render_parser.add_argument(
+        "-j", "--jobs", type=int, default=1,
+        help="Number of worker processes (0: one per CPU)"
+    )
+    render_parser.add_argument(
+        "-m", "--manifest", help="File listing one 'input.csd [output]' job per line"
+    )
     render_parser.add_argument("-f", "--format", help="Output format (wav, aiff, flac, ogg)")
+    render_parser.add_argument(
+        "-t", "--sample-type", choices=sorted(_SAMPLE_TYPE_OPTIONS), help="Output sample type"
+    )
+    render_parser.add_argument(
+        "--native", action="store_true",
+        help="Write the file in-process (wav, rf64, w64, aiff) instead of through Csound"
+    )
     render_parser.add_argument("-r", "--sample-rate", type=int, help="Sample rate override")
     render_parser.add_argument("-k", "--ksmps", type=int, help="ksmps override")
     render_parser.add_argument("-q", "--quiet", action="store_true", help="Suppress output")
     render_parser.set_defaults(func=cmd_render)
 
+    # Bench command
+    bench_parser = subparsers.add_parser(
+        "bench", help="Measure the realtime factor and CPU load of a CSD file"
+    )
+    bench_parser.add_argument("file", help="CSD file to perform")
+    bench_parser.add_argument(
+        "-n", "--repeat", type=int, default=3, help="Number of timed runs (default: 3)"
+    )
+    bench_parser.add_argument(
+        "-w", "--warmup", type=int, default=1, help="Number of untimed runs first (default: 1)"
+    )
+    bench_parser.add_argument(
+        "-d", "--duration", type=float, help="Stop each run after this many seconds of audio"
+    )
+    bench_parser.add_argument("-r", "--sample-rate", type=int, help="Sample rate override")
+    bench_parser.add_argument("-k", "--ksmps", type=int, help="ksmps override")
+    bench_parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    bench_parser.set_defaults(func=cmd_bench)
+
     # Info command
     info_parser = subparsers.add_parser("info", help="Show Csound version info")
     info_parser.add_argument("-v", "--verbose", action="store_true", help="Show detailed info")
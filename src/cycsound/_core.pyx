@@ -1,15 +1,32 @@
+import array
+import hashlib
+import heapq
+import math
+import os
+import struct
+import sys
+import time
+from collections import OrderedDict
 from enum import Enum
 
+cimport cython
 from libc cimport stdio
 from cpython.ref cimport PyObject
+from cpython.exc cimport PyErr_CheckSignals
+from cpython.bytes cimport PyBytes_FromStringAndSize, PyBytes_AS_STRING
+from cpython.buffer cimport (PyObject_CheckBuffer, PyObject_GetBuffer, PyBuffer_Release,
+                             PyBUF_C_CONTIGUOUS, PyBUF_FORMAT, PyBUF_WRITABLE)
 
 cimport csound as cs
+cimport lockfree as lf
 
 from libc.stdio cimport printf, fprintf, stderr, FILE
 # from posix.unistd cimport sleep
 
-from libc.string cimport strcpy, strlen
-from libc.stdlib cimport malloc, free
+from libc.string cimport memcpy, memset, strcpy, strlen
+from libc.stdlib cimport calloc, malloc, free
+from libc.math cimport INFINITY, frexp, lrint
+from libc.stdint cimport int32_t, uint32_t
 
 cdef extern from "Python.h":
     char* PyUnicode_AsUTF8(object unicode)
@@ -76,6 +93,17 @@ cpdef enum Status:
     MEMORY = -4
     SIGNAL = -5
 
+cpdef enum ChannelType:
+    """Channel types and input/output flags used by the bus interface."""
+    CONTROL = 1
+    AUDIO = 2
+    STRING = 3
+    PVS = 4
+    VAR = 5
+    TYPE_MASK = 15
+    INPUT = 16
+    OUTPUT = 32
+
 cpdef enum FileType:
     """Csound file type constants."""
     # This should only be used internally by the original FileOpen()
@@ -244,22 +272,1326 @@ cdef class ArgArray:
     def as_list(self):
         return list(self)
 
+## ----------------------------------------------------------------------------
+## Cycle statistics
+
+cdef enum:
+    _CYCLE_HISTOGRAM_SIZE = 24  # bucket i: cycles of [2**(i-1), 2**i) us
+
+ctypedef struct _CycleStats:
+    cs.RTCLOCK clock
+    cs.spin_lock_t lock       # the perform loop updates, readers copy
+    int enabled
+    double budget             # deadline in seconds, 0: ksmps / sr
+    unsigned long long count
+    unsigned long long misses
+    double min
+    double max
+    double total
+    double cpu_total
+    double last
+    unsigned long long histogram[_CYCLE_HISTOGRAM_SIZE]
+    double *samples           # uniform sample of k-cycle times (reservoir)
+    unsigned long long samples_size
+    unsigned long long samples_seen
+    unsigned long long rng    # xorshift state choosing the reservoir slots
+
+cdef void _cycle_stats_clear(_CycleStats *st) noexcept nogil:
+    cs.csoundSpinLock(&st.lock)
+    st.count = st.misses = st.samples_seen = 0
+    st.min = INFINITY
+    st.max = st.total = st.cpu_total = st.last = 0.0
+    memset(st.histogram, 0, sizeof(st.histogram))
+    cs.csoundSpinUnLock(&st.lock)
+
+cdef int _perform_ksmps_timed(cs.CSOUND *csound, _CycleStats *st) noexcept nogil:
+    """Calls csoundPerformKsmps(), timing the call if st is enabled.
+
+    The last call of a performance (non-zero result) is not counted.
+    """
+    cdef double real, cpu, budget
+    cdef int result, bucket
+    cdef unsigned long long slot
+    if st is NULL or not lf.cy_atomic_load_int(&st.enabled):
+        return cs.csoundPerformKsmps(csound)
+    real = cs.csoundGetRealTime(&st.clock)
+    cpu = cs.csoundGetCPUTime(&st.clock)
+    result = cs.csoundPerformKsmps(csound)
+    if result != 0:
+        return result
+    real = cs.csoundGetRealTime(&st.clock) - real
+    cpu = cs.csoundGetCPUTime(&st.clock) - cpu
+    bucket = 0
+    if real * 1e6 >= 1.0:
+        frexp(real * 1e6, &bucket)
+        if bucket >= _CYCLE_HISTOGRAM_SIZE:
+            bucket = _CYCLE_HISTOGRAM_SIZE - 1
+    cs.csoundSpinLock(&st.lock)
+    budget = st.budget
+    if budget <= 0.0:
+        budget = <double>cs.csoundGetKsmps(csound) / <double>cs.csoundGetSr(csound)
+    st.count += 1
+    if real > budget:
+        st.misses += 1
+    if real < st.min:
+        st.min = real
+    if real > st.max:
+        st.max = real
+    st.total += real
+    st.cpu_total += cpu
+    st.last = real
+    st.histogram[bucket] += 1
+    if st.samples_size:
+        # reservoir sampling: every k-cycle is kept with equal probability
+        st.samples_seen += 1
+        if st.samples_seen <= st.samples_size:
+            st.samples[st.samples_seen - 1] = real
+        else:
+            st.rng ^= st.rng << 13
+            st.rng ^= st.rng >> 7
+            st.rng ^= st.rng << 17
+            slot = st.rng % st.samples_seen
+            if slot < st.samples_size:
+                st.samples[slot] = real
+    cs.csoundSpinUnLock(&st.lock)
+    return result
+
+
+## ----------------------------------------------------------------------------
+## Control channel batches
+
+ctypedef struct _ControlBatch:
+    Py_ssize_t n
+    cs.MYFLT **ptrs
+    cs.MYFLT *values
+
+ctypedef struct _ControlBatches:
+    void *pending             # _ControlBatch published by set_control_channels()
+    int armed                 # set while the sense event callback applies them
+
+cdef const char *_CONTROL_BATCHES_KEY = b"cycsound.control_batches"
+
+cdef void _control_batch_free(_ControlBatch *batch) noexcept nogil:
+    if batch is not NULL:
+        free(batch.ptrs)
+        free(batch.values)
+        free(batch)
+
+cdef void _control_batch_apply(_ControlBatch *batch) noexcept nogil:
+    cdef Py_ssize_t i
+    for i in range(batch.n):
+        lf.cy_atomic_store_myflt(batch.ptrs[i], batch.values[i])
+
+cdef _ControlBatch *_control_batch_merge(_ControlBatch *old, cs.MYFLT **ptrs,
+                                         const cs.MYFLT *values, Py_ssize_t n) noexcept nogil:
+    """Returns a new batch taking over ptrs (malloc'ed) and a copy of
+    values, after the entries of old, which is freed. NULL if out of
+    memory, old and ptrs being left alone.
+    """
+    cdef Py_ssize_t m = 0 if old is NULL else old.n
+    cdef _ControlBatch *batch = <_ControlBatch*>malloc(sizeof(_ControlBatch))
+    if batch is NULL:
+        return NULL
+    batch.n = m + n
+    batch.values = <cs.MYFLT*>malloc((m + n or 1) * sizeof(cs.MYFLT))
+    batch.ptrs = ptrs
+    if m:
+        batch.ptrs = <cs.MYFLT**>malloc((m + n) * sizeof(cs.MYFLT*))
+    if batch.values is NULL or batch.ptrs is NULL:
+        free(batch.values)
+        if m:
+            free(batch.ptrs)
+        free(batch)
+        return NULL
+    if m:
+        memcpy(batch.ptrs, old.ptrs, m * sizeof(cs.MYFLT*))
+        memcpy(batch.ptrs + m, ptrs, n * sizeof(cs.MYFLT*))
+        memcpy(batch.values, old.values, m * sizeof(cs.MYFLT))
+        free(ptrs)
+        _control_batch_free(old)
+    memcpy(batch.values + m, values, n * sizeof(cs.MYFLT))
+    return batch
+
+cdef void _control_batches_flush(_ControlBatches *cb) noexcept nogil:
+    """Applies and frees the pending batch, if any."""
+    cdef _ControlBatch *batch
+    if lf.cy_atomic_load_ptr(&cb.pending) is NULL:
+        return
+    batch = <_ControlBatch*>lf.cy_atomic_exchange_ptr(&cb.pending, NULL)
+    if batch is not NULL:
+        _control_batch_apply(batch)
+        _control_batch_free(batch)
+
+cdef void _control_batches_sense(cs.CSOUND *csound, void *data) noexcept nogil:
+    """Sense event callback: runs at the start of every k-cycle."""
+    cdef _ControlBatches *cb = (<_ControlBatches**>data)[0]
+    if cb is not NULL:
+        _control_batches_flush(cb)
+
+
+## ----------------------------------------------------------------------------
+## Buffer helpers
+
+# struct format character of MYFLT
+cdef str _MYFLT_FORMAT = 'd' if sizeof(cs.MYFLT) == 8 else 'f'
+cdef str _BYTEORDER_PREFIXES = '@=' + ('<' if sys.byteorder == 'little' else '>')
+
+cdef Py_ssize_t _get_myflt_buffer(object obj, Py_buffer *view, bint writable) except -1:
+    """Gets a C-contiguous buffer of MYFLT values from obj.
+
+    Untyped byte buffers (bytearray, bytes) are accepted as is, typed
+    buffers (array.array, numpy arrays) must match the MYFLT type
+    (see get_size_of_myflt()).
+
+    Returns the number of MYFLT values in the buffer. The caller owns the
+    view and must release it with PyBuffer_Release().
+    """
+    cdef int flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT
+    if writable:
+        flags |= PyBUF_WRITABLE
+    PyObject_GetBuffer(obj, view, flags)
+    fmt = view.format.decode() if view.format is not NULL else 'B'
+    fmt = fmt.lstrip(_BYTEORDER_PREFIXES)
+    if fmt not in ('B', 'b', 'c', _MYFLT_FORMAT):
+        PyBuffer_Release(view)
+        raise TypeError(f"expected a buffer of MYFLT ('{_MYFLT_FORMAT}') or bytes, got '{fmt}'")
+    if view.len % sizeof(cs.MYFLT):
+        PyBuffer_Release(view)
+        raise ValueError("buffer size is not a multiple of the MYFLT size")
+    return view.len // sizeof(cs.MYFLT)
+
+cdef bint _get_typed_myflt_buffer(object obj, Py_buffer *view) except -1:
+    """Like _get_myflt_buffer(), but returns False instead of raising when
+    obj is not a C-contiguous buffer whose format is MYFLT. Untyped byte
+    buffers are not taken as raw MYFLT here.
+    """
+    try:
+        PyObject_GetBuffer(obj, view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT)
+    except BufferError:
+        return False
+    fmt = view.format.decode() if view.format is not NULL else 'B'
+    if fmt.lstrip(_BYTEORDER_PREFIXES) != _MYFLT_FORMAT:
+        PyBuffer_Release(view)
+        return False
+    return True
+
+cdef class _MyfltArray:
+    """MYFLT values taken from a buffer of MYFLT without copying, or
+    converted from any other numeric buffer or sequence of numbers (or of
+    equal-length rows, for 2-D data).
+
+    The buffer view or the converted copy is held until the object is
+    garbage collected.
+    """
+
+    cdef Py_buffer view
+    cdef bint has_view
+    cdef cs.MYFLT *owned
+    cdef cs.MYFLT *data
+    cdef Py_ssize_t rows
+    cdef Py_ssize_t cols
+
+    def __dealloc__(self):
+        if self.has_view:
+            PyBuffer_Release(&self.view)
+        free(self.owned)
+
+    @staticmethod
+    cdef _MyfltArray create(object values, int ndim):
+        cdef _MyfltArray arr = _MyfltArray.__new__(_MyfltArray)
+        cdef Py_ssize_t i, j
+        if PyObject_CheckBuffer(values):
+            if _get_typed_myflt_buffer(values, &arr.view):
+                arr.has_view = True
+                arr.data = <cs.MYFLT*>arr.view.buf
+                if ndim == 1:
+                    arr.rows = 1
+                    arr.cols = arr.view.len // sizeof(cs.MYFLT)
+                    return arr
+                if arr.view.ndim == 2:
+                    arr.rows = arr.view.shape[0]
+                    arr.cols = arr.view.shape[1]
+                    return arr
+                raise ValueError(f"expected a 2-D buffer, got {arr.view.ndim} dimension(s)")
+            # other item types (ints, float32, ...) or non-contiguous
+            # buffers: convert element by element
+            mv = memoryview(values)
+            if mv.ndim != ndim:
+                raise ValueError(f"expected a {ndim}-D buffer, got {mv.ndim} dimension(s)")
+            values = mv.tolist()
+        rows = [values] if ndim == 1 else list(values)
+        arr.rows = len(rows)
+        arr.cols = len(rows[0]) if arr.rows else 0
+        arr.owned = <cs.MYFLT*>malloc((arr.rows * arr.cols or 1) * sizeof(cs.MYFLT))
+        if arr.owned is NULL:
+            raise MemoryError
+        for i in range(arr.rows):
+            row = rows[i]
+            if len(row) != arr.cols:
+                raise ValueError("all rows must have the same length")
+            for j in range(arr.cols):
+                arr.owned[i * arr.cols + j] = <double>row[j]
+        arr.data = arr.owned
+        return arr
+
+cdef char _event_type(str type) except 0:
+    """Converts a score event type ('a', 'i', 'q', 'f' or 'e') to a char."""
+    if len(type) != 1 or ord(type) > 127:
+        raise ValueError(f"invalid score event type: {type!r}")
+    return ord(type)
+
+cdef Py_ssize_t _perform_into(cs.CSOUND *csound, char *dest, Py_ssize_t max_cycles,
+                              bint to_float32, bint *finished,
+                              _CycleStats *stats) noexcept nogil:
+    """Performs up to max_cycles k-cycles, copying spout to dest after each
+    one (if dest is not NULL), either as MYFLT or converted to float.
+    The k-cycles are timed into stats if it is not NULL.
+
+    Sets *finished when csoundPerformKsmps() reports the end of the
+    performance. Returns the number of k-cycles performed.
+    """
+    cdef const cs.MYFLT *spout = cs.csoundGetSpout(csound)
+    cdef Py_ssize_t samples = cs.csoundGetKsmps(csound) * cs.csoundGetNchnls(csound)
+    cdef Py_ssize_t i = 0
+    cdef Py_ssize_t j
+    cdef float *fdest
+    while i < max_cycles:
+        if _perform_ksmps_timed(csound, stats) != 0:
+            finished[0] = True
+            break
+        if dest is not NULL:
+            if to_float32:
+                fdest = <float*>dest + i * samples
+                for j in range(samples):
+                    fdest[j] = <float>spout[j]
+            else:
+                memcpy(dest + i * samples * sizeof(cs.MYFLT), spout,
+                       samples * sizeof(cs.MYFLT))
+        i += 1
+    return i
+
+## ----------------------------------------------------------------------------
+## Message ring
+
+ctypedef struct _MessageHeader:
+    int attr
+    unsigned int length
+
+ctypedef struct _MessageRing:
+    lf.cy_ring ring           # _MessageHeader + text records
+    cs.spin_lock_t lock       # serializes the threads printing messages
+    unsigned int type_mask    # bit n set: keep messages of type n << 12
+    unsigned int received
+    unsigned int dropped
+    unsigned int filtered
+
+cdef const char *_MESSAGE_RING_KEY = b"cycsound.message_ring"
+
+cdef void _message_ring_callback(cs.CSOUND *csound, int attr, const char *text) noexcept nogil:
+    """Message string callback copying messages into the message ring."""
+    cdef _MessageRing **slot = <_MessageRing**>cs.csoundQueryGlobalVariable(
+        csound, _MESSAGE_RING_KEY)
+    cdef _MessageRing *mr
+    cdef _MessageHeader header
+    if slot is NULL or slot[0] is NULL:
+        return
+    mr = slot[0]
+    cs.csoundSpinLock(&mr.lock)
+    if not (lf.cy_atomic_load_uint(&mr.type_mask) >> ((attr & 0x7000) >> 12)) & 1:
+        lf.cy_atomic_store_uint(&mr.filtered, mr.filtered + 1)
+    else:
+        header.attr = attr
+        header.length = strlen(text)
+        if lf.cy_ring_space(&mr.ring) >= sizeof(_MessageHeader) + header.length:
+            lf.cy_ring_write(&mr.ring, &header, sizeof(_MessageHeader))
+            lf.cy_ring_write(&mr.ring, text, header.length)
+            lf.cy_atomic_store_uint(&mr.received, mr.received + 1)
+        else:
+            lf.cy_atomic_store_uint(&mr.dropped, mr.dropped + 1)
+    cs.csoundSpinUnLock(&mr.lock)
+
+cdef unsigned int _message_type_mask(object types) except? 0:
+    """Converts an iterable of Msg types (or ints) to a message ring mask."""
+    cdef unsigned int mask = 0
+    if types is None:
+        return 0xff
+    for t in types:
+        mask |= 1u << ((int(t.value if isinstance(t, Msg) else t) & 0x7000) >> 12)
+    return mask
+
+
+## ----------------------------------------------------------------------------
+## Ring audio
+
+ctypedef struct _RingAudio:
+    lf.cy_ring output         # MYFLT samples played by Csound, read by the host
+    lf.cy_ring input          # MYFLT samples written by the host, recorded by Csound
+    void *output_data         # notified when Csound plays a buffer
+    void *output_space        # notified when the host reads
+    void *input_data          # notified when the host writes
+    void *input_space         # notified when Csound records a buffer
+    unsigned int frames       # capacity of each ring, in frames
+    unsigned int timeout_ms   # longest wait of the Csound callbacks for the host
+    int output_channels
+    int input_channels
+    double sample_rate
+    int opened                # bit 0/1: playback/recording open, bit 2/3: ring usable
+    int busy                  # host transfers in progress
+    unsigned int overruns     # output samples dropped, the host not reading
+    unsigned int underruns    # input samples missing, replaced by zeros
+    unsigned int played       # frames
+    unsigned int recorded
+
+cdef const char *_RING_AUDIO_KEY = b"cycsound.ring_audio"
+
+cdef _RingAudio *_ring_audio(cs.CSOUND *csound) noexcept nogil:
+    cdef _RingAudio **slot = <_RingAudio**>cs.csoundQueryGlobalVariable(
+        csound, _RING_AUDIO_KEY)
+    return NULL if slot is NULL else slot[0]
+
+cdef unsigned int _ring_put(lf.cy_ring *ring, const char *src, unsigned int n,
+                            unsigned int granule, void *data_lock, void *space_lock,
+                            unsigned int timeout_ms) noexcept nogil:
+    """Writes n elements to ring in multiples of granule, waiting up to
+    timeout_ms for the reader to make room. Returns the number written.
+    """
+    cdef unsigned int done = 0
+    cdef unsigned int space
+    while True:
+        space = lf.cy_ring_space(ring)
+        space -= space % granule
+        done += lf.cy_ring_write(ring, src + <size_t>done * ring.elemsize,
+                                 min(n - done, space))
+        cs.csoundNotifyThreadLock(data_lock)
+        if done == n or timeout_ms == 0:
+            break
+        if cs.csoundWaitThreadLock(space_lock, timeout_ms) != 0:
+            break
+    return done
+
+cdef unsigned int _ring_get(lf.cy_ring *ring, char *dst, unsigned int n,
+                            unsigned int granule, void *data_lock, void *space_lock,
+                            unsigned int timeout_ms) noexcept nogil:
+    """Reads n elements from ring in multiples of granule, waiting up to
+    timeout_ms for the writer. Returns the number read.
+    """
+    cdef unsigned int done = 0
+    cdef unsigned int avail
+    while True:
+        avail = lf.cy_ring_available(ring)
+        avail -= avail % granule
+        done += lf.cy_ring_read(ring, dst + <size_t>done * ring.elemsize,
+                                min(n - done, avail))
+        cs.csoundNotifyThreadLock(space_lock)
+        if done == n or timeout_ms == 0:
+            break
+        if cs.csoundWaitThreadLock(data_lock, timeout_ms) != 0:
+            break
+    return done
+
+cdef int _ring_audio_open(lf.cy_ring *ring, int *channels, _RingAudio *ra,
+                          const cs.csRtAudioParams *parm, int bit) noexcept nogil:
+    """(Re)allocates a ring for parm.nChannels and marks it open.
+
+    The host may still be draining the ring of a previous performance:
+    before resizing, the ring is marked unusable and the transfers in
+    progress (see RingAudio._transfer()) are waited for.
+    """
+    if parm.nChannels < 1:
+        return -1
+    if channels[0] != parm.nChannels:
+        lf.cy_atomic_and_int(&ra.opened, ~(bit << 2))
+        cs.csoundNotifyThreadLock(ra.output_data)
+        cs.csoundNotifyThreadLock(ra.input_space)
+        while lf.cy_atomic_add_int(&ra.busy, 0) != 0:
+            cs.csoundSleep(1)
+        lf.cy_ring_free(ring)
+        if lf.cy_ring_init(ring, ra.frames * parm.nChannels, sizeof(cs.MYFLT)) != 0:
+            return -1
+        channels[0] = parm.nChannels
+    ra.sample_rate = parm.sampleRate
+    lf.cy_atomic_or_int(&ra.opened, bit | bit << 2)
+    return 0
+
+cdef int _ring_audio_playopen(cs.CSOUND *csound, const cs.csRtAudioParams *parm) noexcept nogil:
+    cdef _RingAudio *ra = _ring_audio(csound)
+    if ra is NULL:
+        return -1
+    return _ring_audio_open(&ra.output, &ra.output_channels, ra, parm, 1)
+
+cdef int _ring_audio_recopen(cs.CSOUND *csound, const cs.csRtAudioParams *parm) noexcept nogil:
+    cdef _RingAudio *ra = _ring_audio(csound)
+    if ra is NULL:
+        return -1
+    return _ring_audio_open(&ra.input, &ra.input_channels, ra, parm, 2)
+
+cdef void _ring_audio_rtplay(cs.CSOUND *csound, const cs.MYFLT *buf, int nbytes) noexcept nogil:
+    cdef _RingAudio *ra = _ring_audio(csound)
+    cdef unsigned int n = nbytes // sizeof(cs.MYFLT)
+    cdef unsigned int done
+    if ra is NULL:
+        return
+    done = _ring_put(&ra.output, <const char*>buf, n, ra.output_channels,
+                     ra.output_data, ra.output_space, ra.timeout_ms)
+    if done < n:
+        lf.cy_atomic_store_uint(&ra.overruns, ra.overruns + n - done)
+    lf.cy_atomic_store_uint(&ra.played, ra.played + n // ra.output_channels)
+
+cdef int _ring_audio_rtrecord(cs.CSOUND *csound, cs.MYFLT *buf, int nbytes) noexcept nogil:
+    cdef _RingAudio *ra = _ring_audio(csound)
+    cdef unsigned int n = nbytes // sizeof(cs.MYFLT)
+    cdef unsigned int done
+    if ra is NULL:
+        memset(buf, 0, nbytes)
+        return nbytes
+    done = _ring_get(&ra.input, <char*>buf, n, ra.input_channels,
+                     ra.input_data, ra.input_space, ra.timeout_ms)
+    if done < n:
+        memset(buf + done, 0, (n - done) * sizeof(cs.MYFLT))
+        lf.cy_atomic_store_uint(&ra.underruns, ra.underruns + n - done)
+    lf.cy_atomic_store_uint(&ra.recorded, ra.recorded + n // ra.input_channels)
+    return nbytes
+
+cdef void _ring_audio_rtclose(cs.CSOUND *csound) noexcept nogil:
+    cdef _RingAudio *ra = _ring_audio(csound)
+    if ra is NULL:
+        return
+    lf.cy_atomic_and_int(&ra.opened, ~3)
+    cs.csoundNotifyThreadLock(ra.output_data)
+    cs.csoundNotifyThreadLock(ra.input_space)
+
+cdef void _ring_audio_free(_RingAudio *ra) noexcept nogil:
+    lf.cy_ring_free(&ra.output)
+    lf.cy_ring_free(&ra.input)
+    if ra.output_data is not NULL:
+        cs.csoundDestroyThreadLock(ra.output_data)
+    if ra.output_space is not NULL:
+        cs.csoundDestroyThreadLock(ra.output_space)
+    if ra.input_data is not NULL:
+        cs.csoundDestroyThreadLock(ra.input_data)
+    if ra.input_space is not NULL:
+        cs.csoundDestroyThreadLock(ra.input_space)
+    free(ra)
+
+
+cdef class RingAudio:
+    """Real-time audio of a Csound instance, exchanged with the host
+    through lock-free rings instead of an audio device.
+
+    Csound's rtplay and rtrecord callbacks copy each buffer (-b) into and
+    out of two rings without taking the GIL, waiting up to 'timeout' for
+    the host. The host, e.g. a PortAudio callback or a test, reads the
+    output and writes the input in whole frames from any one thread:
+
+        audio = cs.ring_audio(frames=8192)
+        cs.set_option("-odac")
+        cs.compile_csd("live.csd")
+        cs.start()
+        pt = CsoundPerformanceThread(cs)
+        pt.play()
+        block = audio.read(256, timeout=0.1)      # (256 x nchnls) MYFLT
+
+    Created by csound.ring_audio().
+    """
+
+    cdef Csound csound
+    cdef _RingAudio *ra
+
+    def __init__(self):
+        raise TypeError("This cannot be instatiated directly")
+
+    @staticmethod
+    cdef RingAudio create(Csound csound):
+        cdef RingAudio audio = RingAudio.__new__(RingAudio)
+        audio.csound = csound
+        audio.ra = csound.audio_rings
+        return audio
+
+    @property
+    def output_channels(self) -> int:
+        """Channels of the output ring, 0 until Csound opens playback."""
+        return self.ra.output_channels if lf.cy_atomic_load_int(&self.ra.opened) & 4 else 0
+
+    @property
+    def input_channels(self) -> int:
+        """Channels of the input ring, 0 until Csound opens recording."""
+        return self.ra.input_channels if lf.cy_atomic_load_int(&self.ra.opened) & 8 else 0
+
+    @property
+    def sample_rate(self) -> float:
+        """Sample rate of the last real-time stream opened by Csound."""
+        return self.ra.sample_rate
+
+    @property
+    def playing(self) -> bool:
+        """True while Csound has real-time playback open."""
+        return bool(lf.cy_atomic_load_int(&self.ra.opened) & 1)
+
+    @property
+    def recording(self) -> bool:
+        """True while Csound has real-time recording open."""
+        return bool(lf.cy_atomic_load_int(&self.ra.opened) & 2)
+
+    cdef unsigned int _transfer(self, bint output, char *buf, unsigned int n,
+                                double timeout, int *channels) except? 0:
+        """Reads from the output ring, or writes to the input ring, up to
+        n samples in whole frames, waiting up to timeout seconds (forever
+        if negative). Returns the number of samples and sets channels.
+
+        Counted in ra.busy, so that Csound does not resize the ring
+        meanwhile (see _ring_audio_open()).
+        """
+        cdef _RingAudio *ra = self.ra
+        cdef unsigned int done = 0
+        cdef unsigned int wait_ms
+        cdef int bit = 1 if output else 2
+        cdef double deadline = time.monotonic() + timeout
+        channels[0] = 0
+        lf.cy_atomic_add_int(&ra.busy, 1)
+        try:
+            # read after busy: either Csound waits for us, or we see the ring unusable
+            if not lf.cy_atomic_add_int(&ra.opened, 0) & bit << 2:
+                return 0
+            channels[0] = ra.output_channels if output else ra.input_channels
+            if not output and n % channels[0]:
+                raise ValueError(f"buffer size is not a multiple of {channels[0]} channels")
+            n -= n % channels[0]
+            while True:
+                wait_ms = 100 if timeout < 0 else <unsigned int>(
+                    min(max(deadline - time.monotonic(), 0.0), 0.1) * 1000)
+                with nogil:
+                    if output:
+                        done += _ring_get(&ra.output, buf + <size_t>done * sizeof(cs.MYFLT),
+                                          n - done, channels[0], ra.output_data,
+                                          ra.output_space, wait_ms)
+                    else:
+                        done += _ring_put(&ra.input, buf + <size_t>done * sizeof(cs.MYFLT),
+                                          n - done, channels[0], ra.input_data,
+                                          ra.input_space, wait_ms)
+                if (done == n or wait_ms == 0
+                        or not lf.cy_atomic_load_int(&ra.opened) & bit
+                        or not lf.cy_atomic_load_int(&ra.opened) & bit << 2):
+                    return done
+                PyErr_CheckSignals()
+        finally:
+            lf.cy_atomic_add_int(&ra.busy, -1)
+
+    def read_into(self, object out, timeout = 0.0) -> int:
+        """Reads Csound's output into 'out', a writable buffer of MYFLT,
+        in whole frames, waiting up to 'timeout' seconds for it to fill
+        (None: as long as needed, or until Csound closes playback).
+        Returns the number of frames read.
+        """
+        cdef Py_buffer view
+        cdef Py_ssize_t n
+        cdef int channels
+        n = _get_myflt_buffer(out, &view, True)
+        try:
+            n = self._transfer(True, <char*>view.buf, n,
+                               -1.0 if timeout is None else timeout, &channels)
+        finally:
+            PyBuffer_Release(&view)
+        return n // channels if channels else 0
+
+    def read(self, int frames, timeout = 0.0):
+        """Reads up to 'frames' frames of Csound's output (see read_into()).
+
+        Returns an array.array of interleaved MYFLT samples.
+        """
+        if frames < 0:
+            raise ValueError("frames must not be negative")
+        cdef Py_buffer view
+        cdef Py_ssize_t n
+        cdef int channels
+        out = array.array(_MYFLT_FORMAT, bytes(frames * self.output_channels
+                                               * sizeof(cs.MYFLT)))
+        PyObject_GetBuffer(out, &view, PyBUF_C_CONTIGUOUS | PyBUF_WRITABLE)
+        try:
+            n = self._transfer(True, <char*>view.buf, len(out),
+                               -1.0 if timeout is None else timeout, &channels)
+        finally:
+            PyBuffer_Release(&view)
+        del out[n:]
+        return out
+
+    def write(self, object block, timeout = 0.0) -> int:
+        """Writes interleaved MYFLT samples (whole frames) for Csound to
+        record, waiting up to 'timeout' seconds for room (None: as long
+        as needed). Returns the number of frames written.
+        """
+        cdef Py_buffer view
+        cdef Py_ssize_t n
+        cdef int channels
+        n = _get_myflt_buffer(block, &view, False)
+        try:
+            n = self._transfer(False, <char*>view.buf, n,
+                               -1.0 if timeout is None else timeout, &channels)
+        finally:
+            PyBuffer_Release(&view)
+        return n // channels if channels else 0
+
+    def get_stats(self) -> dict:
+        """Returns the frames 'played' and 'recorded' by Csound, the output
+        samples dropped ('overruns') because the host did not read them in
+        time, and the input samples replaced by zeros ('underruns').
+        """
+        return {
+            "played": lf.cy_atomic_load_uint(&self.ra.played),
+            "recorded": lf.cy_atomic_load_uint(&self.ra.recorded),
+            "overruns": lf.cy_atomic_load_uint(&self.ra.overruns),
+            "underruns": lf.cy_atomic_load_uint(&self.ra.underruns),
+        }
+
+
+## ----------------------------------------------------------------------------
+## Host MIDI input
+
+ctypedef struct _MidiInput:
+    lf.cy_ring ring           # raw MIDI bytes pushed by the host
+    int opened
+    unsigned int pushed       # bytes
+    unsigned int delivered
+    unsigned int dropped
+
+cdef const char *_MIDI_INPUT_KEY = b"cycsound.midi_input"
+
+cdef int _midi_input_open(cs.CSOUND *csound, void **user_data, const char *dev) noexcept nogil:
+    cdef _MidiInput **slot = <_MidiInput**>cs.csoundQueryGlobalVariable(
+        csound, _MIDI_INPUT_KEY)
+    if slot is NULL or slot[0] is NULL:
+        return -1
+    user_data[0] = slot[0]
+    lf.cy_atomic_store_int(&slot[0].opened, 1)
+    return 0
+
+cdef int _midi_input_read(cs.CSOUND *csound, void *user_data, unsigned char *buf,
+                          int nbytes) noexcept nogil:
+    """Hands queued bytes to Csound's MIDI parser, which keeps running
+    status and partial messages across calls."""
+    cdef _MidiInput *mi = <_MidiInput*>user_data
+    cdef unsigned int n
+    if mi is NULL or nbytes <= 0:
+        return 0
+    n = lf.cy_ring_read(&mi.ring, buf, nbytes)
+    if n:
+        lf.cy_atomic_store_uint(&mi.delivered, mi.delivered + n)
+    return n
+
+cdef int _midi_input_close(cs.CSOUND *csound, void *user_data) noexcept nogil:
+    cdef _MidiInput *mi = <_MidiInput*>user_data
+    if mi is not NULL:
+        lf.cy_atomic_store_int(&mi.opened, 0)
+    return 0
+
+
+cdef class MidiInputQueue:
+    """Host MIDI input: raw MIDI bytes pushed from Python are read by
+    Csound as if they came from a MIDI device (-M).
+
+    The read callback drains a lock-free byte queue once per k-cycle
+    without the GIL, so a burst of events costs one push() and keeps
+    its MIDI semantics (channels, velocities, running status, sysex):
+
+        queue = cs.midi_input_queue()
+        cs.compile_orc(orc)
+        cs.start()
+        queue.push(bytes([0x90, 60, 100, 64, 100, 67, 100]))
+
+    Created by csound.midi_input_queue().
+    """
+
+    cdef Csound csound
+    cdef _MidiInput *mi
+
+    def __init__(self):
+        raise TypeError("This cannot be instatiated directly")
+
+    @staticmethod
+    cdef MidiInputQueue create(Csound csound):
+        cdef MidiInputQueue queue = MidiInputQueue.__new__(MidiInputQueue)
+        queue.csound = csound
+        queue.mi = csound.midi_input
+        return queue
+
+    @property
+    def size(self) -> int:
+        """Capacity of the queue, in bytes."""
+        return self.mi.ring.capacity
+
+    @property
+    def pending(self) -> int:
+        """Bytes pushed but not yet read by Csound."""
+        return lf.cy_ring_available(&self.mi.ring)
+
+    @property
+    def opened(self) -> bool:
+        """True while Csound has MIDI input open."""
+        return bool(lf.cy_atomic_load_int(&self.mi.opened))
+
+    def push(self, object data) -> int:
+        """Queues the MIDI bytes of a buffer (bytes, bytearray,
+        array.array('B'), uint8 numpy array), all or nothing. Buffers
+        of wider items raise TypeError.
+
+        Returns the number of bytes queued: len(data), or 0 if the queue
+        does not have room for all of them (counted as dropped).
+        """
+        cdef Py_buffer view
+        cdef unsigned int n = 0
+        PyObject_GetBuffer(data, &view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT)
+        try:
+            if view.itemsize != 1:
+                fmt = view.format.decode() if view.format is not NULL else 'B'
+                raise TypeError(f"expected a buffer of bytes, got '{fmt}'")
+            if view.len > lf.cy_ring_space(&self.mi.ring):
+                lf.cy_atomic_store_uint(&self.mi.dropped, self.mi.dropped + <unsigned int>view.len)
+            else:
+                n = lf.cy_ring_write(&self.mi.ring, view.buf, <unsigned int>view.len)
+                lf.cy_atomic_store_uint(&self.mi.pushed, self.mi.pushed + n)
+        finally:
+            PyBuffer_Release(&view)
+        return n
+
+    def get_stats(self) -> dict:
+        """Returns the bytes 'pushed', 'delivered' to Csound, 'dropped'
+        (queue full) and 'pending'.
+        """
+        return {
+            "pushed": lf.cy_atomic_load_uint(&self.mi.pushed),
+            "delivered": lf.cy_atomic_load_uint(&self.mi.delivered),
+            "dropped": lf.cy_atomic_load_uint(&self.mi.dropped),
+            "pending": lf.cy_ring_available(&self.mi.ring),
+        }
+
+
+## ----------------------------------------------------------------------------
+## Host MIDI output
+
+ctypedef struct _MidiEventHeader:
+    cs.int64_t time           # sample position of the k-cycle that sent it
+    unsigned int length
+
+ctypedef struct _MidiOutput:
+    lf.cy_ring ring           # _MidiEventHeader + MIDI bytes records
+    int opened
+    unsigned int captured     # messages
+    unsigned int dropped
+
+cdef const char *_MIDI_OUTPUT_KEY = b"cycsound.midi_output"
+
+cdef int _midi_output_open(cs.CSOUND *csound, void **user_data, const char *dev) noexcept nogil:
+    cdef _MidiOutput **slot = <_MidiOutput**>cs.csoundQueryGlobalVariable(
+        csound, _MIDI_OUTPUT_KEY)
+    if slot is NULL or slot[0] is NULL:
+        return -1
+    user_data[0] = slot[0]
+    lf.cy_atomic_store_int(&slot[0].opened, 1)
+    return 0
+
+cdef int _midi_output_write(cs.CSOUND *csound, void *user_data, const unsigned char *buf,
+                            int nbytes) noexcept nogil:
+    """Stores one message with its time stamp. Only the performance
+    thread writes MIDI, so the ring has a single producer."""
+    cdef _MidiOutput *mo = <_MidiOutput*>user_data
+    cdef _MidiEventHeader header
+    if mo is NULL or nbytes <= 0:
+        return nbytes
+    header.time = cs.csoundGetCurrentTimeSamples(csound)
+    header.length = nbytes
+    if lf.cy_ring_space(&mo.ring) >= sizeof(_MidiEventHeader) + header.length:
+        lf.cy_ring_write(&mo.ring, &header, sizeof(_MidiEventHeader))
+        lf.cy_ring_write(&mo.ring, buf, header.length)
+        lf.cy_atomic_store_uint(&mo.captured, mo.captured + 1)
+    else:
+        lf.cy_atomic_store_uint(&mo.dropped, mo.dropped + 1)
+    return nbytes
+
+cdef int _midi_output_close(cs.CSOUND *csound, void *user_data) noexcept nogil:
+    cdef _MidiOutput *mo = <_MidiOutput*>user_data
+    if mo is not NULL:
+        lf.cy_atomic_store_int(&mo.opened, 0)
+    return 0
+
+def _midi_vlq(unsigned long value) -> bytes:
+    """Encodes a standard MIDI file variable-length quantity."""
+    cdef bytearray out = bytearray([value & 0x7f])
+    value >>= 7
+    while value:
+        out.insert(0, 0x80 | (value & 0x7f))
+        value >>= 7
+    return bytes(out)
+
+
+cdef class MidiOutputCapture:
+    """Host MIDI output: messages sent by Csound (midiout, noteondur,
+    MIDI-out opcodes) are captured with their time stamps into a
+    lock-free ring instead of going to a MIDI device (-Q).
+
+    The write callback runs in the performance thread without the GIL;
+    Python drains the ring in bulk, during or after the performance:
+
+        capture = cs.midi_output_capture()
+        cs.compile_csd("generative.csd")
+        cs.run()
+        capture.write_midi_file("out.mid")
+
+    Created by csound.midi_output_capture().
+    """
+
+    cdef Csound csound
+    cdef _MidiOutput *mo
+
+    def __init__(self):
+        raise TypeError("This cannot be instatiated directly")
+
+    @staticmethod
+    cdef MidiOutputCapture create(Csound csound):
+        cdef MidiOutputCapture capture = MidiOutputCapture.__new__(MidiOutputCapture)
+        capture.csound = csound
+        capture.mo = csound.midi_output
+        return capture
+
+    @property
+    def opened(self) -> bool:
+        """True while Csound has MIDI output open."""
+        return bool(lf.cy_atomic_load_int(&self.mo.opened))
+
+    def drain(self, bint packed = False):
+        """Removes all captured messages from the ring.
+
+        Returns a list of (time, data) tuples, where time is the sample
+        position of the k-cycle that sent the message (divide by ksmps for
+        the k-cycle) and data its MIDI bytes. If 'packed' is True, returns
+        the raw bytes of the records instead: each is a native int64 time
+        and unsigned int length, followed by 'length' bytes of MIDI.
+        """
+        cdef _MidiOutput *mo = self.mo
+        cdef _MidiEventHeader header
+        cdef unsigned int n = lf.cy_ring_available(&mo.ring)
+        cdef size_t pos = 0
+        cdef const char *data
+        block = PyBytes_FromStringAndSize(NULL, n)
+        data = PyBytes_AS_STRING(block)
+        lf.cy_ring_peek(&mo.ring, <char*>data, n)
+        events = []
+        # a message being written may be incomplete: stop before it
+        while pos + sizeof(_MidiEventHeader) <= n:
+            memcpy(&header, data + pos, sizeof(_MidiEventHeader))
+            if pos + sizeof(_MidiEventHeader) + header.length > n:
+                break
+            if not packed:
+                events.append((header.time,
+                               data[pos + sizeof(_MidiEventHeader):
+                                    pos + sizeof(_MidiEventHeader) + header.length]))
+            pos += sizeof(_MidiEventHeader) + header.length
+        lf.cy_ring_skip(&mo.ring, pos)
+        if packed:
+            return block if pos == n else block[:pos]
+        return events
+
+    def write_midi_file(self, object path, events = None, int ticks_per_beat = 480,
+                        double bpm = 120.0) -> int:
+        """Writes a type 0 standard MIDI file of 'events', (time, data)
+        pairs as returned by drain() (None: drains the ring).
+
+        Sample times are converted to ticks at the instance's sample rate
+        and a constant 'bpm'. Sysex messages are stored as F0 events,
+        other system common messages (F1-F7) as F7 escape events, and
+        system real-time messages (F8-FF) are skipped. Returns the number
+        of events written.
+        """
+        if ticks_per_beat < 1 or ticks_per_beat > 0x7fff:
+            raise ValueError("ticks_per_beat must be between 1 and 32767")
+        if bpm <= 0:
+            raise ValueError("bpm must be positive")
+        if events is None:
+            events = self.drain()
+        cdef double ticks_per_sample = ticks_per_beat * bpm / 60.0 / self.csound.get_sr()
+        cdef long last = 0
+        cdef long tick
+        cdef Py_ssize_t count = 0
+        track = bytearray(b"\x00\xff\x51\x03")
+        track += round(60e6 / bpm).to_bytes(3, "big")
+        for time_, data in events:
+            data = bytes(data)
+            if not data or data[0] >= 0xf8:
+                continue
+            tick = max(<long>lrint(time_ * ticks_per_sample), last)
+            track += _midi_vlq(tick - last)
+            last = tick
+            if data[0] == 0xf0:
+                track += b"\xf0" + _midi_vlq(len(data) - 1) + data[1:]
+            elif data[0] > 0xf0:
+                track += b"\xf7" + _midi_vlq(len(data)) + data
+            else:
+                track += data
+            count += 1
+        track += b"\x00\xff\x2f\x00"
+        with open(path, "wb") as f:
+            f.write(b"MThd" + struct.pack(">IHHH", 6, 0, 1, ticks_per_beat))
+            f.write(b"MTrk" + struct.pack(">I", len(track)))
+            f.write(track)
+        return count
+
+    def get_stats(self) -> dict:
+        """Returns the messages 'captured' and 'dropped' (ring full), and
+        the bytes 'pending' in the ring.
+        """
+        return {
+            "captured": lf.cy_atomic_load_uint(&self.mo.captured),
+            "dropped": lf.cy_atomic_load_uint(&self.mo.dropped),
+            "pending": lf.cy_ring_available(&self.mo.ring),
+        }
+
+
+## ----------------------------------------------------------------------------
+## Sound file writer
+
+cdef enum _SampleType:
+    _SAMPLE_FLOAT32 = 1
+    _SAMPLE_INT16 = 2
+    _SAMPLE_INT24 = 3
+
+cdef dict _SAMPLE_TYPES = {
+    "float32": (_SAMPLE_FLOAT32, 4),
+    "int16": (_SAMPLE_INT16, 2),
+    "int24": (_SAMPLE_INT24, 3),
+}
+
+cdef dict _SOUND_FILE_SUFFIXES = {
+    ".wav": "wav", ".wave": "wav", ".rf64": "rf64", ".w64": "w64",
+    ".aif": "aiff", ".aiff": "aiff", ".aifc": "aiff",
+}
+
+# Wave64 chunk GUIDs
+cdef bytes _W64_RIFF = b"riff\x2e\x91\xcf\x11\xa5\xd6\x28\xdb\x04\xc1\x00\x00"
+cdef bytes _W64_SUFFIX = b"\xf3\xac\xd3\x11\x8c\xd1\x00\xc0\x4f\x8e\xdb\x8a"
+
+# WAVE_FORMAT_EXTENSIBLE sub-format GUID, after the format tag
+cdef bytes _WAVE_SUBFORMAT = b"\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71"
+
+cdef unsigned long long _RIFF_MAX = 0xFFFFFFFF
+
+def _ieee_extended(double value):
+    """Encodes value as a big-endian 80-bit extended float (AIFF sample rate)."""
+    if value <= 0:
+        return bytes(10)
+    mantissa, exponent = math.frexp(value)
+    return struct.pack(">HQ", exponent - 1 + 16383, int(mantissa * 2.0 ** 64))
+
+
+cdef class SoundFileWriter:
+    """Writes interleaved MYFLT samples to a WAV, RF64, Wave64 or AIFF file.
+
+    Samples are scaled, clipped (integer types) and converted to float32,
+    int16 or int24 without the GIL, into a buffer written to the file in
+    'buffer_size' byte blocks. The header is written first with empty
+    sizes and patched by close(). A "wav" file grows into RF64 when it
+    exceeds 4 GB; AIFF files are limited to 4 GB.
+
+        with SoundFileWriter("out.wav", 48000, 2, sample_type="int24") as w:
+            w.write(block)      # (frames, nchnls) MYFLT buffer
+
+    Args:
+        path: the file to create.
+        sr: sample rate.
+        nchnls: number of channels.
+        format: "wav", "rf64", "w64" or "aiff" (default: from the file
+            extension, "wav" if unknown).
+        sample_type: "float32", "int16" or "int24".
+        buffer_size: size of the write buffer in bytes.
+        scale: factor applied to the samples, e.g. 1 / 0dbfs.
+    """
+
+    cdef stdio.FILE *file
+    cdef char *buffer
+    cdef size_t buffer_size
+    cdef size_t buffer_used
+    cdef int sample_type
+    cdef int sample_bytes
+    cdef bint big_endian
+    cdef bint failed
+    cdef int nchnls
+    cdef double scale
+    cdef unsigned long long frames_written
+    cdef unsigned long long max_data   # largest data chunk the format can hold
+    cdef readonly str format
+    cdef readonly double sr
+    cdef Py_ssize_t header_size
+
+    def __cinit__(self):
+        self.file = NULL
+        self.buffer = NULL
+
+    def __init__(self, path, double sr, int nchnls, format=None,
+                 str sample_type = "float32", Py_ssize_t buffer_size = 1 << 20,
+                 double scale = 1.0):
+        if format is None:
+            format = _SOUND_FILE_SUFFIXES.get(os.path.splitext(str(path))[1].lower(), "wav")
+        if format not in ("wav", "rf64", "w64", "aiff"):
+            raise ValueError(f"unsupported format: {format!r}")
+        if sample_type not in _SAMPLE_TYPES:
+            raise ValueError(f"unsupported sample type: {sample_type!r}")
+        if nchnls < 1 or sr <= 0:
+            raise ValueError("invalid number of channels or sample rate")
+        self.format = format
+        self.sr = sr
+        self.nchnls = nchnls
+        self.scale = scale
+        self.sample_type, self.sample_bytes = _SAMPLE_TYPES[sample_type]
+        self.big_endian = format == "aiff"
+        self.max_data = (1ULL << 63) if format in ("wav", "rf64", "w64") else _RIFF_MAX - 128
+        self.buffer_size = max(buffer_size, nchnls * 4)
+        self.buffer = <char*>malloc(self.buffer_size)
+        if self.buffer is NULL:
+            raise MemoryError
+        cdef bytes encoded = os.fsencode(path)
+        self.file = stdio.fopen(encoded, b"wb")
+        if self.file is NULL:
+            raise OSError(f"cannot open {path} for writing")
+        stdio.setvbuf(self.file, NULL, stdio._IONBF, 0)  # writes are already coalesced
+        self._write_header()
+
+    def __dealloc__(self):
+        if self.file is not NULL:
+            stdio.fclose(self.file)
+            self.file = NULL
+        free(self.buffer)
+        self.buffer = NULL
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    @property
+    def frames(self) -> int:
+        """Number of frames written."""
+        return self.frames_written
+
+    @property
+    def closed(self) -> bool:
+        return self.file is NULL
+
+    cdef bytes _header(self, bint final):
+        """Builds the file header for the frames written so far."""
+        cdef unsigned long long data = self.frames_written * self.nchnls * self.sample_bytes
+        cdef int bits = self.sample_bytes * 8
+        cdef int block_align = self.nchnls * self.sample_bytes
+        cdef bint is_float = self.sample_type == _SAMPLE_FLOAT32
+        cdef int tag = 3 if is_float else 1
+        cdef unsigned long long riff
+        sr = <unsigned int>(self.sr + 0.5)
+        if self.format == "aiff":
+            comm = struct.pack(">hIh", self.nchnls, <unsigned int>self.frames_written,
+                               bits) + _ieee_extended(self.sr)
+            if is_float:
+                comm += b"fl32\x0cIEEE float32\x00"
+                chunks = (b"FVER" + struct.pack(">II", 4, 0xA2805140)
+                          + b"COMM" + struct.pack(">I", len(comm)) + comm)
+            else:
+                chunks = b"COMM" + struct.pack(">I", len(comm)) + comm
+            ssnd = b"SSND" + struct.pack(">III", 8 + data, 0, 0)
+            return (b"FORM" + struct.pack(">I", 4 + len(chunks) + len(ssnd) + data + (data & 1))
+                    + (b"AIFC" if is_float else b"AIFF") + chunks + ssnd)
+
+        if self.nchnls > 2 or bits > 16:
+            fmt = struct.pack("<HHIIHHHHI", 0xFFFE, self.nchnls, sr, sr * block_align,
+                              block_align, bits, 22, bits, 0)
+            fmt += struct.pack("<H", tag) + _WAVE_SUBFORMAT
+        else:
+            fmt = struct.pack("<HHIIHH", tag, self.nchnls, sr, sr * block_align,
+                              block_align, bits)
+            if is_float:
+                fmt += b"\0\0"  # cbSize
+
+        if self.format == "w64":
+            fmt += bytes(-len(fmt) % 8)
+            head = (b"fmt " + _W64_SUFFIX + struct.pack("<Q", 24 + len(fmt)) + fmt
+                    + b"data" + _W64_SUFFIX + struct.pack("<Q", 24 + data))
+            riff = 40 + len(head) + data
+            riff += -riff % 8
+            return _W64_RIFF + struct.pack("<Q", riff) + b"wave" + _W64_SUFFIX + head
+
+        # WAV: a JUNK chunk reserves the room of the RF64 ds64 chunk
+        fact = b"fact" + struct.pack("<II", 4, min(self.frames_written, _RIFF_MAX)) if is_float else b""
+        chunks = b"fmt " + struct.pack("<I", len(fmt)) + fmt + fact
+        riff = 4 + 36 + len(chunks) + 8 + data + (data & 1)
+        if self.format == "rf64" or (final and riff > _RIFF_MAX):
+            return (b"RF64" + struct.pack("<I", _RIFF_MAX) + b"WAVE"
+                    + b"ds64" + struct.pack("<IQQQI", 28, riff, data, self.frames_written, 0)
+                    + chunks + b"data" + struct.pack("<I", _RIFF_MAX))
+        return (b"RIFF" + struct.pack("<I", min(riff, _RIFF_MAX)) + b"WAVE"
+                + b"JUNK" + struct.pack("<I", 28) + bytes(28)
+                + chunks + b"data" + struct.pack("<I", min(data, _RIFF_MAX)))
+
+    cdef _write_header(self):
+        cdef bytes header = self._header(False)
+        self.header_size = len(header)
+        if stdio.fwrite(<char*>header, 1, len(header), self.file) != <size_t>len(header):
+            self.failed = True
+
+    cdef int _flush(self) noexcept nogil:
+        if self.buffer_used and not self.failed:
+            if stdio.fwrite(self.buffer, 1, self.buffer_used, self.file) != self.buffer_used:
+                self.failed = True
+        self.buffer_used = 0
+        return -1 if self.failed else 0
+
+    cdef int write_myflt(self, const cs.MYFLT *src, Py_ssize_t frames) noexcept nogil:
+        """Converts and buffers frames of interleaved samples.
+
+        Returns -1 if writing failed or the file is full, 0 otherwise.
+        """
+        cdef Py_ssize_t n = frames * self.nchnls
+        cdef Py_ssize_t i
+        cdef double x
+        cdef float f
+        cdef uint32_t u
+        cdef int32_t v
+        cdef unsigned char *d
+        cdef int j
+        cdef int step = self.sample_bytes
+        if self.file is NULL or self.failed:
+            return -1
+        if (self.frames_written + frames) * self.nchnls * step > self.max_data:
+            self.failed = True
+            return -1
+        for i in range(n):
+            if self.buffer_used + step > self.buffer_size:
+                if self._flush() != 0:
+                    return -1
+            d = <unsigned char*>self.buffer + self.buffer_used
+            x = src[i] * self.scale
+            if self.sample_type == _SAMPLE_FLOAT32:
+                f = <float>x
+                memcpy(&u, &f, 4)
+            else:
+                if x > 1.0:
+                    x = 1.0
+                elif x < -1.0:
+                    x = -1.0
+                v = <int32_t>lrint(x * (32767.0 if step == 2 else 8388607.0))
+                u = <uint32_t>v
+            if self.big_endian:
+                for j in range(step):
+                    d[j] = (u >> (8 * (step - 1 - j))) & 0xff
+            else:
+                for j in range(step):
+                    d[j] = (u >> (8 * j)) & 0xff
+            self.buffer_used += step
+        self.frames_written += frames
+        return 0
+
+    def write(self, block):
+        """Writes a buffer of interleaved MYFLT samples (bytes, array.array
+        or a (frames, nchnls) numpy array).
+        """
+        cdef Py_buffer view
+        cdef Py_ssize_t n = _get_myflt_buffer(block, &view, False)
+        cdef int result
+        if n % self.nchnls:
+            PyBuffer_Release(&view)
+            raise ValueError(f"buffer size is not a multiple of {self.nchnls} channels")
+        try:
+            with nogil:
+                result = self.write_myflt(<const cs.MYFLT*>view.buf, n // self.nchnls)
+        finally:
+            PyBuffer_Release(&view)
+        if result != 0:
+            self._raise_error()
+
+    cdef _raise_error(self):
+        if self.file is NULL:
+            raise ValueError("write to closed sound file")
+        if (self.frames_written + 1) * self.nchnls * self.sample_bytes > self.max_data:
+            raise OSError(f"{self.format} file size limit reached")
+        raise OSError("error writing sound file")
+
+    def close(self):
+        """Writes the buffered samples, patches the header and closes the
+        file. Raises OSError if any write failed.
+        """
+        if self.file is NULL:
+            return
+        cdef bint failed
+        cdef bytes header
+        cdef unsigned long long data = self.frames_written * self.nchnls * self.sample_bytes
+        self._flush()
+        if not self.failed:
+            # pad byte of odd sized chunks, and 8-byte alignment of Wave64 files
+            pad = (-data % 8) if self.format == "w64" else (data & 1)
+            if pad and stdio.fwrite(b"\0\0\0\0\0\0\0\0", 1, pad, self.file) != pad:
+                self.failed = True
+        if not self.failed:
+            header = self._header(True)
+            if len(header) != self.header_size:
+                stdio.fclose(self.file)
+                self.file = NULL
+                raise RuntimeError(
+                    f"sound file header is {len(header)} bytes, "
+                    f"{self.header_size} were reserved")
+            if (stdio.fseek(self.file, 0, stdio.SEEK_SET) != 0
+                    or stdio.fwrite(<char*>header, 1, len(header), self.file)
+                    != <size_t>len(header)):
+                self.failed = True
+        if stdio.fclose(self.file) != 0:
+            self.failed = True
+        self.file = NULL
+        failed = self.failed
+        if failed:
+            raise OSError("error writing sound file")
+
+
 ## ----------------------------------------------------------------------------
 ## Opaque classes
 
 cdef class Tree:
-    """csound TREE class"""
+    """csound TREE class, a parsed orchestra returned by csound.parse_orc().
+
+    An owned tree is deleted with csoundDeleteTree() when the object is
+    garbage collected, unless csound.delete_tree() was called first. Trees
+    are allocated by Csound and freed by csound.reset(), so a tree can no
+    longer be used (or deleted) after csound.cleanup() or csound.reset().
+    """
 
     cdef cs.TREE* ptr
     cdef bint ptr_owner
+    cdef object csound            # the Csound instance which parsed the tree
+    cdef unsigned int generation
+
+    def __cinit__(self):
+        self.ptr = NULL
+        self.ptr_owner = False
+
+    def __dealloc__(self):
+        if self.ptr is not NULL and self.ptr_owner and self.valid:
+            cs.csoundDeleteTree((<Csound>self.csound).ptr, self.ptr)
+        self.ptr = NULL
+
+    def __init__(self):
+        raise TypeError("This cannot be instatiated directly")
 
     @staticmethod
-    cdef Tree from_ptr(cs.TREE* ptr, bint owner=False):
-        cdef Tree obj = Csound.__new__(Csound)
+    cdef Tree from_ptr(cs.TREE* ptr, object csound, bint owner=False):
+        cdef Tree obj = Tree.__new__(Tree)
         obj.ptr = ptr
         obj.ptr_owner = owner
+        obj.csound = csound
+        obj.generation = (<Csound>csound).generation
         return obj
 
+    @property
+    def valid(self) -> bool:
+        """False once deleted, or once the Csound instance has been cleaned
+        up or reset.
+        """
+        return (self.ptr is not NULL and self.csound is not None
+                and (<Csound>self.csound).ptr is not NULL
+                and self.generation == (<Csound>self.csound).generation)
+
 cdef class Params:
     """csound params class"""
 
@@ -571,15 +1903,89 @@ cdef class Csound:
 
     cdef cs.CSOUND* ptr
     cdef bint ptr_owner
+    cdef unsigned int generation  # bumped by cleanup() and reset()
+    cdef Py_ssize_t exports       # buffers currently exported by views
+    cdef _MessageRing *message_ring
+    cdef list async_buffers       # (time in samples, memoryview) kept for async copies
+    cdef object orc_cache         # OrderedDict of orchestra hash -> (TREE address, generation)
+    cdef int orc_cache_size
+    cdef Py_ssize_t orc_cache_hits
+    cdef Py_ssize_t orc_cache_misses
+    cdef _CycleStats *cycle_stats   # k-cycle timings, allocated on first use
+    cdef _ControlBatches *control_batches  # see set_control_channels()
+    cdef _RingAudio *audio_rings    # see ring_audio()
+    cdef _MidiInput *midi_input     # see midi_input_queue()
+    cdef _MidiOutput *midi_output   # see midi_output_capture()
 
     def __cinit__(self):
         self.ptr = NULL
         self.ptr_owner = False
+        self.generation = 0
+        self.exports = 0
+        self.message_ring = NULL
+        self.cycle_stats = NULL
+        self.control_batches = NULL
+        self.audio_rings = NULL
+        self.midi_input = NULL
+        self.midi_output = NULL
 
     def __dealloc__(self):
+        cdef _MessageRing **slot
+        cdef _RingAudio **audio_slot
+        cdef _MidiInput **midi_slot
+        cdef _MidiOutput **midi_out_slot
+        cdef _ControlBatches **batches_slot
         if self.ptr is not NULL and self.ptr_owner is True:
             cs.csoundDestroy(self.ptr)
             self.ptr = NULL
+        if self.message_ring is not NULL:
+            if self.ptr is not NULL:
+                slot = <_MessageRing**>cs.csoundQueryGlobalVariable(
+                    self.ptr, _MESSAGE_RING_KEY)
+                if slot is not NULL:
+                    slot[0] = NULL
+            lf.cy_ring_free(&self.message_ring.ring)
+            free(self.message_ring)
+            self.message_ring = NULL
+        if self.cycle_stats is not NULL:
+            free(self.cycle_stats.samples)
+            free(self.cycle_stats)
+            self.cycle_stats = NULL
+        if self.control_batches is not NULL:
+            if self.ptr is not NULL:
+                batches_slot = <_ControlBatches**>cs.csoundQueryGlobalVariable(
+                    self.ptr, _CONTROL_BATCHES_KEY)
+                if batches_slot is not NULL:
+                    batches_slot[0] = NULL
+            _control_batch_free(<_ControlBatch*>self.control_batches.pending)
+            free(self.control_batches)
+            self.control_batches = NULL
+        if self.audio_rings is not NULL:
+            if self.ptr is not NULL:
+                audio_slot = <_RingAudio**>cs.csoundQueryGlobalVariable(
+                    self.ptr, _RING_AUDIO_KEY)
+                if audio_slot is not NULL:
+                    audio_slot[0] = NULL
+            _ring_audio_free(self.audio_rings)
+            self.audio_rings = NULL
+        if self.midi_input is not NULL:
+            if self.ptr is not NULL:
+                midi_slot = <_MidiInput**>cs.csoundQueryGlobalVariable(
+                    self.ptr, _MIDI_INPUT_KEY)
+                if midi_slot is not NULL:
+                    midi_slot[0] = NULL
+            lf.cy_ring_free(&self.midi_input.ring)
+            free(self.midi_input)
+            self.midi_input = NULL
+        if self.midi_output is not NULL:
+            if self.ptr is not NULL:
+                midi_out_slot = <_MidiOutput**>cs.csoundQueryGlobalVariable(
+                    self.ptr, _MIDI_OUTPUT_KEY)
+                if midi_out_slot is not NULL:
+                    midi_out_slot[0] = NULL
+            lf.cy_ring_free(&self.midi_output.ring)
+            free(self.midi_output)
+            self.midi_output = NULL
 
     def __init__(self, object hostData = None):
         """Creates an instance of Csound.
@@ -606,6 +2012,10 @@ cdef class Csound:
         obj.ptr_owner = owner
         return obj
 
+    def csound(self) -> int:
+        """Returns the opaque pointer to the Csound instance as an integer."""
+        return <cs.uintptr_t>self.ptr
+
     def load_plugins(self, str directory):
         """Loads all plugins from a given directory."""
         return cs.csoundLoadPlugins(self.ptr, directory.encode())
@@ -617,28 +2027,135 @@ cdef class Csound:
         """Parse the given orchestra from an ASCII string into a TREE.
 
         This can be called during performance to parse new code.
+        Returns None if the orchestra could not be parsed.
         """
-        cdef cs.TREE *tree = cs.csoundParseOrc(self.ptr, orc.encode())
-        return Tree.from_ptr(tree)
+        cdef bytes encoded = orc.encode()
+        cdef const char* cstr = encoded
+        cdef cs.CSOUND* ptr = self.ptr
+        cdef cs.TREE *tree
+        with nogil:
+            tree = cs.csoundParseOrc(ptr, cstr)
+        if tree is NULL:
+            return None
+        return Tree.from_ptr(tree, self, True)
+
+    cdef cs.TREE *_tree_ptr(self, Tree tree) except NULL:
+        if tree.csound is not self:
+            raise ValueError("tree was parsed by another Csound instance")
+        if not tree.valid:
+            raise ValueError("tree was deleted, or Csound was cleaned up or reset")
+        return tree.ptr
 
     def compile_tree(self, Tree root) -> int:
         """Compile the given TREE node into structs for Csound to use.
 
         This can be called during performance to compile a new TREE.
         """
-        return cs.csoundCompileTree(self.ptr, root.ptr)
+        cdef cs.TREE *tree = self._tree_ptr(root)
+        cdef cs.CSOUND* ptr = self.ptr
+        cdef int result
+        with nogil:
+            result = cs.csoundCompileTree(ptr, tree)
+        return result
 
     def compile_tree_async(self, Tree root) -> int:
         """Asynchronous version of csound.compile_tree()"""
-        return cs.csoundCompileTreeAsync(self.ptr, root.ptr)
+        cdef cs.TREE *tree = self._tree_ptr(root)
+        cdef cs.CSOUND* ptr = self.ptr
+        cdef int result
+        with nogil:
+            result = cs.csoundCompileTreeAsync(ptr, tree)
+        return result
 
     def delete_tree(self, Tree tree):
         """Free the resources associated with the Tree instance
-        
-        This function should be called whenever a Tree was
-        created with csound.parse_orc() and memory can be deallocated.
+
+        Trees are also deleted when garbage collected; this function can
+        be called to release the memory early.
         """
-        cs.csoundDeleteTree(self.ptr, tree.ptr)
+        cs.csoundDeleteTree(self.ptr, self._tree_ptr(tree))
+        tree.ptr = NULL
+
+    def enable_orc_cache(self, int max_entries = 64):
+        """Caches the trees parsed by compile_orc() and compile_orc_async().
+
+        The orchestra text is hashed, and when the same text is compiled
+        again the cached tree is compiled directly, skipping the parser.
+        The 'max_entries' most recently used trees are kept; 0 disables
+        and clears the cache. The cache is cleared by csound.reset().
+        """
+        if max_entries < 0:
+            raise ValueError("max_entries must not be negative")
+        self.orc_cache_size = max_entries
+        if max_entries == 0:
+            self.clear_orc_cache()
+            self.orc_cache = None
+            return
+        if self.orc_cache is None:
+            self.orc_cache = OrderedDict()
+        self._trim_orc_cache()
+
+    def clear_orc_cache(self):
+        """Deletes all trees held by the orchestra cache."""
+        if self.orc_cache is not None:
+            for entry in self.orc_cache.values():
+                self._delete_cached_tree(entry)
+            self.orc_cache.clear()
+
+    # The cache holds bare tree pointers rather than Tree objects, which
+    # would reference the instance back and keep it alive in a cycle.
+
+    cdef _delete_cached_tree(self, tuple entry):
+        """Deletes a cached tree, unless cleanup() or reset() freed it."""
+        if entry[1] == self.generation:
+            cs.csoundDeleteTree(self.ptr, <cs.TREE*><cs.uintptr_t>entry[0])
+
+    cdef _trim_orc_cache(self):
+        """Deletes the least recently used trees beyond orc_cache_size."""
+        while len(self.orc_cache) > self.orc_cache_size:
+            self._delete_cached_tree(self.orc_cache.popitem(last=False)[1])
+
+    def get_orc_cache_stats(self) -> dict:
+        """Returns the orchestra cache 'hits', 'misses', number of 'entries'
+        and 'max_entries'.
+        """
+        return {
+            "hits": self.orc_cache_hits,
+            "misses": self.orc_cache_misses,
+            "entries": len(self.orc_cache) if self.orc_cache is not None else 0,
+            "max_entries": self.orc_cache_size,
+        }
+
+    cdef int _compile_orc_cached(self, bytes encoded, bint is_async) except? -2:
+        cdef cs.CSOUND* ptr = self.ptr
+        cdef const char* cstr = encoded
+        cdef cs.TREE *root
+        cdef int result
+        key = hashlib.blake2b(encoded, digest_size=16).digest()
+        entry = self.orc_cache.pop(key, None)
+        if entry is not None and entry[1] != self.generation:
+            entry = None  # freed by cleanup() or reset()
+        if entry is None:
+            self.orc_cache_misses += 1
+            with nogil:
+                root = cs.csoundParseOrc(ptr, cstr)
+            if root is NULL:
+                return cs.CSOUND_ERROR
+        else:
+            self.orc_cache_hits += 1
+            root = <cs.TREE*><cs.uintptr_t>entry[0]
+        with nogil:
+            if is_async:
+                result = cs.csoundCompileTreeAsync(ptr, root)
+            else:
+                result = cs.csoundCompileTree(ptr, root)
+        if result != 0:
+            cs.csoundDeleteTree(ptr, root)
+            return result
+        # most recently used last
+        self.orc_cache[key] = (<cs.uintptr_t>root, self.generation)
+        self._trim_orc_cache()
+        return result
 
     def compile_orc(self, str orc) -> int:
         """Parse and compile the given orchestra from an ASCII string.
@@ -653,6 +2170,8 @@ cdef class Csound:
         cdef const char* cstr = encoded
         cdef int result
         cdef cs.CSOUND* ptr = self.ptr
+        if self.orc_cache is not None:
+            return self._compile_orc_cached(encoded, False)
         with nogil:
             result = cs.csoundCompileOrc(ptr, cstr)
         return result
@@ -668,6 +2187,8 @@ cdef class Csound:
         cdef const char* cstr = encoded
         cdef int result
         cdef cs.CSOUND* ptr = self.ptr
+        if self.orc_cache is not None:
+            return self._compile_orc_cached(encoded, True)
         with nogil:
             result = cs.csoundCompileOrcAsync(ptr, cstr)
         return result
@@ -727,8 +2248,15 @@ cdef class Csound:
         """
         cdef int result
         cdef cs.CSOUND* ptr = self.ptr
+        if self.audio_rings is not NULL:
+            self._install_ring_audio()
+        if self.midi_input is not NULL or self.midi_output is not NULL:
+            self._install_host_midi()
+        self._install_control_batches()
         with nogil:
             result = cs.csoundStart(ptr)
+        if result == 0:
+            lf.cy_atomic_store_int(&self.control_batches.armed, 1)
         return result
 
     def compile(self, *args) -> int:
@@ -849,11 +2377,254 @@ cdef class Csound:
         """
         cdef int result
         cdef cs.CSOUND* ptr = self.ptr
+        cdef _CycleStats *stats = self.cycle_stats
         with nogil:
-            result = cs.csoundPerformKsmps(ptr)
+            result = _perform_ksmps_timed(ptr, stats)
         return result
 
 
+    def perform_ksmps_n(self, int n, object out = None) -> int:
+        """Performs up to n control cycles (ksmps) in a single call,
+        without the GIL.
+
+        If out is given, the contents of the output working buffer (spout)
+        are copied into it after each k-cycle. It must be a writable
+        C-contiguous buffer of MYFLT (bytearray, array.array, numpy array)
+        with room for n * ksmps * nchnls values, i.e. shape
+        (n * ksmps, nchnls) for a numpy array.
+
+        Note that csound.start() must be called first.
+
+        Returns the number of k-cycles performed; a value smaller than n
+        means the performance has finished.
+        """
+        cdef Py_buffer view
+        cdef cs.CSOUND* ptr = self.ptr
+        cdef char* dest = NULL
+        cdef size_t frame_bytes
+        cdef Py_ssize_t done
+        cdef bint finished = False
+        cdef _CycleStats *stats = self.cycle_stats
+        if n < 0:
+            raise ValueError("n must not be negative")
+        if out is not None:
+            frame_bytes = (cs.csoundGetKsmps(ptr) * cs.csoundGetNchnls(ptr)
+                           * sizeof(cs.MYFLT))
+            _get_myflt_buffer(out, &view, True)
+            if <size_t>view.len < <size_t>n * frame_bytes:
+                PyBuffer_Release(&view)
+                raise ValueError(
+                    f"buffer too small for {n} k-cycles: "
+                    f"need {n * frame_bytes} bytes, got {view.len}")
+            dest = <char*>view.buf
+        try:
+            with nogil:
+                done = _perform_into(ptr, dest, n, False, &finished, stats)
+        finally:
+            if dest is not NULL:
+                PyBuffer_Release(&view)
+        return done
+
+    def render_to_array(self, duration=None, dtype=None, int check_signals_every=1024):
+        """Performs the compiled score into an in-memory numpy array.
+
+        Enables host implemented audio I/O, so no audio file or device is
+        opened, then starts the performance and runs it without the GIL,
+        accumulating spout into a preallocated array that grows as needed.
+        Call this after compiling, instead of csound.start(). Requires numpy.
+
+        Args:
+            duration: stop after this many seconds of audio (optional,
+                defaults to the end of the score).
+            dtype: numpy.float64 or numpy.float32 (default: the MYFLT type).
+            check_signals_every: number of k-cycles between checks for
+                pending signals (Ctrl-C).
+
+        Returns:
+            A (frames, nchnls) array and the sample rate.
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("render_to_array() requires numpy") from None
+        dt = np.dtype(_MYFLT_FORMAT if dtype is None else dtype)
+        if dt.kind != 'f' or dt.itemsize not in (4, sizeof(cs.MYFLT)):
+            raise ValueError(f"unsupported dtype {dt}, use float32 or float64")
+        if check_signals_every <= 0:
+            raise ValueError("check_signals_every must be positive")
+        if duration is not None and duration < 0:
+            raise ValueError("duration must not be negative")
+        cdef bint to_float32 = dt.itemsize == 4 and sizeof(cs.MYFLT) != 4
+        cdef cs.CSOUND* ptr = self.ptr
+        cs.csoundSetHostImplementedAudioIO(ptr, 1, 0)
+        cdef int result = self.start()
+        if result != 0:
+            raise RuntimeError(f"csound.start() failed with status {result}")
+
+        cdef Py_ssize_t ksmps = cs.csoundGetKsmps(ptr)
+        cdef Py_ssize_t nchnls = cs.csoundGetNchnls(ptr)
+        cdef Py_ssize_t frame_bytes = ksmps * nchnls * dt.itemsize
+        cdef Py_ssize_t limit = -1
+        cdef Py_ssize_t capacity, chunk, n
+        cdef Py_ssize_t done = 0
+        cdef bint finished = False
+        cdef _CycleStats *stats = self.cycle_stats
+        cdef Py_buffer view
+        cdef char* base
+        if duration is not None:
+            limit = <Py_ssize_t>(duration * cs.csoundGetKr(ptr) + 0.5)
+            capacity = limit
+        else:
+            capacity = max(<Py_ssize_t>cs.csoundGetKr(ptr), 1)  # one second
+        out = np.empty((capacity * ksmps, nchnls), dtype=dt)
+        while not finished and (limit < 0 or done < limit):
+            if done == capacity:
+                capacity *= 2
+                grown = np.empty((capacity * ksmps, nchnls), dtype=dt)
+                grown[:done * ksmps] = out[:done * ksmps]
+                out = grown
+            chunk = min(capacity - done, check_signals_every)
+            PyObject_GetBuffer(out, &view, PyBUF_C_CONTIGUOUS | PyBUF_WRITABLE)
+            base = <char*>view.buf + done * frame_bytes
+            with nogil:
+                n = _perform_into(ptr, base, chunk, to_float32, &finished, stats)
+            PyBuffer_Release(&view)
+            done += n
+            PyErr_CheckSignals()
+        if done < capacity:
+            # do not keep the unused part of the buffer alive
+            out = out[:done * ksmps].copy()
+        return out, cs.csoundGetSr(ptr)
+
+    def render_to_file(self, path, duration=None, format=None, str sample_type = "float32",
+                       Py_ssize_t buffer_size = 1 << 20, int check_signals_every = 1024) -> int:
+        """Performs the compiled score into a sound file written in-process.
+
+        Enables host implemented audio I/O, so Csound opens no audio file
+        or device, then starts the performance and runs it without the
+        GIL, passing spout to a SoundFileWriter after each k-cycle. Samples
+        are scaled by 1 / 0dbfs. Call this after compiling, instead of
+        csound.start().
+
+        Args:
+            path: the sound file to create.
+            duration: stop after this many seconds of audio (optional,
+                defaults to the end of the score).
+            format: "wav" (RF64 above 4 GB), "rf64", "w64" or "aiff"
+                (default: from the file extension).
+            sample_type: "float32", "int16" or "int24".
+            buffer_size: size of the write buffer in bytes.
+            check_signals_every: number of k-cycles between checks for
+                pending signals (Ctrl-C).
+
+        Returns:
+            The number of frames written.
+        """
+        if check_signals_every <= 0:
+            raise ValueError("check_signals_every must be positive")
+        cdef cs.CSOUND* ptr = self.ptr
+        cs.csoundSetHostImplementedAudioIO(ptr, 1, 0)
+        cdef int result = self.start()
+        if result != 0:
+            raise RuntimeError(f"csound.start() failed with status {result}")
+
+        cdef Py_ssize_t ksmps = cs.csoundGetKsmps(ptr)
+        cdef Py_ssize_t limit = -1
+        cdef Py_ssize_t done = 0
+        cdef Py_ssize_t chunk, i
+        cdef bint finished = False
+        cdef bint failed = False
+        cdef _CycleStats *stats = self.cycle_stats
+        cdef const cs.MYFLT *spout = cs.csoundGetSpout(ptr)
+        cdef SoundFileWriter writer = SoundFileWriter(
+            path, cs.csoundGetSr(ptr), cs.csoundGetNchnls(ptr), format, sample_type,
+            buffer_size, 1.0 / cs.csoundGet0dBFS(ptr))
+        if duration is not None:
+            limit = <Py_ssize_t>(duration * cs.csoundGetKr(ptr) + 0.5)
+        try:
+            while not finished and not failed and (limit < 0 or done < limit):
+                chunk = check_signals_every if limit < 0 else min(limit - done, check_signals_every)
+                with nogil:
+                    for i in range(chunk):
+                        if _perform_ksmps_timed(ptr, stats) != 0:
+                            finished = True
+                            break
+                        if writer.write_myflt(spout, ksmps) != 0:
+                            failed = True
+                            break
+                        done += 1
+                PyErr_CheckSignals()
+            if failed:
+                writer._raise_error()
+        except BaseException:
+            try:
+                writer.close()
+            except OSError:
+                pass
+            raise
+        writer.close()
+        return writer.frames
+
+    def iter_blocks(self, int frames = 0, int ring = 2, bint as_array = False):
+        """Performs Csound block by block, yielding the output of each block.
+
+        Every step performs frames / ksmps k-cycles without the GIL and
+        yields the collected spout as a read-only (frames, nchnls) MYFLT
+        memoryview (or numpy array if as_array is True). The last block is
+        shorter if the performance ends inside it.
+
+        The blocks come from a ring of preallocated buffers that is reused,
+        so nothing is allocated per step: a yielded block is only valid
+        until the generator has advanced 'ring' more times. Copy it if it
+        must be kept longer.
+
+        Note that csound.start() must be called first.
+
+        Args:
+            frames: frames per block, rounded up to a multiple of ksmps
+                (default: ksmps).
+            ring: number of buffers in the ring.
+            as_array: yield numpy arrays instead of memoryviews.
+        """
+        if ring < 1:
+            raise ValueError("ring must be at least 1")
+        cdef cs.CSOUND* ptr = self.ptr
+        cdef Py_ssize_t ksmps = cs.csoundGetKsmps(ptr)
+        cdef Py_ssize_t nchnls = cs.csoundGetNchnls(ptr)
+        cdef Py_ssize_t cycles = max((frames + ksmps - 1) // ksmps, 1)
+        cdef Py_ssize_t block_frames = cycles * ksmps
+        cdef Py_ssize_t n
+        cdef bint finished = False
+        cdef _CycleStats *stats = self.cycle_stats
+        cdef char* dest
+        cdef int slot = 0
+
+        buffers = [bytearray(block_frames * nchnls * sizeof(cs.MYFLT)) for _ in range(ring)]
+        if as_array:
+            import numpy as np
+            blocks = []
+            for buf in buffers:
+                arr = np.frombuffer(buf, dtype=_MYFLT_FORMAT).reshape(block_frames, nchnls)
+                arr.flags.writeable = False
+                blocks.append(arr)
+        else:
+            blocks = [memoryview(buf).cast(_MYFLT_FORMAT, (block_frames, nchnls)).toreadonly()
+                      for buf in buffers]
+
+        while not finished:
+            dest = buffers[slot]
+            with nogil:
+                n = _perform_into(ptr, dest, cycles, False, &finished, stats)
+            if n == cycles:
+                yield blocks[slot]
+            elif n > 0 and as_array:
+                yield blocks[slot][:n * ksmps]
+            elif n > 0:
+                # multi-dimensional memoryviews cannot be sliced
+                yield (memoryview(buffers[slot])[:n * ksmps * nchnls * sizeof(cs.MYFLT)]
+                       .cast(_MYFLT_FORMAT, (n * ksmps, nchnls)).toreadonly())
+            slot = (slot + 1) % ring
+
     def perform_buffer(self) -> int:
         """Performs Csound, sensing real-time and score events
         and processing one buffer's worth (-b frames) of interleaved audio.
@@ -885,12 +2656,17 @@ cdef class Csound:
         and MIDI devices.
 
         Note: after calling csound.cleanup(), the operation of the perform
-        functions is undefined.
+        functions is undefined. Buffer views obtained before the call can
+        no longer be exported.
         """
         cdef int result
         cdef cs.CSOUND* ptr = self.ptr
+        self._disarm_control_batches()
         with nogil:
             result = cs.csoundCleanup(ptr)
+        self.generation += 1
+        # no k-cycle will run the pending async copies any more
+        self.async_buffers = None
         return result
 
     def reset(self):
@@ -898,20 +2674,44 @@ cdef class Csound:
 
         Enables external software to run successive Csound performances
         without reloading Csound. Implies csound.cleanup(), unless already called.
+
+        Raises BufferError if memory owned by Csound is still exported
+        through a buffer view (e.g. a memoryview or numpy array of
+        csound.spout_view()); release those first.
         """
+        if self.exports:
+            raise BufferError(
+                "cannot reset while Csound buffers are exported; release them first")
         cdef cs.CSOUND* ptr = self.ptr
+        self._disarm_control_batches()
         with nogil:
             cs.csoundReset(ptr)
+        self.generation += 1
+        self.async_buffers = None
+        self.clear_orc_cache()
+        if self.message_ring is not NULL:
+            self._install_message_ring()
 
-    def run(self) -> int:
+    def run(self, max_seconds=None, max_cycles=None, int check_signals_every=1000) -> int:
         """Perform the entire score from start to finish.
 
-        This is a convenience method that calls start() and then
-        repeatedly calls perform_ksmps() until the score is finished.
+        This is a convenience method that calls start() and then performs
+        k-cycles in a loop that runs without the GIL, until the score is
+        finished, a cycle or time budget is exhausted, or a Python signal
+        (e.g. Ctrl-C) is pending.
+
+        Args:
+            max_seconds: stop after this many seconds of audio (optional).
+            max_cycles: stop after this many k-cycles (optional).
+            check_signals_every: number of k-cycles between checks for
+                pending signals (default 1000, 0 disables the check).
 
         Returns:
             0 on success, non-zero on error.
 
+        Raises:
+            KeyboardInterrupt: if interrupted by the user.
+
         Example:
             with Csound() as cs:
                 cs.compile_csd("score.csd")
@@ -920,9 +2720,158 @@ cdef class Csound:
         cdef int result = self.start()
         if result != 0:
             return result
-        while not self.perform_ksmps():
-            pass
-        return 0
+        cdef long long limit = -1
+        cdef long long seconds_limit
+        if max_cycles is not None:
+            limit = max_cycles
+        if max_seconds is not None:
+            seconds_limit = <long long>(max_seconds * cs.csoundGetKr(self.ptr) + 0.5)
+            if limit < 0 or seconds_limit < limit:
+                limit = seconds_limit
+        result = self._perform_loop(limit, check_signals_every)
+        return result if result < 0 else 0
+
+    cdef int _perform_loop(self, long long max_cycles, int check_signals_every) except? -1:
+        """Calls csoundPerformKsmps() without the GIL until the end of the
+        score, or until max_cycles k-cycles have been performed (if not
+        negative).
+
+        Every check_signals_every k-cycles the GIL is taken briefly to run
+        pending signal handlers; an exception raised by a handler ends the
+        loop and is propagated.
+
+        Returns the status of the last csoundPerformKsmps() call.
+        """
+        cdef cs.CSOUND* ptr = self.ptr
+        cdef _CycleStats *stats = self.cycle_stats
+        cdef long long n = 0
+        cdef int countdown = check_signals_every
+        cdef int result = 0
+        with nogil:
+            while max_cycles < 0 or n < max_cycles:
+                result = _perform_ksmps_timed(ptr, stats)
+                n += 1
+                if result != 0:
+                    break
+                if check_signals_every > 0:
+                    countdown -= 1
+                    if countdown == 0:
+                        countdown = check_signals_every
+                        with gil:
+                            PyErr_CheckSignals()
+        return result
+
+    cdef _CycleStats *_get_cycle_stats(self) except NULL:
+        """Returns the k-cycle statistics, allocating them (disabled)."""
+        if self.cycle_stats is NULL:
+            self.cycle_stats = <_CycleStats*>calloc(1, sizeof(_CycleStats))
+            if self.cycle_stats is NULL:
+                raise MemoryError
+            cs.csoundInitTimerStruct(&self.cycle_stats.clock)
+            cs.csoundSpinLockInit(&self.cycle_stats.lock)
+            self.cycle_stats.rng = 0x9E3779B97F4A7C15
+            _cycle_stats_clear(self.cycle_stats)
+        return self.cycle_stats
+
+    def enable_cycle_stats(self, bint enabled = True, budget = None, samples = None):
+        """Times every k-cycle performed by perform_ksmps(), perform_ksmps_n(),
+        run(), render_to_array(), iter_blocks() and CsoundPerformanceThread.
+
+        csound.perform() runs its loop inside Csound and is not timed.
+        A k-cycle taking longer than 'budget' seconds (default: ksmps / sr,
+        the realtime deadline) is counted as a deadline miss. Statistics
+        are kept when disabling; see get_cycle_stats() and
+        reset_cycle_stats().
+
+        If 'samples' is given, the durations of up to that many k-cycles
+        are also kept, a uniform random sample of all timed k-cycles once
+        there are more (0 stops keeping them); see get_cycle_times().
+        """
+        cdef _CycleStats *st = self._get_cycle_stats()
+        cdef double deadline = 0.0 if budget is None else budget
+        cdef double *buffer = NULL
+        cdef unsigned long long size = 0
+        if deadline < 0.0:
+            raise ValueError("budget must not be negative")
+        if samples is not None:
+            if samples < 0:
+                raise ValueError("samples must not be negative")
+            size = samples
+            if size:
+                buffer = <double*>malloc(size * sizeof(double))
+                if buffer is NULL:
+                    raise MemoryError
+        cs.csoundSpinLock(&st.lock)
+        st.budget = deadline
+        if samples is not None:
+            buffer, st.samples = st.samples, buffer
+            st.samples_size = size
+            st.samples_seen = 0
+        cs.csoundSpinUnLock(&st.lock)
+        if samples is not None:
+            free(buffer)  # the previous one
+        lf.cy_atomic_store_int(&st.enabled, enabled)
+
+    def reset_cycle_stats(self):
+        """Clears the k-cycle statistics."""
+        if self.cycle_stats is not NULL:
+            _cycle_stats_clear(self.cycle_stats)
+
+    def get_cycle_times(self):
+        """Returns the k-cycle durations kept since enable_cycle_stats(samples=n)
+        or reset_cycle_stats(), in seconds, as an array.array of doubles.
+
+        They are in performance order until n k-cycles have been timed,
+        and a uniform random sample of all of them, unordered, afterwards.
+        """
+        cdef _CycleStats *st = self._get_cycle_stats()
+        cdef unsigned long long n
+        cdef Py_buffer view
+        out = array.array('d', bytes(st.samples_size * sizeof(double)))
+        PyObject_GetBuffer(out, &view, PyBUF_C_CONTIGUOUS | PyBUF_WRITABLE)
+        cs.csoundSpinLock(&st.lock)
+        n = min(st.samples_seen, st.samples_size, <unsigned long long>len(out))
+        if n:
+            memcpy(view.buf, st.samples, n * sizeof(double))
+        cs.csoundSpinUnLock(&st.lock)
+        PyBuffer_Release(&view)
+        del out[n:]
+        return out
+
+    def get_cycle_stats(self) -> dict:
+        """Returns the k-cycle statistics, without stopping the performance.
+
+        Times are in seconds: 'count' timed k-cycles, 'misses' (over the
+        'budget'), 'min', 'max', 'mean' and 'last' real time per k-cycle,
+        'cpu_mean' CPU time per k-cycle, 'total' and 'cpu_total'. The
+        'histogram' is a list of (upper bound, count) pairs with power of
+        two bounds from 1 microsecond; the last bound is infinite.
+        """
+        cdef _CycleStats *st = self._get_cycle_stats()
+        cdef _CycleStats snapshot
+        cs.csoundSpinLock(&st.lock)
+        memcpy(&snapshot, st, sizeof(_CycleStats))
+        cs.csoundSpinUnLock(&st.lock)
+        budget = snapshot.budget
+        if budget <= 0.0:
+            budget = cs.csoundGetKsmps(self.ptr) / <double>cs.csoundGetSr(self.ptr)
+        n = snapshot.count
+        bounds = [2.0 ** i * 1e-6 for i in range(_CYCLE_HISTOGRAM_SIZE - 1)] + [INFINITY]
+        return {
+            "enabled": bool(lf.cy_atomic_load_int(&st.enabled)),
+            "budget": budget,
+            "count": n,
+            "misses": snapshot.misses,
+            "min": snapshot.min if n else 0.0,
+            "max": snapshot.max,
+            "mean": snapshot.total / n if n else 0.0,
+            "last": snapshot.last,
+            "cpu_mean": snapshot.cpu_total / n if n else 0.0,
+            "total": snapshot.total,
+            "cpu_total": snapshot.cpu_total,
+            "histogram": [(bounds[i], snapshot.histogram[i])
+                          for i in range(_CYCLE_HISTOGRAM_SIZE)],
+        }
 
     ## ----------------------------------------------------------------------------
     ## UDP server
@@ -1240,6 +3189,37 @@ cdef class Csound:
         """
         return cs.csoundGetSpoutSample(self.ptr, frame, channel)
 
+    def spin_view(self) -> AudioBuffer:
+        """Returns a zero-copy view of the audio input working buffer (spin).
+
+        The view implements the buffer protocol with shape
+        (ksmps, nchnls_input); write into it before calling
+        csound.perform_ksmps(). Only valid after csound.start().
+        """
+        return AudioBuffer.create(self, _SPIN)
+
+    def spout_view(self) -> AudioBuffer:
+        """Returns a read-only zero-copy view of the audio output working
+        buffer (spout).
+
+        The view implements the buffer protocol with shape (ksmps, nchnls);
+        read from it after calling csound.perform_ksmps(). Only valid after
+        csound.start().
+        """
+        return AudioBuffer.create(self, _SPOUT)
+
+    def input_buffer_view(self) -> AudioBuffer:
+        """Returns a zero-copy view of the audio input buffer, with shape
+        (-b frames, nchnls_input), for use with csound.perform_buffer().
+        """
+        return AudioBuffer.create(self, _INPUT_BUFFER)
+
+    def output_buffer_view(self) -> AudioBuffer:
+        """Returns a read-only zero-copy view of the audio output buffer,
+        with shape (-b frames, nchnls), for use with csound.perform_buffer().
+        """
+        return AudioBuffer.create(self, _OUTPUT_BUFFER)
+
     cdef void **get_rt_record_userdata(self):
         """Return pointer to user data pointer for real time audio input."""
         return cs.csoundGetRtRecordUserData(self.ptr)
@@ -1286,6 +3266,94 @@ cdef class Csound:
         return cs.csoundGetAudioDevList(self.ptr, list, is_output)
 
 
+    def ring_audio(self, int frames = 8192, double timeout = 1.0) -> RingAudio:
+        """Replaces the rtaudio module with lock-free rings exchanged with
+        the host through the returned RingAudio.
+
+        Real-time output (-odac) and input (-iadc) go through two rings of
+        'frames' sample frames each. When a ring is full (output) or empty
+        (input), Csound waits up to 'timeout' seconds for the host, then
+        drops the output or records zeros and carries on.
+
+        Takes effect at the next start(); calling it again only updates
+        'timeout'. The rings survive reset() and are resized when the
+        channel count changes, once the host's reads and writes in
+        progress have returned.
+        """
+        if frames < 1:
+            raise ValueError("frames must be positive")
+        if timeout < 0:
+            raise ValueError("timeout must not be negative")
+        if self.audio_rings is NULL:
+            self.audio_rings = <_RingAudio*>calloc(1, sizeof(_RingAudio))
+            if self.audio_rings is NULL:
+                raise MemoryError
+            self.audio_rings.frames = frames
+            self.audio_rings.output_data = create_thread_lock()
+            self.audio_rings.output_space = create_thread_lock()
+            self.audio_rings.input_data = create_thread_lock()
+            self.audio_rings.input_space = create_thread_lock()
+            if (self.audio_rings.output_data is NULL or self.audio_rings.output_space is NULL
+                    or self.audio_rings.input_data is NULL
+                    or self.audio_rings.input_space is NULL):
+                _ring_audio_free(self.audio_rings)
+                self.audio_rings = NULL
+                raise RuntimeError("could not create ring audio locks")
+        lf.cy_atomic_store_uint(&self.audio_rings.timeout_ms, <unsigned int>(timeout * 1000))
+        return RingAudio.create(self)
+
+    cdef _install_control_batches(self):
+        """Registers the sense event callback applying the batches of
+        set_control_channels() at the start of every k-cycle. Csound
+        clears it in csoundCleanup(), so start() calls this every time.
+        """
+        cdef _ControlBatches **slot
+        if self.control_batches is NULL:
+            self.control_batches = <_ControlBatches*>calloc(1, sizeof(_ControlBatches))
+            if self.control_batches is NULL:
+                raise MemoryError
+        elif lf.cy_atomic_load_int(&self.control_batches.armed):
+            return  # started again without cleanup(): still registered
+        slot = <_ControlBatches**>cs.csoundQueryGlobalVariable(
+            self.ptr, _CONTROL_BATCHES_KEY)
+        if slot is NULL:
+            if cs.csoundCreateGlobalVariable(self.ptr, _CONTROL_BATCHES_KEY,
+                                             sizeof(_ControlBatches*)) != 0:
+                raise MemoryError
+            slot = <_ControlBatches**>cs.csoundQueryGlobalVariable(
+                self.ptr, _CONTROL_BATCHES_KEY)
+        slot[0] = self.control_batches
+        if cs.csoundRegisterSenseEventCallback(self.ptr, _control_batches_sense, slot) != 0:
+            raise MemoryError
+
+    cdef _disarm_control_batches(self):
+        """Called once no k-cycle applies the batches any more (cleanup,
+        reset, end of a CsoundPerformanceThread): applies the pending one,
+        while the channel pointers are still valid, and makes
+        set_control_channels() store directly until the next start().
+        """
+        if self.control_batches is not NULL:
+            lf.cy_atomic_store_int(&self.control_batches.armed, 0)
+            _control_batches_flush(self.control_batches)
+
+    cdef _install_ring_audio(self):
+        cdef _RingAudio **slot = <_RingAudio**>cs.csoundQueryGlobalVariable(
+            self.ptr, _RING_AUDIO_KEY)
+        if slot is NULL:
+            if cs.csoundCreateGlobalVariable(self.ptr, _RING_AUDIO_KEY,
+                                             sizeof(_RingAudio*)) != 0:
+                raise MemoryError
+            slot = <_RingAudio**>cs.csoundQueryGlobalVariable(
+                self.ptr, _RING_AUDIO_KEY)
+        slot[0] = self.audio_rings
+        # "null" keeps Csound from loading a real module over our callbacks
+        cs.csoundSetRTAudioModule(self.ptr, b"null")
+        cs.csoundSetPlayopenCallback(self.ptr, _ring_audio_playopen)
+        cs.csoundSetRtplayCallback(self.ptr, _ring_audio_rtplay)
+        cs.csoundSetRecopenCallback(self.ptr, _ring_audio_recopen)
+        cs.csoundSetRtrecordCallback(self.ptr, _ring_audio_rtrecord)
+        cs.csoundSetRtcloseCallback(self.ptr, _ring_audio_rtclose)
+
     cdef set_play_open_callback(self, int (*playopen__)(cs.CSOUND *, const cs.csRtAudioParams *parm) noexcept):
         """Sets a function to be called by Csound for opening real-time audio playback."""
         cs.csoundSetPlayopenCallback(self.ptr, playopen__)
@@ -1344,6 +3412,80 @@ cdef class Csound:
         """
         return cs.csoundGetMIDIDevList(self.ptr, list, isOutput)
 
+    def midi_input_queue(self, int size = 65536) -> MidiInputQueue:
+        """Feeds Csound's real-time MIDI input from a lock-free queue of
+        'size' bytes, filled from Python with the returned MidiInputQueue.
+
+        Enables host-implemented MIDI I/O and selects MIDI input (-M0), so
+        call it before compiling, like set_option(), and again after
+        reset(). The read callbacks are installed by start(), replacing
+        the rtmidi module's. Calling it again returns the same queue.
+        """
+        cdef cs.CSOUND *ptr = self.ptr
+        if self.midi_input is NULL:
+            if size < 1:
+                raise ValueError("size must be positive")
+            self.midi_input = <_MidiInput*>calloc(1, sizeof(_MidiInput))
+            if self.midi_input is NULL:
+                raise MemoryError
+            if lf.cy_ring_init(&self.midi_input.ring, size, 1) != 0:
+                free(self.midi_input)
+                self.midi_input = NULL
+                raise MemoryError
+        cs.csoundSetHostImplementedMIDIIO(ptr, 1)
+        cs.csoundSetMIDIInput(ptr, b"0")
+        return MidiInputQueue.create(self)
+
+    def midi_output_capture(self, int size = 65536) -> MidiOutputCapture:
+        """Captures Csound's real-time MIDI output into a lock-free ring of
+        'size' bytes, drained from Python with the returned
+        MidiOutputCapture, e.g. into a standard MIDI file.
+
+        Enables host-implemented MIDI I/O and selects MIDI output (-Q0), so
+        call it before compiling, like set_option(), and again after
+        reset(). The write callbacks are installed by start(), replacing
+        the rtmidi module's. Calling it again returns the same capture.
+        """
+        cdef cs.CSOUND *ptr = self.ptr
+        if self.midi_output is NULL:
+            if size < 64:
+                raise ValueError("size must be at least 64 bytes")
+            self.midi_output = <_MidiOutput*>calloc(1, sizeof(_MidiOutput))
+            if self.midi_output is NULL:
+                raise MemoryError
+            if lf.cy_ring_init(&self.midi_output.ring, size, 1) != 0:
+                free(self.midi_output)
+                self.midi_output = NULL
+                raise MemoryError
+        cs.csoundSetHostImplementedMIDIIO(ptr, 1)
+        cs.csoundSetMIDIOutput(ptr, b"0")
+        return MidiOutputCapture.create(self)
+
+    cdef void **_global_pointer(self, const char *key) except NULL:
+        """Returns the pointer-sized Csound global variable 'key',
+        creating it if needed."""
+        cdef void **slot = <void**>cs.csoundQueryGlobalVariable(self.ptr, key)
+        if slot is NULL:
+            if cs.csoundCreateGlobalVariable(self.ptr, key, sizeof(void*)) != 0:
+                raise MemoryError
+            slot = <void**>cs.csoundQueryGlobalVariable(self.ptr, key)
+        return slot
+
+    cdef _install_host_midi(self):
+        # "null" keeps Csound from loading a real module over our callbacks
+        cs.csoundSetMIDIModule(self.ptr, b"null")
+        cs.csoundSetHostImplementedMIDIIO(self.ptr, 1)
+        if self.midi_input is not NULL:
+            self._global_pointer(_MIDI_INPUT_KEY)[0] = self.midi_input
+            cs.csoundSetExternalMidiInOpenCallback(self.ptr, _midi_input_open)
+            cs.csoundSetExternalMidiReadCallback(self.ptr, _midi_input_read)
+            cs.csoundSetExternalMidiInCloseCallback(self.ptr, _midi_input_close)
+        if self.midi_output is not NULL:
+            self._global_pointer(_MIDI_OUTPUT_KEY)[0] = self.midi_output
+            cs.csoundSetExternalMidiOutOpenCallback(self.ptr, _midi_output_open)
+            cs.csoundSetExternalMidiWriteCallback(self.ptr, _midi_output_write)
+            cs.csoundSetExternalMidiOutCloseCallback(self.ptr, _midi_output_close)
+
     cdef set_external_midi_in_open_callback(self, int (*func)(cs.CSOUND *, void **userData, const char *devName) noexcept):
         """Sets callback for opening real time MIDI input."""
         cs.csoundSetExternalMidiInOpenCallback(self.ptr, func)
@@ -1520,7 +3662,7 @@ cdef class Csound:
         """Sets the Csound message level (from 0 to 231)."""
         cs.csoundSetMessageLevel(self.ptr, msg_level)
 
-    cdef create_message_buffer(self, int to_stdout):
+    def create_message_buffer(self, int to_stdout):
         """Creates a buffer for storing messages printed by Csound.
         Should be called after creating a Csound instance andthe buffer
         can be freed by calling csoundDestroyMessageBuffer() before
@@ -1537,6 +3679,97 @@ cdef class Csound:
         """
         cs.csoundCreateMessageBuffer(self.ptr, to_stdout)
 
+    def create_message_ring(self, int size = 65536, types = None):
+        """Routes Csound messages into a lock-free ring buffer, to be
+        collected with drain_messages().
+
+        The message callback copies each message into a ring of 'size'
+        bytes without calling into Python, so verbose orchestras do not
+        stall the audio thread. Messages whose type (see Msg) is not in
+        'types' are discarded before copying (None keeps all types), and
+        messages that do not fit are dropped; see get_message_ring_stats().
+
+        Calling it again only updates the type filter. Like
+        set_message_string_callback(), this replaces the message buffer
+        and any other message callback.
+        """
+        cdef unsigned int mask = _message_type_mask(types)
+        if self.message_ring is not NULL:
+            lf.cy_atomic_store_uint(&self.message_ring.type_mask, mask)
+            return
+        if size < 64:
+            raise ValueError("size must be at least 64 bytes")
+        self.message_ring = <_MessageRing*>calloc(1, sizeof(_MessageRing))
+        if self.message_ring is NULL:
+            raise MemoryError
+        if lf.cy_ring_init(&self.message_ring.ring, size, 1) != 0:
+            free(self.message_ring)
+            self.message_ring = NULL
+            raise MemoryError
+        cs.csoundSpinLockInit(&self.message_ring.lock)
+        self.message_ring.type_mask = mask
+        self._install_message_ring()
+
+    cdef _install_message_ring(self):
+        cdef _MessageRing **slot = <_MessageRing**>cs.csoundQueryGlobalVariable(
+            self.ptr, _MESSAGE_RING_KEY)
+        if slot is NULL:
+            if cs.csoundCreateGlobalVariable(self.ptr, _MESSAGE_RING_KEY,
+                                             sizeof(_MessageRing*)) != 0:
+                raise MemoryError
+            slot = <_MessageRing**>cs.csoundQueryGlobalVariable(
+                self.ptr, _MESSAGE_RING_KEY)
+        slot[0] = self.message_ring
+        cs.csoundSetMessageStringCallback(self.ptr, _message_ring_callback)
+
+    def drain_messages(self, bint packed = False):
+        """Removes all pending messages from the message ring.
+
+        Returns a list of (attr, text) tuples, or if 'packed' is True, the
+        raw bytes of the records: each is a native int attr and unsigned
+        int length, followed by 'length' bytes of text.
+        """
+        cdef _MessageRing *mr = self.message_ring
+        cdef _MessageHeader header
+        cdef unsigned int n
+        cdef size_t pos = 0
+        cdef const char *data
+        if mr is NULL:
+            raise RuntimeError("no message ring, call create_message_ring() first")
+        n = lf.cy_ring_available(&mr.ring)
+        block = PyBytes_FromStringAndSize(NULL, n)
+        data = PyBytes_AS_STRING(block)
+        lf.cy_ring_peek(&mr.ring, <char*>data, n)
+        messages = []
+        # a message being written may be incomplete: stop before it
+        while pos + sizeof(_MessageHeader) <= n:
+            memcpy(&header, data + pos, sizeof(_MessageHeader))
+            if pos + sizeof(_MessageHeader) + header.length > n:
+                break
+            if not packed:
+                text = data[pos + sizeof(_MessageHeader):
+                            pos + sizeof(_MessageHeader) + header.length]
+                messages.append((header.attr, text.decode("utf-8", "replace")))
+            pos += sizeof(_MessageHeader) + header.length
+        lf.cy_ring_skip(&mr.ring, pos)
+        if packed:
+            return block if pos == n else block[:pos]
+        return messages
+
+    def get_message_ring_stats(self) -> dict:
+        """Returns the message ring counters: 'received', 'dropped' (ring
+        full), 'filtered' (type not selected) and 'pending' (bytes waiting).
+        """
+        cdef _MessageRing *mr = self.message_ring
+        if mr is NULL:
+            raise RuntimeError("no message ring, call create_message_ring() first")
+        return {
+            "received": lf.cy_atomic_load_uint(&mr.received),
+            "dropped": lf.cy_atomic_load_uint(&mr.dropped),
+            "filtered": lf.cy_atomic_load_uint(&mr.filtered),
+            "pending": lf.cy_ring_available(&mr.ring),
+        }
+
     def get_first_message(self) -> str:
         """Returns the first message from the buffer."""
         cdef const char* msg = cs.csoundGetFirstMessage(self.ptr)
@@ -1678,6 +3911,115 @@ cdef class Csound:
         """
         return cs.csoundGetControlChannel(self.ptr, name.encode(), err)
 
+    def control_channel(self, str name, int mode = INPUT | OUTPUT) -> ControlChannel:
+        """Returns a handle to the control channel 'name', creating the
+        channel if it does not exist yet.
+
+        The channel pointer is resolved once, so reading and writing
+        handle.value avoids the name lookup of get/set_control_channel()
+        and uses atomic loads and stores. 'mode' is ChannelType.INPUT,
+        ChannelType.OUTPUT or both. The handle becomes invalid after
+        csound.cleanup() or csound.reset().
+        """
+        return ControlChannel.create(self, name, mode)
+
+    def audio_channel(self, str name, int mode = INPUT | OUTPUT) -> AudioChannel:
+        """Returns a handle to the audio channel 'name', creating the
+        channel if it does not exist yet.
+
+        The handle exposes the ksmps-long channel buffer used by the
+        chnget/chnset opcodes; see AudioChannel. 'mode' is
+        ChannelType.INPUT, ChannelType.OUTPUT or both.
+        """
+        return AudioChannel.create(self, name, mode)
+
+    def set_control_channels(self, names, values = None):
+        """Sets several control channels in a single call.
+
+        'names' is a sequence of channel names or ControlChannel handles and
+        'values' a sequence or buffer of numbers of the same length.
+        Alternatively, pass a dict mapping names (or handles) to values.
+
+        Once started, the values are published as one batch that Csound
+        applies at the start of the next k-cycle, without locking, so that
+        one k-cycle sees either none or all of them, whichever thread
+        performs. Batches set within the same k-cycle are applied together,
+        in order. Before start() and after cleanup(), the values are stored
+        directly.
+        """
+        cdef _ControlBatches *cb
+        cdef _ControlBatch *batch
+        cdef _ControlBatch *old
+        cdef _MyfltArray vals
+        cdef cs.MYFLT **ptrs = NULL
+        cdef Py_ssize_t n
+        if isinstance(names, dict):
+            if values is not None:
+                raise TypeError("values must not be given when names is a dict")
+            values = list(names.values())
+            names = list(names.keys())
+        elif values is None:
+            raise TypeError("missing values")
+        n = len(names)
+        vals = _MyfltArray.create(values, 1)
+        if vals.cols != n:
+            raise ValueError(f"expected {n} values, got {vals.cols}")
+        if self.control_batches is NULL:
+            self.control_batches = <_ControlBatches*>calloc(1, sizeof(_ControlBatches))
+            if self.control_batches is NULL:
+                raise MemoryError
+        cb = self.control_batches
+        ptrs = _resolve_control_channels(self, names, n)
+        # the sense event callback only takes the pending batch, so this
+        # thread can merge into it what it takes back; the GIL is held to
+        # keep other threads calling set_control_channels() out
+        old = <_ControlBatch*>lf.cy_atomic_exchange_ptr(&cb.pending, NULL)
+        batch = _control_batch_merge(old, ptrs, vals.data, n)
+        if batch is NULL:
+            free(ptrs)
+            if old is not NULL:
+                lf.cy_atomic_exchange_ptr(&cb.pending, old)
+            raise MemoryError
+        if not lf.cy_atomic_load_int(&cb.armed):
+            with nogil:
+                _control_batch_apply(batch)
+                _control_batch_free(batch)
+            return
+        lf.cy_atomic_exchange_ptr(&cb.pending, batch)
+
+    def get_control_channels(self, names, object out = None):
+        """Reads several control channels in a single call.
+
+        'names' is a sequence of channel names or ControlChannel handles
+        (the keys are used if a dict is given). The values are read without
+        the GIL into 'out', a writable buffer of MYFLT with room for
+        len(names) values, or into a new array.array if out is None.
+
+        Returns the buffer holding the values.
+        """
+        cdef Py_buffer view
+        cdef cs.MYFLT **ptrs = NULL
+        cdef cs.MYFLT *dest
+        cdef Py_ssize_t i, n
+        if not isinstance(names, (list, tuple)):
+            names = list(names)
+        n = len(names)
+        if out is None:
+            out = array.array(_MYFLT_FORMAT, bytes(n * sizeof(cs.MYFLT)))
+        if _get_myflt_buffer(out, &view, True) < n:
+            PyBuffer_Release(&view)
+            raise ValueError(f"buffer too small for {n} values")
+        dest = <cs.MYFLT*>view.buf
+        try:
+            ptrs = _resolve_control_channels(self, names, n)
+            with nogil:
+                for i in range(n):
+                    dest[i] = lf.cy_atomic_load_myflt(ptrs[i])
+        finally:
+            free(ptrs)
+            PyBuffer_Release(&view)
+        return out
+
     def set_control_channel(self, str name, float val):
         """sets the value of control channel identified by *name
         """
@@ -1748,31 +4090,68 @@ cdef class Csound:
         """
         return <Status>cs.csoundGetPvsChannel(self.ptr, fout, name.encode())
 
-    cdef int score_event(self, char type, const cs.MYFLT *pFields, long numFields):
+    def score_event(self, str type, pfields) -> int:
         """Send a new score event. 'type' is the score event type ('a', 'i', 'q',
         'f', or 'e').
-        'numFields' is the size of the pFields array.  'pFields' is an array of
-        floats with all the pfields for this event, starting with the p1 value
-        specified in pFields[0].
+        'pfields' is a sequence or buffer of numbers with all the pfields
+        for this event, starting with the p1 value (buffers of MYFLT are
+        used without copying).
         """
-        return cs.csoundScoreEvent(self.ptr, type, pFields, numFields)
+        cdef _MyfltArray p = _MyfltArray.create(pfields, 1)
+        return cs.csoundScoreEvent(self.ptr, _event_type(type), p.data, p.cols)
 
-    cdef score_event_async(self, char type, const cs.MYFLT *pFields, long numFields):
-        """Asynchronous version of csoundScoreEvent().
+    def score_event_async(self, str type, pfields):
+        """Asynchronous version of score_event().
         """
-        cs.csoundScoreEventAsync(self.ptr, type, pFields, numFields)
+        cdef _MyfltArray p = _MyfltArray.create(pfields, 1)
+        cs.csoundScoreEventAsync(self.ptr, _event_type(type), p.data, p.cols)
 
-    cdef int score_event_absolute(self, char type, const cs.MYFLT *pfields, long numFields, double time_ofs):
-        """Like csoundScoreEvent(), this function inserts a score event, but
+    def score_event_absolute(self, str type, pfields, double time_ofs) -> int:
+        """Like score_event(), this function inserts a score event, but
         at absolute time with respect to the start of performance, or from an
         offset set with time_ofs
         """
-        return cs.csoundScoreEventAbsolute(self.ptr, type, pfields, numFields, time_ofs)
+        cdef _MyfltArray p = _MyfltArray.create(pfields, 1)
+        return cs.csoundScoreEventAbsolute(self.ptr, _event_type(type), p.data,
+                                           p.cols, time_ofs)
+
+    def score_event_absolute_async(self, str type, pfields, double time_ofs):
+        """Asynchronous version of score_event_absolute().
+        """
+        cdef _MyfltArray p = _MyfltArray.create(pfields, 1)
+        cs.csoundScoreEventAbsoluteAsync(self.ptr, _event_type(type), p.data,
+                                         p.cols, time_ofs)
+
+    def score_events(self, str type, events, time_ofs = None) -> int:
+        """Sends many score events of the same type in a single call.
 
-    cdef score_event_absolute_async(self, char type, const cs.MYFLT *pfields, long numFields, double time_ofs):
-        """Asynchronous version of csoundScoreEventAbsolute().
+        'events' is an (N, P) array of pfields, either a 2-D buffer of
+        numbers (e.g. a numpy array, used without copying if its dtype is
+        MYFLT) or a sequence of N sequences of P numbers.
+        The events are submitted without the GIL. If time_ofs is given, they
+        are inserted at absolute time, as with score_event_absolute().
+
+        Returns 0 on success, or the status of the first failing event.
         """
-        cs.csoundScoreEventAbsoluteAsync(self.ptr, type, pfields, numFields, time_ofs)
+        cdef _MyfltArray p = _MyfltArray.create(events, 2)
+        cdef cs.CSOUND *ptr = self.ptr
+        cdef char t = _event_type(type)
+        cdef bint absolute = time_ofs is not None
+        cdef double ofs = time_ofs if absolute else 0.0
+        cdef const cs.MYFLT *row = p.data
+        cdef long cols = p.cols
+        cdef Py_ssize_t i
+        cdef int result = 0
+        with nogil:
+            for i in range(p.rows):
+                if absolute:
+                    result = cs.csoundScoreEventAbsolute(ptr, t, row, cols, ofs)
+                else:
+                    result = cs.csoundScoreEvent(ptr, t, row, cols)
+                if result != 0:
+                    break
+                row += cols
+        return result
 
     def input_message(self, str msg):
         """Input a NULL-terminated string (as if from a console), used for line events."""
@@ -1878,35 +4257,100 @@ cdef class Csound:
         """
         return cs.csoundTableGet(self.ptr, table, index)
 
-    def table_set(self, int table, int index, cs.MYFLT value):
+    def table_set(self, int table, int index, double value):
         """Sets the value of a slot in a function table.
         The table number and index are assumed to be valid.
         """
         cs.csoundTableSet(self.ptr, table, index, value)
 
-    cdef table_copy_out(self, int table, cs.MYFLT *dest):
-        """Copy the contents of a function table into a supplied array *dest
-        The table number is assumed to be valid, and the destination needs to
-        have sufficient space to receive all the function table contents.
+    def table(self, int table, bint guard_point = False) -> FunctionTable:
+        """Returns a zero-copy, writable view of function table 'table'.
+
+        The FunctionTable implements the buffer protocol, so it can be
+        wrapped with memoryview() or numpy.asarray(). The guard point is
+        included if 'guard_point' is True.
+        """
+        return FunctionTable.create(self, table, guard_point)
+
+    cdef Py_ssize_t _table_buffer(self, int table, object obj, Py_buffer *view,
+                                  bint writable) except -1:
+        """Gets a MYFLT buffer with room for the whole table from obj."""
+        cdef int length = cs.csoundTableLength(self.ptr, table)
+        if length < 0:
+            raise ValueError(f"table {table} does not exist")
+        if _get_myflt_buffer(obj, view, writable) < length:
+            PyBuffer_Release(view)
+            raise ValueError(f"buffer too small for table {table} ({length} values)")
+        return length
+
+    cdef _keep_async_buffer(self, object obj):
+        """Keeps obj alive until Csound has handled the pending async copy,
+        which happens at the start of the next k-cycle, or until cleanup()
+        or reset() ends the performance.
+        """
+        cdef cs.int64_t now = cs.csoundGetCurrentTimeSamples(self.ptr)
+        if self.async_buffers is None:
+            self.async_buffers = []
+        self.async_buffers = [entry for entry in self.async_buffers if entry[0] >= now]
+        self.async_buffers.append((now, memoryview(obj)))
+
+    def table_read(self, int table, object out = None):
+        """Copies the contents of a function table (without the guard point)
+        into 'out', a writable buffer of MYFLT, or into a new array.array if
+        out is None. The copy is made without the GIL.
+
+        Returns the buffer holding the data.
         """
-        cs.csoundTableCopyOut(self.ptr, table, dest)
+        cdef Py_buffer view
+        cdef cs.CSOUND *ptr = self.ptr
+        if out is None:
+            out = array.array(_MYFLT_FORMAT, bytes(
+                max(cs.csoundTableLength(ptr, table), 0) * sizeof(cs.MYFLT)))
+        self._table_buffer(table, out, &view, True)
+        with nogil:
+            cs.csoundTableCopyOut(ptr, table, <cs.MYFLT*>view.buf)
+        PyBuffer_Release(&view)
+        return out
 
-    cdef table_copy_out_async(self, int table, cs.MYFLT *dest):
-        """Asynchronous version of csoundTableCopyOut()
+    def table_read_async(self, int table, object out = None):
+        """Asynchronous version of table_read(): the buffer is filled by
+        Csound at the start of the next k-cycle and kept alive until then.
         """
-        cs.csoundTableCopyOutAsync(self.ptr, table, dest)
+        cdef Py_buffer view
+        cdef cs.CSOUND *ptr = self.ptr
+        if out is None:
+            out = array.array(_MYFLT_FORMAT, bytes(
+                max(cs.csoundTableLength(ptr, table), 0) * sizeof(cs.MYFLT)))
+        self._table_buffer(table, out, &view, True)
+        self._keep_async_buffer(out)
+        with nogil:
+            cs.csoundTableCopyOutAsync(ptr, table, <cs.MYFLT*>view.buf)
+        PyBuffer_Release(&view)
+        return out
 
-    cdef table_copy_in(self, int table, cs.MYFLT *src):
-        """Copy the contents of an array *src into a given function table
-        The table number is assumed to be valid, and the table needs to
-        have sufficient space to receive all the array contents.
+    def table_write(self, int table, object src):
+        """Copies the values of 'src', a buffer of MYFLT with at least as many
+        values as the table, into a function table, without the GIL.
         """
-        cs.csoundTableCopyIn(self.ptr, table, src)
+        cdef Py_buffer view
+        cdef cs.CSOUND *ptr = self.ptr
+        self._table_buffer(table, src, &view, False)
+        with nogil:
+            cs.csoundTableCopyIn(ptr, table, <cs.MYFLT*>view.buf)
+        PyBuffer_Release(&view)
 
-    cdef table_copy_in_async(self, int table, cs.MYFLT *src):
-        """Asynchronous version of csoundTableCopyIn()
+    def table_write_async(self, int table, object src):
+        """Asynchronous version of table_write(): the table is written by
+        Csound at the start of the next k-cycle; src is kept alive until then
+        and should not be modified meanwhile.
         """
-        cs.csoundTableCopyInAsync(self.ptr, table, src)
+        cdef Py_buffer view
+        cdef cs.CSOUND *ptr = self.ptr
+        self._table_buffer(table, src, &view, False)
+        self._keep_async_buffer(src)
+        with nogil:
+            cs.csoundTableCopyInAsync(ptr, table, <cs.MYFLT*>view.buf)
+        PyBuffer_Release(&view)
 
     cdef int get_table(self, cs.MYFLT **tablePtr, int tableNum):
         """Stores pointer to function table 'tableNum' in *tablePtr,
@@ -2086,6 +4530,12 @@ cdef class Csound:
         """
         return cs.csoundGetUtilityDescription(self.ptr, utilName)
 
+    def circular_buffer(self, int size, int itemsize = 0) -> CircularBuffer:
+        """Returns a new CircularBuffer holding up to 'size' items of
+        'itemsize' bytes (default: the size of MYFLT).
+        """
+        return CircularBuffer.create(self, size, itemsize or sizeof(cs.MYFLT))
+
     cdef void *create_circular_buffer(self, int numelem, int elemsize):
         """Create circular buffer with numelem number of elements. The
         element's size is set from elemsize. It should be used like:
@@ -2167,6 +4617,372 @@ cdef class Csound:
     #   csoundSetChannelIOCallback
     #   csoundPerformKsmpsAbsolute
 
+## ----------------------------------------------------------------------------
+## Buffer views
+
+cdef bytes _MYFLT_FORMAT_BYTES = _MYFLT_FORMAT.encode()
+cdef char *_MYFLT_FORMAT_C = _MYFLT_FORMAT_BYTES
+
+cdef class _MyfltView:
+    """Base class of buffer-protocol views over MYFLT memory owned by Csound.
+
+    Subclasses implement resolve(), which returns the data pointer and
+    fills in ndim and _shape. A view can only be exported while the Csound
+    instance has not been cleaned up or reset since the view was created.
+    """
+
+    cdef Csound csound
+    cdef unsigned int generation
+    cdef bint readonly
+    cdef int ndim
+    cdef Py_ssize_t _shape[2]
+    cdef Py_ssize_t _strides[2]
+
+    def __init__(self):
+        raise TypeError("This cannot be instatiated directly")
+
+    cdef bind(self, Csound csound, bint readonly):
+        self.csound = csound
+        self.generation = csound.generation
+        self.readonly = readonly
+
+    cdef cs.MYFLT *resolve(self) except NULL:
+        raise NotImplementedError
+
+    cdef cs.MYFLT *checked_resolve(self) except NULL:
+        if self.generation != self.csound.generation:
+            raise ValueError(
+                "view is no longer valid: the Csound instance was cleaned up or reset")
+        cdef cs.MYFLT *data = self.resolve()
+        self._strides[self.ndim - 1] = sizeof(cs.MYFLT)
+        if self.ndim == 2:
+            self._strides[0] = self._shape[1] * sizeof(cs.MYFLT)
+        return data
+
+    def __getbuffer__(self, Py_buffer *buffer, int flags):
+        cdef cs.MYFLT *data = self.checked_resolve()
+        if self.readonly and flags & PyBUF_WRITABLE:
+            raise BufferError("view is read-only")
+        buffer.buf = data
+        buffer.obj = self
+        buffer.len = self._shape[0] * (self._shape[1] if self.ndim == 2 else 1) * sizeof(cs.MYFLT)
+        buffer.itemsize = sizeof(cs.MYFLT)
+        buffer.format = _MYFLT_FORMAT_C if flags & PyBUF_FORMAT else NULL
+        buffer.ndim = self.ndim
+        buffer.shape = self._shape
+        buffer.strides = self._strides
+        buffer.suboffsets = NULL
+        buffer.readonly = self.readonly
+        buffer.internal = NULL
+        self.csound.exports += 1
+
+    def __releasebuffer__(self, Py_buffer *buffer):
+        self.csound.exports -= 1
+
+    @property
+    def valid(self) -> bool:
+        """False once the Csound instance has been cleaned up or reset."""
+        return self.generation == self.csound.generation
+
+    @property
+    def shape(self) -> tuple:
+        """Shape of the exported buffer."""
+        self.checked_resolve()
+        if self.ndim == 2:
+            return (self._shape[0], self._shape[1])
+        return (self._shape[0],)
+
+
+cdef enum _AudioBufferKind:
+    _SPIN
+    _SPOUT
+    _INPUT_BUFFER
+    _OUTPUT_BUFFER
+
+
+cdef class AudioBuffer(_MyfltView):
+    """Zero-copy view of one of Csound's audio buffers (spin, spout, and the
+    input and output buffers used by perform_buffer()).
+
+    Implements the buffer protocol with shape (frames, channels), so it can
+    be wrapped with memoryview() or numpy.asarray() without copying:
+
+        cs.start()
+        spout = numpy.asarray(cs.spout_view())
+        while not cs.perform_ksmps():
+            process(spout)
+
+    The view becomes invalid after csound.cleanup() or csound.reset();
+    csound.reset() raises BufferError while the memory is still exported.
+    """
+
+    cdef _AudioBufferKind kind
+
+    @staticmethod
+    cdef AudioBuffer create(Csound csound, _AudioBufferKind kind):
+        cdef AudioBuffer view = AudioBuffer.__new__(AudioBuffer)
+        view.bind(csound, kind == _SPOUT or kind == _OUTPUT_BUFFER)
+        view.kind = kind
+        return view
+
+    cdef cs.MYFLT *resolve(self) except NULL:
+        cdef cs.CSOUND *ptr = self.csound.ptr
+        cdef cs.MYFLT *data = NULL
+        cdef Py_ssize_t nchnls
+        cdef Py_ssize_t samples
+        if self.kind == _SPIN:
+            data = cs.csoundGetSpin(ptr)
+            nchnls = cs.csoundGetNchnlsInput(ptr)
+            samples = cs.csoundGetKsmps(ptr) * nchnls
+        elif self.kind == _SPOUT:
+            data = cs.csoundGetSpout(ptr)
+            nchnls = cs.csoundGetNchnls(ptr)
+            samples = cs.csoundGetKsmps(ptr) * nchnls
+        elif self.kind == _INPUT_BUFFER:
+            data = cs.csoundGetInputBuffer(ptr)
+            nchnls = cs.csoundGetNchnlsInput(ptr)
+            samples = cs.csoundGetInputBufferSize(ptr)
+        else:
+            data = cs.csoundGetOutputBuffer(ptr)
+            nchnls = cs.csoundGetNchnls(ptr)
+            samples = cs.csoundGetOutputBufferSize(ptr)
+        if data is NULL or nchnls <= 0:
+            raise ValueError("buffer is not available, call csound.start() first")
+        self.ndim = 2
+        self._shape[0] = samples // nchnls
+        self._shape[1] = nchnls
+        return data
+
+
+cdef class FunctionTable(_MyfltView):
+    """Zero-copy view of a function table, returned by csound.table().
+
+    Implements the writable buffer protocol with shape (length,), or
+    (length + 1,) when the guard point is included:
+
+        wave = numpy.asarray(cs.table(1))
+        wave[:] = numpy.sin(numpy.linspace(0, 2 * numpy.pi, len(wave)))
+
+    The table is looked up again on every export, so a view follows a
+    table that was redefined; the view becomes invalid after
+    csound.cleanup() or csound.reset().
+    """
+
+    cdef readonly int number
+    cdef readonly bint guard_point
+
+    @staticmethod
+    cdef FunctionTable create(Csound csound, int number, bint guard_point):
+        cdef FunctionTable view = FunctionTable.__new__(FunctionTable)
+        view.bind(csound, False)
+        view.number = number
+        view.guard_point = guard_point
+        view.checked_resolve()
+        return view
+
+    cdef cs.MYFLT *resolve(self) except NULL:
+        cdef cs.MYFLT *data = NULL
+        cdef int length = cs.csoundGetTable(self.csound.ptr, &data, self.number)
+        if data is NULL or length < 0:
+            raise ValueError(f"table {self.number} does not exist")
+        self.ndim = 1
+        self._shape[0] = length + 1 if self.guard_point else length
+        return data
+
+    def __len__(self):
+        self.checked_resolve()
+        return self._shape[0]
+
+
+## ----------------------------------------------------------------------------
+## Channel handles
+
+cdef cs.MYFLT *_channel_ptr(Csound csound, str name, int type) except NULL:
+    """Resolves the data pointer of a channel, raising on failure."""
+    cdef cs.MYFLT *p = NULL
+    cdef int err = cs.csoundGetChannelPtr(csound.ptr, &p, name.encode(), type)
+    if err == cs.CSOUND_MEMORY:
+        raise MemoryError(f"not enough memory for channel '{name}'")
+    if err != 0 or p is NULL:
+        raise ValueError(f"could not get channel '{name}' (status {err})")
+    return p
+
+
+cdef class AudioChannel(_MyfltView):
+    """Handle to an audio channel: the ksmps-long buffer shared with the
+    chnget/chnset opcodes.
+
+    read_into() and write_from() copy a block under the channel lock,
+    without the GIL. The handle also implements the buffer protocol for
+    zero-copy access; use it as a context manager to hold the channel
+    lock meanwhile (do not call read_into() or write_from() inside):
+
+        side = cs.audio_channel("sidechain", ChannelType.INPUT)
+        buf = numpy.asarray(side)
+        while not cs.perform_ksmps():
+            with side:
+                buf[:] = next(blocks)
+
+    The handle becomes invalid after csound.cleanup() or csound.reset().
+    """
+
+    cdef cs.MYFLT *ptr
+    cdef cs.spin_lock_t *lock
+    cdef readonly str name
+
+    @staticmethod
+    cdef AudioChannel create(Csound csound, str name, int mode):
+        cdef AudioChannel chan = AudioChannel.__new__(AudioChannel)
+        chan.ptr = _channel_ptr(csound, name, cs.CSOUND_AUDIO_CHANNEL | mode)
+        chan.lock = <cs.spin_lock_t*>cs.csoundGetChannelLock(csound.ptr, name.encode())
+        if chan.lock is NULL:
+            raise ValueError(f"could not get the lock of channel '{name}'")
+        chan.bind(csound, False)
+        chan.name = name
+        return chan
+
+    cdef cs.MYFLT *resolve(self) except NULL:
+        self.ndim = 1
+        self._shape[0] = cs.csoundGetKsmps(self.csound.ptr)
+        return self.ptr
+
+    def read_into(self, object out = None):
+        """Copies the channel data (ksmps values) into 'out', a writable
+        buffer of MYFLT, or into a new array.array if out is None.
+
+        Returns the buffer holding the data.
+        """
+        cdef Py_buffer view
+        cdef cs.MYFLT *data = self.checked_resolve()
+        cdef Py_ssize_t n = self._shape[0]
+        cdef cs.spin_lock_t *lock = self.lock
+        if out is None:
+            out = array.array(_MYFLT_FORMAT, bytes(n * sizeof(cs.MYFLT)))
+        if _get_myflt_buffer(out, &view, True) < n:
+            PyBuffer_Release(&view)
+            raise ValueError(f"buffer too small for {n} samples")
+        with nogil:
+            cs.csoundSpinLock(lock)
+            memcpy(view.buf, data, n * sizeof(cs.MYFLT))
+            cs.csoundSpinUnLock(lock)
+        PyBuffer_Release(&view)
+        return out
+
+    def write_from(self, object src):
+        """Copies ksmps values from 'src', a buffer of MYFLT, into the
+        channel.
+        """
+        cdef Py_buffer view
+        cdef cs.MYFLT *data = self.checked_resolve()
+        cdef Py_ssize_t n = self._shape[0]
+        cdef cs.spin_lock_t *lock = self.lock
+        if _get_myflt_buffer(src, &view, False) < n:
+            PyBuffer_Release(&view)
+            raise ValueError(f"expected {n} samples")
+        with nogil:
+            cs.csoundSpinLock(lock)
+            memcpy(data, view.buf, n * sizeof(cs.MYFLT))
+            cs.csoundSpinUnLock(lock)
+        PyBuffer_Release(&view)
+
+    def __enter__(self):
+        cdef cs.spin_lock_t *lock = self.lock
+        self.checked_resolve()
+        with nogil:
+            cs.csoundSpinLock(lock)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        cs.csoundSpinUnLock(self.lock)
+
+    def __repr__(self):
+        return f"<AudioChannel '{self.name}'>"
+
+
+cdef cs.MYFLT **_resolve_control_channels(Csound csound, object names,
+                                         Py_ssize_t n) except NULL:
+    """Resolves a sequence of channel names or ControlChannel handles into a
+    malloc'ed array of n channel pointers, to be freed by the caller.
+    """
+    cdef ControlChannel chan
+    cdef Py_ssize_t i
+    cdef cs.MYFLT **ptrs = <cs.MYFLT**>malloc((n or 1) * sizeof(cs.MYFLT*))
+    if ptrs is NULL:
+        raise MemoryError
+    try:
+        for i in range(n):
+            name = names[i]
+            if isinstance(name, ControlChannel):
+                chan = name
+                if chan.csound is not csound:
+                    raise ValueError(
+                        f"channel '{chan.name}' belongs to another Csound instance")
+                ptrs[i] = chan.checked_ptr()
+            else:
+                ptrs[i] = _channel_ptr(csound, name,
+                                       cs.CSOUND_CONTROL_CHANNEL | INPUT | OUTPUT)
+    except:
+        free(ptrs)
+        raise
+    return ptrs
+
+
+cdef class ControlChannel:
+    """Handle to a control channel holding the resolved MYFLT pointer.
+
+    Reading and writing 'value' uses atomic loads and stores on the
+    channel data, as recommended for csoundGetChannelPtr():
+
+        amp = cs.control_channel("amp")
+        while not cs.perform_ksmps():
+            amp.value = next(envelope)
+    """
+
+    cdef Csound csound
+    cdef cs.MYFLT *ptr
+    cdef unsigned int generation
+    cdef readonly str name
+
+    def __init__(self):
+        raise TypeError("This cannot be instatiated directly")
+
+    @staticmethod
+    cdef ControlChannel create(Csound csound, str name, int mode):
+        cdef ControlChannel chan = ControlChannel.__new__(ControlChannel)
+        chan.ptr = _channel_ptr(csound, name, cs.CSOUND_CONTROL_CHANNEL | mode)
+        chan.csound = csound
+        chan.generation = csound.generation
+        chan.name = name
+        return chan
+
+    cdef inline cs.MYFLT *checked_ptr(self) except NULL:
+        if self.generation != self.csound.generation:
+            raise ValueError(
+                f"channel '{self.name}' is no longer valid: "
+                "the Csound instance was cleaned up or reset")
+        return self.ptr
+
+    @property
+    def valid(self) -> bool:
+        """False once the Csound instance has been cleaned up or reset."""
+        return self.generation == self.csound.generation
+
+    @property
+    def value(self) -> float:
+        """The current value of the channel."""
+        return lf.cy_atomic_load_myflt(self.checked_ptr())
+
+    @value.setter
+    def value(self, double val):
+        lf.cy_atomic_store_myflt(self.checked_ptr(), val)
+
+    def __float__(self):
+        return <double>lf.cy_atomic_load_myflt(self.checked_ptr())
+
+    def __repr__(self):
+        return f"<ControlChannel '{self.name}'>"
+
+
 cdef void *create_thread(cs.uintptr_t (*threadRoutine)(void *) noexcept, void *userdata):
     """
     Creates and starts a new thread of execution.
@@ -2381,6 +5197,1391 @@ cdef spin_un_lock(cs.spin_lock_t *spinlock):
     cs.csoundSpinUnLock(spinlock)
 
 
+## ----------------------------------------------------------------------------
+## Circular buffers
+
+cdef class CircularBuffer:
+    """Lock-free single producer, single consumer ring of fixed size
+    items, allocated by Csound (csoundCreateCircularBuffer()).
+
+    write(), read() and peek() move whole blocks between the ring and
+    buffer-protocol objects without the GIL, so an audio thread can feed
+    Python consumers (recorders, analyzers, network senders):
+
+        ring = cs.circular_buffer(48000)
+        ring.write(block)                       # producer, e.g. per k-cycle
+        data = ring.read(4096, timeout=0.5)     # consumer, waits for data
+
+    Items are MYFLT by default; read() then returns an array.array of
+    MYFLT, otherwise a bytearray. The buffer becomes invalid after
+    csound.cleanup() or csound.reset().
+    """
+
+    cdef Csound csound
+    cdef void *ptr
+    cdef void *data_lock          # notified by write()
+    cdef unsigned int generation
+    cdef readonly int size
+    cdef readonly int itemsize
+
+    def __cinit__(self):
+        self.ptr = NULL
+        self.data_lock = NULL
+
+    def __init__(self):
+        raise TypeError("This cannot be instatiated directly")
+
+    @staticmethod
+    cdef CircularBuffer create(Csound csound, int size, int itemsize):
+        if size < 1 or itemsize < 1:
+            raise ValueError("size and itemsize must be positive")
+        cdef CircularBuffer buf = CircularBuffer.__new__(CircularBuffer)
+        # set first so that __dealloc__ can free a partial allocation
+        buf.csound = csound
+        buf.generation = csound.generation
+        # Csound's ring keeps one element free
+        buf.ptr = cs.csoundCreateCircularBuffer(csound.ptr, size + 1, itemsize)
+        buf.data_lock = create_thread_lock()
+        if buf.ptr is NULL or buf.data_lock is NULL:
+            raise MemoryError
+        buf.size = size
+        buf.itemsize = itemsize
+        return buf
+
+    def __dealloc__(self):
+        if (self.ptr is not NULL and self.csound is not None
+                and self.generation == self.csound.generation):
+            cs.csoundDestroyCircularBuffer(self.csound.ptr, self.ptr)
+        self.ptr = NULL
+        if self.data_lock is not NULL:
+            destroy_thread_lock(self.data_lock)
+            self.data_lock = NULL
+
+    cdef inline void *checked_ptr(self) except NULL:
+        if self.generation != self.csound.generation:
+            raise ValueError(
+                "circular buffer is no longer valid: "
+                "the Csound instance was cleaned up or reset")
+        return self.ptr
+
+    @property
+    def valid(self) -> bool:
+        """False once the Csound instance has been cleaned up or reset."""
+        return self.generation == self.csound.generation
+
+    cdef int _items(self, Py_buffer *view) except -1:
+        if view.len % self.itemsize:
+            PyBuffer_Release(view)
+            raise ValueError(f"buffer size is not a multiple of the item size ({self.itemsize})")
+        return view.len // self.itemsize
+
+    def write(self, object data) -> int:
+        """Writes the items of a buffer (bytes, array.array, numpy array)
+        without blocking.
+
+        Returns the number of items written, fewer than given if the
+        buffer is full.
+        """
+        cdef void *ptr = self.checked_ptr()
+        cdef cs.CSOUND *csound = self.csound.ptr
+        cdef Py_buffer view
+        cdef int n, written
+        PyObject_GetBuffer(data, &view, PyBUF_C_CONTIGUOUS)
+        n = self._items(&view)
+        with nogil:
+            written = cs.csoundWriteCircularBuffer(csound, ptr, view.buf, n)
+        PyBuffer_Release(&view)
+        if written:
+            cs.csoundNotifyThreadLock(self.data_lock)
+        return written
+
+    def read_into(self, object out, timeout = 0.0) -> int:
+        """Reads items into 'out', a writable buffer, until it is full or
+        'timeout' seconds have passed (None waits as long as needed,
+        0 does not wait).
+
+        Waiting readers are woken by write(); data written by other
+        producers is picked up within a millisecond. Returns the number
+        of items read.
+        """
+        cdef void *ptr = self.checked_ptr()
+        cdef cs.CSOUND *csound = self.csound.ptr
+        cdef Py_buffer view
+        cdef int n, done = 0
+        cdef double deadline = -1.0
+        if timeout is not None:
+            deadline = time.monotonic() + max(<double>timeout, 0.0)
+        PyObject_GetBuffer(out, &view, PyBUF_C_CONTIGUOUS | PyBUF_WRITABLE)
+        try:
+            n = self._items(&view)
+            while True:
+                with nogil:
+                    done += cs.csoundReadCircularBuffer(
+                        csound, ptr, <char*>view.buf + done * self.itemsize, n - done)
+                if done == n or (deadline >= 0 and time.monotonic() >= deadline):
+                    break
+                with nogil:
+                    cs.csoundWaitThreadLock(self.data_lock, 1)
+                PyErr_CheckSignals()
+        finally:
+            PyBuffer_Release(&view)
+        return done
+
+    def read(self, int n, timeout = 0.0):
+        """Reads up to n items, waiting for them up to 'timeout' seconds
+        (see read_into()).
+
+        Returns an array.array of MYFLT, or a bytearray if the items are
+        not MYFLT, holding the items read.
+        """
+        if n < 0:
+            raise ValueError("n must not be negative")
+        out = self._new_buffer(n)
+        return self._truncate(out, self.read_into(out, timeout))
+
+    def peek(self, int n):
+        """Returns up to n items without removing them from the buffer."""
+        cdef void *ptr = self.checked_ptr()
+        cdef Py_buffer view
+        cdef int got
+        if n < 0:
+            raise ValueError("n must not be negative")
+        out = self._new_buffer(min(n, self.size))
+        PyObject_GetBuffer(out, &view, PyBUF_C_CONTIGUOUS | PyBUF_WRITABLE)
+        with nogil:
+            got = cs.csoundPeekCircularBuffer(self.csound.ptr, ptr, view.buf,
+                                              view.len // self.itemsize)
+        PyBuffer_Release(&view)
+        return self._truncate(out, got)
+
+    def flush(self):
+        """Discards the buffered items. Only use this while no other
+        thread is reading from the buffer.
+        """
+        cs.csoundFlushCircularBuffer(self.csound.ptr, self.checked_ptr())
+
+    cdef object _new_buffer(self, int n):
+        if self.itemsize == sizeof(cs.MYFLT):
+            return array.array(_MYFLT_FORMAT, bytes(n * self.itemsize))
+        return bytearray(n * self.itemsize)
+
+    cdef object _truncate(self, object out, int n):
+        if isinstance(out, array.array):
+            del out[n:]
+        else:
+            del out[n * self.itemsize:]
+        return out
+
+    def __repr__(self):
+        return f"<CircularBuffer size={self.size} itemsize={self.itemsize}>"
+
+
+## ----------------------------------------------------------------------------
+## Performance thread
+
+cdef enum _PerfCommandType:
+    _PT_SCORE_EVENT = 1
+    _PT_SCORE_EVENT_ABSOLUTE = 2
+    _PT_INPUT_MESSAGE = 3
+    _PT_SCORE_OFFSET = 4
+
+ctypedef struct _PerfCommand:
+    _PerfCommandType kind
+    char opcode
+    long nfields
+    double value
+    cs.MYFLT *pfields
+    char *text
+
+ctypedef struct _PerfThreadState:
+    cs.CSOUND *csound
+    void *thread
+    void *wake_lock       # wakes a paused performance thread
+    void *drain_lock      # notified whenever the command queue is drained
+    void *producer_mutex  # serializes producers while they wait for space
+    lf.cy_ring queue      # pending _PerfCommand pointers
+    int running
+    int paused
+    int stop_requested
+    int status
+    void (*process_callback)(void *) noexcept nogil
+    void *process_data
+    _CycleStats *cycle_stats  # k-cycle timings of the Csound instance, or NULL
+    void (*finish_callback)(void *) noexcept nogil
+    void *finish_data
+
+cdef int _perf_command_run(cs.CSOUND *csound, _PerfCommand *cmd) noexcept nogil:
+    if cmd.kind == _PT_SCORE_EVENT:
+        return cs.csoundScoreEvent(csound, cmd.opcode, cmd.pfields, cmd.nfields)
+    elif cmd.kind == _PT_SCORE_EVENT_ABSOLUTE:
+        return cs.csoundScoreEventAbsolute(csound, cmd.opcode, cmd.pfields,
+                                           cmd.nfields, cmd.value)
+    elif cmd.kind == _PT_INPUT_MESSAGE:
+        cs.csoundInputMessage(csound, cmd.text)
+    elif cmd.kind == _PT_SCORE_OFFSET:
+        cs.csoundSetScoreOffsetSeconds(csound, <cs.MYFLT>cmd.value)
+    return 0
+
+cdef void _perf_queue_drain(_PerfThreadState *st, bint execute) noexcept nogil:
+    """Runs (or discards) all queued commands. Consumer side only."""
+    cdef _PerfCommand *cmd = NULL
+    cdef bint drained = False
+    while lf.cy_ring_peek(&st.queue, &cmd, 1):
+        if execute:
+            _perf_command_run(st.csound, cmd)
+        free(cmd)
+        lf.cy_ring_skip(&st.queue, 1)
+        drained = True
+    if drained:
+        cs.csoundNotifyThreadLock(st.drain_lock)
+
+cdef cs.uintptr_t _perf_thread_routine(void *data) noexcept nogil:
+    cdef _PerfThreadState *st = <_PerfThreadState*>data
+    cdef int result = 0
+    while not lf.cy_atomic_load_int(&st.stop_requested):
+        _perf_queue_drain(st, True)
+        if lf.cy_atomic_load_int(&st.paused):
+            cs.csoundWaitThreadLockNoTimeout(st.wake_lock)
+            continue
+        if st.process_callback != NULL:
+            st.process_callback(st.process_data)
+        result = _perform_ksmps_timed(st.csound, st.cycle_stats)
+        if result != 0:
+            break
+    if result == 0:
+        result = 1  # stopped by request
+    lf.cy_atomic_store_int(&st.status, result)
+    cs.csoundCleanup(st.csound)
+    lf.cy_atomic_store_int(&st.running, 0)
+    _perf_queue_drain(st, False)
+    cs.csoundNotifyThreadLock(st.drain_lock)
+    if st.finish_callback != NULL:
+        st.finish_callback(st.finish_data)
+    return <cs.uintptr_t>result
+
+
+@cython.no_gc_clear
+cdef class CsoundPerformanceThread:
+    """Performs a score in a separate native thread.
+
+    The perform loop calls csoundPerformKsmps() without holding the GIL.
+    Events sent through score_event(), input_message() and
+    set_score_offset_seconds() are placed on a lock-free queue and
+    dispatched by the performance thread at the next k-cycle boundary.
+
+    The thread is created in the paused state; call play() to start.
+    When the performance ends, csound.cleanup() is called from the
+    performance thread; once joined, handles such as ControlChannel are
+    no longer valid, as after a direct call.
+
+        cs.compile_csd("score.csd")
+        cs.start()
+        pt = CsoundPerformanceThread(cs)
+        pt.play()
+        pt.join()
+    """
+
+    cdef _PerfThreadState *st
+    cdef object _csound
+
+    def __cinit__(self):
+        self.st = NULL
+
+    def __init__(self, object csound, int queue_size = 1024):
+        """Creates the performance thread for a Csound instance.
+
+        Args:
+            csound: a Csound instance or the integer returned by
+                Csound.csound().
+            queue_size: capacity of the command queue.
+        """
+        cdef cs.CSOUND *ptr
+        if isinstance(csound, Csound):
+            ptr = (<Csound>csound).ptr
+        else:
+            ptr = <cs.CSOUND*><cs.uintptr_t>csound
+        if ptr is NULL:
+            raise ValueError("invalid Csound instance")
+        self._csound = csound
+
+        self.st = <_PerfThreadState*>calloc(1, sizeof(_PerfThreadState))
+        if self.st is NULL:
+            raise MemoryError
+        if lf.cy_ring_init(&self.st.queue, queue_size, sizeof(_PerfCommand*)) != 0:
+            raise MemoryError
+        self.st.csound = ptr
+        if isinstance(csound, Csound):
+            self.st.cycle_stats = (<Csound>csound)._get_cycle_stats()
+        self.st.wake_lock = create_thread_lock()
+        self.st.drain_lock = create_thread_lock()
+        self.st.producer_mutex = create_mutex(0)
+        if (self.st.wake_lock is NULL or self.st.drain_lock is NULL
+                or self.st.producer_mutex is NULL):
+            raise RuntimeError("could not create performance thread locks")
+        self.st.paused = 1
+        self.st.running = 1
+        self.st.thread = create_thread(_perf_thread_routine, self.st)
+        if self.st.thread is NULL:
+            self.st.running = 0
+            raise RuntimeError("could not create performance thread")
+
+    def __dealloc__(self):
+        if self.st is NULL:
+            return
+        if self.st.thread is not NULL:
+            self._request_stop()
+            join_thread(self.st.thread)
+            self.st.thread = NULL
+            self._joined()
+        _perf_queue_drain(self.st, False)
+        if self.st.wake_lock is not NULL:
+            destroy_thread_lock(self.st.wake_lock)
+        if self.st.drain_lock is not NULL:
+            destroy_thread_lock(self.st.drain_lock)
+        if self.st.producer_mutex is not NULL:
+            destroy_mutex(self.st.producer_mutex)
+        lf.cy_ring_free(&self.st.queue)
+        free(self.st)
+        self.st = NULL
+
+    cdef _joined(self):
+        """Does what csound.cleanup() does besides csoundCleanup(), which
+        the performance thread called: handles, buffer views and cached
+        trees of the performance are no longer valid.
+        """
+        cdef Csound csound
+        if isinstance(self._csound, Csound):
+            csound = self._csound
+            csound._disarm_control_batches()
+            csound.generation += 1
+            csound.async_buffers = None
+
+    cdef void _request_stop(self) noexcept nogil:
+        lf.cy_atomic_store_int(&self.st.stop_requested, 1)
+        cs.csoundNotifyThreadLock(self.st.wake_lock)
+
+    cdef _enqueue(self, _PerfCommand *cmd):
+        """Hands cmd over to the performance thread, waiting for space."""
+        cdef _PerfThreadState *st = self.st
+        cdef bint queued = False
+        with nogil:
+            cs.csoundLockMutex(st.producer_mutex)
+            while lf.cy_atomic_load_int(&st.running):
+                if lf.cy_ring_write(&st.queue, &cmd, 1):
+                    queued = True
+                    break
+                cs.csoundWaitThreadLock(st.drain_lock, 10)
+            cs.csoundUnlockMutex(st.producer_mutex)
+        if not queued:
+            free(cmd)
+            return
+        cs.csoundNotifyThreadLock(st.wake_lock)
+
+    cdef set_process_callback(self, void (*func)(void *) noexcept nogil, void *data):
+        """Sets a function to be called by the performance thread before
+        every k-cycle. The callback runs without the GIL.
+
+        Should be set before calling play().
+        """
+        self.st.process_callback = func
+        self.st.process_data = data
+
+    cdef set_finish_callback(self, void (*func)(void *) noexcept nogil, void *data):
+        """Sets a function to be called by the performance thread once the
+        performance has ended and csound.cleanup() was called. The callback
+        runs without the GIL.
+
+        Should be set before calling play().
+        """
+        self.st.finish_callback = func
+        self.st.finish_data = data
+
+    def csound(self) -> int:
+        """Returns the Csound instance pointer."""
+        return <cs.uintptr_t>self.st.csound
+
+    def is_running(self) -> bool:
+        """Returns True if the performance thread is running."""
+        return bool(lf.cy_atomic_load_int(&self.st.running))
+
+    def status(self) -> int:
+        """Returns the current status.
+
+        Zero if still playing, positive if the end of score was reached or
+        performance was stopped, and negative if an error occured.
+        """
+        return lf.cy_atomic_load_int(&self.st.status)
+
+    def play(self):
+        """Continues performance if it was paused."""
+        lf.cy_atomic_store_int(&self.st.paused, 0)
+        cs.csoundNotifyThreadLock(self.st.wake_lock)
+
+    def pause(self):
+        """Pauses performance (can be continued by calling play())."""
+        lf.cy_atomic_store_int(&self.st.paused, 1)
+
+    def toggle_pause(self):
+        """Pauses or continues performance, depending on current state."""
+        if lf.cy_atomic_load_int(&self.st.paused):
+            self.play()
+        else:
+            self.pause()
+
+    def stop(self):
+        """Stops performance (cannot be continued)."""
+        self._request_stop()
+
+    def score_event(self, bint absp2mode, str opcod, pfields):
+        """Sends a score event.
+
+        The event is dispatched by the performance thread at the start of
+        the next k-cycle. If absp2mode is non-zero, the start time of the
+        event is measured from the beginning of performance, instead of
+        the default of relative to the current time.
+        """
+        cdef Py_ssize_t n = len(pfields)
+        cdef Py_ssize_t i
+        cdef _PerfCommand *cmd = <_PerfCommand*>malloc(
+            sizeof(_PerfCommand) + n * sizeof(cs.MYFLT))
+        if cmd is NULL:
+            raise MemoryError
+        cmd.kind = _PT_SCORE_EVENT_ABSOLUTE if absp2mode else _PT_SCORE_EVENT
+        cmd.opcode = ord(opcod[0])
+        cmd.nfields = n
+        cmd.value = 0.0
+        cmd.pfields = <cs.MYFLT*>(cmd + 1)
+        cmd.text = NULL
+        try:
+            for i in range(n):
+                cmd.pfields[i] = <double>pfields[i]
+        except:
+            free(cmd)
+            raise
+        self._enqueue(cmd)
+
+    def input_message(self, str s):
+        """Sends a score event as a string, similarly to line events (-L)."""
+        cdef bytes encoded = s.encode()
+        cdef Py_ssize_t n = len(encoded)
+        cdef _PerfCommand *cmd = <_PerfCommand*>malloc(sizeof(_PerfCommand) + n + 1)
+        if cmd is NULL:
+            raise MemoryError
+        cmd.kind = _PT_INPUT_MESSAGE
+        cmd.nfields = 0
+        cmd.pfields = NULL
+        cmd.text = <char*>(cmd + 1)
+        strcpy(cmd.text, encoded)
+        self._enqueue(cmd)
+
+    def set_score_offset_seconds(self, double time_val):
+        """Sets the playback time pointer to the specified value (in seconds)."""
+        cdef _PerfCommand *cmd = <_PerfCommand*>malloc(sizeof(_PerfCommand))
+        if cmd is NULL:
+            raise MemoryError
+        cmd.kind = _PT_SCORE_OFFSET
+        cmd.nfields = 0
+        cmd.value = time_val
+        cmd.pfields = NULL
+        cmd.text = NULL
+        self._enqueue(cmd)
+
+    def flush_message_queue(self):
+        """Waits until all pending messages are actually received by the
+        performance thread.
+        """
+        cdef _PerfThreadState *st = self.st
+        with nogil:
+            while (lf.cy_ring_available(&st.queue)
+                    and lf.cy_atomic_load_int(&st.running)):
+                cs.csoundWaitThreadLock(st.drain_lock, 100)
+
+    def join(self) -> int:
+        """Waits until the performance is finished or fails.
+
+        Returns a positive value if the end of score was reached or
+        stop() was called, and a negative value if an error occured.
+        Also releases any resources associated with the performance thread.
+        """
+        if self.st.thread is not NULL:
+            join_thread(self.st.thread)
+            self.st.thread = NULL
+            self._joined()
+        return lf.cy_atomic_load_int(&self.st.status)
+
+
+## ----------------------------------------------------------------------------
+## Lockstep groups
+
+ctypedef struct _GroupState:
+    void *start_barrier       # members and the coordinator meet before a step
+    void *done_barrier        # ... and after it
+    int ready                 # 0: starting, 1: barriers created, -1: abort
+    int stop
+    int cycles                # k-cycles per step
+    int ksmps
+
+ctypedef struct _GroupMember:
+    _GroupState *group
+    cs.CSOUND *csound
+    _CycleStats *stats
+    void *thread
+    cs.MYFLT *block           # cycles * ksmps * nchnls samples of the last step
+    int *routing              # output channel of each channel, -1: dropped
+    int nchnls
+    int finished
+    double gain
+
+cdef cs.uintptr_t _group_member_routine(void *data) noexcept nogil:
+    """Performs one instance of a CsoundGroup, one step per barrier round."""
+    cdef _GroupMember *m = <_GroupMember*>data
+    cdef _GroupState *g = m.group
+    cdef size_t samples = g.ksmps * m.nchnls
+    cdef cs.MYFLT *dest
+    cdef int c
+    while lf.cy_atomic_load_int(&g.ready) == 0:
+        cs.csoundSleep(1)
+    if g.ready < 0:
+        return 0
+    while True:
+        cs.csoundWaitBarrier(g.start_barrier)
+        if g.stop:
+            break
+        for c in range(g.cycles):
+            dest = m.block + c * samples
+            if not m.finished and _perform_ksmps_timed(m.csound, m.stats) != 0:
+                m.finished = 1
+            if m.finished:
+                memset(dest, 0, samples * sizeof(cs.MYFLT))
+            else:
+                memcpy(dest, cs.csoundGetSpout(m.csound), samples * sizeof(cs.MYFLT))
+        cs.csoundWaitBarrier(g.done_barrier)
+    return 0
+
+cdef bint _group_step(_GroupState *g, _GroupMember *members, int size,
+                      cs.MYFLT *out, int nchnls) noexcept nogil:
+    """Runs one step of all the members and mixes their blocks into out
+    (frames x nchnls). Returns True when all members have finished.
+    """
+    cdef size_t frames = g.cycles * g.ksmps
+    cdef size_t f
+    cdef int i, c, r
+    cdef bint finished = True
+    cdef _GroupMember *m
+    cdef cs.MYFLT *src
+    cs.csoundWaitBarrier(g.start_barrier)
+    cs.csoundWaitBarrier(g.done_barrier)
+    memset(out, 0, frames * nchnls * sizeof(cs.MYFLT))
+    for i in range(size):
+        m = &members[i]
+        finished = finished and m.finished
+        src = m.block
+        for f in range(frames):
+            for c in range(m.nchnls):
+                r = m.routing[c]
+                if r >= 0:
+                    out[f * nchnls + r] += <cs.MYFLT>(m.gain * src[c])
+            src += m.nchnls
+    return finished
+
+
+cdef class CsoundGroup:
+    """Performs several Csound instances in lockstep, each on its own
+    native thread, mixing their outputs into one buffer.
+
+    Every step, all the instances perform 'cycles_per_step' k-cycles in
+    parallel, meeting on a thread barrier before and after the step; the
+    outputs (spout) are then summed, or routed to other channels, into
+    the group output without the GIL. Independent instances scale with
+    the number of cores where a single instance with -j does not.
+
+    The instances must be compiled and started, with the same sr and
+    ksmps, and should not open audio devices (use -n or host implemented
+    audio I/O). They must not be performed otherwise while in the group.
+
+        group = CsoundGroup([cs1, cs2, cs3], cycles_per_step=16)
+        group.render_to_file("mix.wav")
+        group.close()
+
+    Args:
+        instances: the Csound instances.
+        cycles_per_step: k-cycles performed between synchronizations.
+        nchnls: output channels (default: the largest nchnls).
+        routing: for each instance, the output channel of each of its
+            channels (None or -1 drops a channel). Default: channel n is
+            mixed into output channel n.
+        gains: gain applied to each instance (default: 1.0).
+    """
+
+    cdef _GroupState *st
+    cdef _GroupMember *members
+    cdef int size
+    cdef readonly int nchnls
+    cdef readonly int cycles_per_step
+    cdef cs.MYFLT *mix            # one step of output, for render_to_file()
+    cdef bint busy                # a perform call is running without the GIL
+    cdef bint all_finished
+    cdef list instances
+
+    def __cinit__(self):
+        self.st = NULL
+        self.members = NULL
+        self.mix = NULL
+
+    def __init__(self, instances, int cycles_per_step = 1, nchnls = None,
+                 routing = None, gains = None):
+        cdef Csound csound
+        cdef _GroupMember *m
+        cdef int i, c
+        self.instances = list(instances)
+        self.size = len(self.instances)
+        if self.size == 0:
+            raise ValueError("a group needs at least one Csound instance")
+        if cycles_per_step < 1:
+            raise ValueError("cycles_per_step must be at least 1")
+        if len({id(cs_) for cs_ in self.instances}) != self.size:
+            raise ValueError("a Csound instance can only be in a group once")
+        for csound in self.instances:
+            if csound.ptr is NULL:
+                raise ValueError("invalid Csound instance")
+        cdef Csound first = self.instances[0]
+        ksmps = cs.csoundGetKsmps(first.ptr)
+        sr = cs.csoundGetSr(first.ptr)
+        for csound in self.instances:
+            if cs.csoundGetKsmps(csound.ptr) != ksmps or cs.csoundGetSr(csound.ptr) != sr:
+                raise ValueError("all instances must have the same sr and ksmps")
+        if routing is not None and len(routing) != self.size:
+            raise ValueError("routing needs one entry per instance")
+        if gains is not None and len(gains) != self.size:
+            raise ValueError("gains needs one entry per instance")
+        self.nchnls = (max(cs.csoundGetNchnls((<Csound>c_).ptr) for c_ in self.instances)
+                       if nchnls is None else nchnls)
+        if self.nchnls < 1:
+            raise ValueError("nchnls must be at least 1")
+        self.cycles_per_step = cycles_per_step
+
+        self.st = <_GroupState*>calloc(1, sizeof(_GroupState))
+        self.members = <_GroupMember*>calloc(self.size, sizeof(_GroupMember))
+        self.mix = <cs.MYFLT*>malloc(cycles_per_step * ksmps * self.nchnls * sizeof(cs.MYFLT))
+        if self.st is NULL or self.members is NULL or self.mix is NULL:
+            raise MemoryError
+        self.st.cycles = cycles_per_step
+        self.st.ksmps = ksmps
+        for i in range(self.size):
+            csound = self.instances[i]
+            m = &self.members[i]
+            m.group = self.st
+            m.csound = csound.ptr
+            m.stats = csound._get_cycle_stats()
+            m.nchnls = cs.csoundGetNchnls(csound.ptr)
+            m.gain = 1.0 if gains is None else gains[i]
+            m.block = <cs.MYFLT*>calloc(cycles_per_step * ksmps * m.nchnls, sizeof(cs.MYFLT))
+            m.routing = <int*>malloc(m.nchnls * sizeof(int))
+            if m.block is NULL or m.routing is NULL:
+                raise MemoryError
+            if routing is not None and len(routing[i]) != m.nchnls:
+                raise ValueError(f"routing of instance {i} needs {m.nchnls} channels")
+            for c in range(m.nchnls):
+                if routing is None:
+                    r = c if c < self.nchnls else -1
+                else:
+                    r = -1 if routing[i][c] is None else routing[i][c]
+                if not -1 <= r < self.nchnls:
+                    raise ValueError(f"output channel {r} out of range")
+                m.routing[c] = r
+
+        # the threads wait for the barriers, sized once all threads exist
+        for i in range(self.size):
+            self.members[i].thread = create_thread(_group_member_routine, &self.members[i])
+            if self.members[i].thread is NULL:
+                self._release()
+                raise RuntimeError("could not create group thread")
+        self.st.start_barrier = csoundCreateBarrier(self.size + 1)
+        self.st.done_barrier = csoundCreateBarrier(self.size + 1)
+        if self.st.start_barrier is NULL or self.st.done_barrier is NULL:
+            self._release()
+            raise RuntimeError("could not create group barriers")
+        lf.cy_atomic_store_int(&self.st.ready, 1)
+
+    def __dealloc__(self):
+        self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __len__(self):
+        return self.size
+
+    cdef _release(self):
+        """Stops and joins the member threads, then frees everything."""
+        cdef int i
+        if self.st is not NULL:
+            if self.st.ready == 1:
+                # the threads are waiting for the next step
+                self.st.stop = 1
+                with nogil:
+                    cs.csoundWaitBarrier(self.st.start_barrier)
+            else:
+                lf.cy_atomic_store_int(&self.st.ready, -1)
+        if self.members is not NULL:
+            for i in range(self.size):
+                if self.members[i].thread is not NULL:
+                    join_thread(self.members[i].thread)
+                free(self.members[i].block)
+                free(self.members[i].routing)
+            free(self.members)
+            self.members = NULL
+        if self.st is not NULL:
+            if self.st.start_barrier is not NULL:
+                destroy_barrier(self.st.start_barrier)
+            if self.st.done_barrier is not NULL:
+                destroy_barrier(self.st.done_barrier)
+            free(self.st)
+            self.st = NULL
+        free(self.mix)
+        self.mix = NULL
+
+    cdef _check(self):
+        if self.members is NULL:
+            raise ValueError("the group is closed")
+        if self.busy:
+            raise RuntimeError("the group is already performing in another thread")
+
+    @property
+    def frames_per_step(self) -> int:
+        """Number of output frames of one step."""
+        return self.cycles_per_step * self.st.ksmps if self.st is not NULL else 0
+
+    @property
+    def finished(self) -> bool:
+        """True when all the instances have reached the end of their score."""
+        return self.all_finished
+
+    def perform(self, int steps, object out = None) -> int:
+        """Performs up to 'steps' steps without the GIL.
+
+        If out is given, the mixed output is copied into it: a writable
+        C-contiguous MYFLT buffer with room for steps * frames_per_step
+        * nchnls values, i.e. shape (steps * frames_per_step, nchnls).
+
+        Returns the number of steps performed; a value smaller than
+        'steps' means all the instances have finished.
+        """
+        cdef Py_buffer view
+        cdef char *dest = NULL
+        cdef size_t step_bytes
+        cdef int done = 0
+        self._check()
+        if steps < 0:
+            raise ValueError("steps must not be negative")
+        step_bytes = self.cycles_per_step * self.st.ksmps * self.nchnls * sizeof(cs.MYFLT)
+        if out is not None:
+            _get_myflt_buffer(out, &view, True)
+            if <size_t>view.len < <size_t>steps * step_bytes:
+                PyBuffer_Release(&view)
+                raise ValueError(
+                    f"buffer too small for {steps} steps: "
+                    f"need {steps * step_bytes} bytes, got {view.len}")
+            dest = <char*>view.buf
+        self.busy = True
+        try:
+            while done < steps and not self.all_finished:
+                with nogil:
+                    self.all_finished = _group_step(self.st, self.members, self.size,
+                                                    self.mix, self.nchnls)
+                    if dest is not NULL:
+                        memcpy(dest + done * step_bytes, self.mix, step_bytes)
+                done += 1
+                if done % 1024 == 0:
+                    PyErr_CheckSignals()
+        finally:
+            self.busy = False
+            if dest is not NULL:
+                PyBuffer_Release(&view)
+        return done
+
+    def render_to_file(self, path, duration=None, format=None, str sample_type = "float32",
+                       Py_ssize_t buffer_size = 1 << 20) -> int:
+        """Performs the group until all the instances have finished (or for
+        'duration' seconds), writing the mixed output to a sound file.
+
+        See SoundFileWriter for the format and sample_type arguments;
+        samples are scaled by 1 / 0dbfs of the first instance. Returns the
+        number of frames written.
+        """
+        self._check()
+        cdef cs.CSOUND *first = (<Csound>self.instances[0]).ptr
+        cdef Py_ssize_t frames = self.cycles_per_step * self.st.ksmps
+        cdef long long limit = -1
+        cdef long long done = 0
+        cdef bint failed = False
+        cdef SoundFileWriter writer = SoundFileWriter(
+            path, cs.csoundGetSr(first), self.nchnls, format, sample_type,
+            buffer_size, 1.0 / cs.csoundGet0dBFS(first))
+        if duration is not None:
+            limit = <long long>(duration * cs.csoundGetKr(first) / self.cycles_per_step + 0.5)
+        self.busy = True
+        try:
+            while not self.all_finished and not failed and (limit < 0 or done < limit):
+                with nogil:
+                    self.all_finished = _group_step(self.st, self.members, self.size,
+                                                    self.mix, self.nchnls)
+                    failed = writer.write_myflt(self.mix, frames) != 0
+                done += 1
+                if done % 1024 == 0:
+                    PyErr_CheckSignals()
+            if failed:
+                writer._raise_error()
+        except BaseException:
+            try:
+                writer.close()
+            except OSError:
+                pass
+            raise
+        finally:
+            self.busy = False
+        writer.close()
+        return writer.frames
+
+    def close(self):
+        """Stops the member threads. The instances are left as they are."""
+        if self.busy:
+            raise RuntimeError("cannot close the group while it is performing")
+        self._release()
+
+
+## ----------------------------------------------------------------------------
+## Asyncio front end
+
+cdef extern from *:
+    """
+    #ifdef _WIN32
+    #include <winsock2.h>
+    #ifdef _MSC_VER
+    #pragma comment(lib, "ws2_32.lib")
+    #endif
+    static void cy_wakeup_send(size_t fd) { send((SOCKET)fd, "x", 1, 0); }
+    #else
+    #include <sys/socket.h>
+    static void cy_wakeup_send(size_t fd) { send((int)fd, "x", 1, 0); }
+    #endif
+    """
+    void cy_wakeup_send(size_t fd) nogil
+
+ctypedef struct _AsyncState:
+    cs.CSOUND *csound
+    size_t wakeup_fd         # non-blocking socket read by the event loop
+    int pending              # set while a wakeup has not been handled
+    cs.MYFLT wait_time       # wake up once the score time reaches this
+    int watch_messages       # wake up when the message buffer is not empty
+    Py_ssize_t nwatch
+    cs.MYFLT **watch_ptrs    # control channels to watch for changes
+    cs.MYFLT *watch_last
+
+cdef void _async_wakeup(_AsyncState *st) noexcept nogil:
+    if not lf.cy_atomic_load_int(&st.pending):
+        lf.cy_atomic_store_int(&st.pending, 1)
+        cy_wakeup_send(st.wakeup_fd)
+
+cdef void _async_process(void *data) noexcept nogil:
+    """Performance thread callback, run before every k-cycle."""
+    cdef _AsyncState *st = <_AsyncState*>data
+    cdef bint wake = False
+    cdef cs.MYFLT value
+    cdef Py_ssize_t i
+    if cs.csoundGetScoreTime(st.csound) >= lf.cy_atomic_load_myflt(&st.wait_time):
+        wake = True
+    if st.watch_messages and cs.csoundGetMessageCnt(st.csound) > 0:
+        wake = True
+    for i in range(st.nwatch):
+        value = lf.cy_atomic_load_myflt(st.watch_ptrs[i])
+        if value != st.watch_last[i]:
+            st.watch_last[i] = value
+            wake = True
+    if wake:
+        _async_wakeup(st)
+
+cdef void _async_finish(void *data) noexcept nogil:
+    # sent even if 'pending' looks set: the pump may have cleared it and
+    # read running == 1 before this thread's store of running = 0
+    cdef _AsyncState *st = <_AsyncState*>data
+    lf.cy_atomic_store_int(&st.pending, 1)
+    cy_wakeup_send(st.wakeup_fd)
+
+
+@cython.no_gc_clear
+cdef class AsyncCsound:
+    """asyncio front end to a Csound instance.
+
+    The performance runs on a CsoundPerformanceThread. Before every k-cycle
+    the performance thread checks, without the GIL, whether anything an
+    awaiting coroutine is interested in has happened (score time reached,
+    new messages, watched channel changed, end of performance) and if so
+    wakes the event loop through a socket pair. Nothing is polled.
+
+        async def main():
+            cs = Csound()
+            acs = AsyncCsound(cs, watch=["rms"], messages=True)
+            cs.compile_csd("score.csd")
+            task = asyncio.create_task(acs.perform())
+            await acs.wait_until(10.0)
+            async for changes in acs.channel_changes():
+                print(changes["rms"])
+            status = await task
+
+    Create the AsyncCsound before compiling to capture all messages.
+    """
+
+    cdef _AsyncState *st
+    cdef readonly Csound csound
+    cdef readonly CsoundPerformanceThread thread
+    cdef readonly tuple watched
+    cdef bint _messages_enabled
+    cdef bint _finished
+    cdef int _status
+    cdef object _rsock
+    cdef object _wsock
+    cdef object _pump_task
+    cdef object _done
+    cdef object _event
+    cdef list _waiters
+    cdef object _messages
+
+    def __cinit__(self):
+        self.st = NULL
+
+    def __init__(self, Csound csound, watch = (), bint messages = False,
+                 int max_messages = 10000):
+        """Wraps a Csound instance.
+
+        Args:
+            csound: the Csound instance to perform.
+            watch: names of control channels whose changes are reported by
+                channel_changes().
+            messages: store Csound messages for messages() (uses the
+                Csound message buffer).
+            max_messages: number of messages kept when they are not
+                consumed; older messages are dropped.
+        """
+        import asyncio
+        import collections
+        import socket
+        self.csound = csound
+        self.watched = tuple(watch)
+        self.st = <_AsyncState*>calloc(1, sizeof(_AsyncState))
+        if self.st is NULL:
+            raise MemoryError
+        self.st.csound = csound.ptr
+        self.st.wait_time = INFINITY
+        self._rsock, self._wsock = socket.socketpair()
+        self._rsock.setblocking(False)
+        self._wsock.setblocking(False)
+        self.st.wakeup_fd = self._wsock.fileno()
+        self._messages_enabled = messages
+        self._messages = collections.deque(maxlen=max_messages)
+        self._waiters = []
+        self._event = asyncio.Event()
+        if messages:
+            csound.create_message_buffer(0)
+
+    def __dealloc__(self):
+        if self.st is NULL:
+            return
+        if self.thread is not None:
+            # the performance thread uses st until it exits
+            self.thread.stop()
+            self.thread.join()
+        free(self.st.watch_ptrs)
+        free(self.st.watch_last)
+        free(self.st)
+        self.st = NULL
+
+    def start(self):
+        """Starts the performance thread, calling csound.start() first.
+
+        Must be called from a running event loop. Does nothing if the
+        performance was already started.
+        """
+        import asyncio
+        cdef Py_ssize_t i
+        if self.thread is not None:
+            return
+        loop = asyncio.get_running_loop()
+        if self.csound.start() != 0:
+            raise RuntimeError("could not start the performance")
+        n = len(self.watched)
+        self.st.watch_last = <cs.MYFLT*>calloc(n or 1, sizeof(cs.MYFLT))
+        if self.st.watch_last is NULL:
+            raise MemoryError
+        self.st.watch_ptrs = _resolve_control_channels(self.csound, self.watched, n)
+        for i in range(n):
+            self.st.watch_last[i] = lf.cy_atomic_load_myflt(self.st.watch_ptrs[i])
+        self.st.nwatch = n
+        self.st.watch_messages = self._messages_enabled
+        self._update_wait_time()
+        self._done = loop.create_future()
+        self.thread = CsoundPerformanceThread(self.csound)
+        self.thread.set_process_callback(_async_process, self.st)
+        self.thread.set_finish_callback(_async_finish, self.st)
+        self._pump_task = loop.create_task(self._pump())
+        self.thread.play()
+        self._notify()
+
+    async def perform(self) -> int:
+        """Starts the performance if needed and waits until it is finished.
+
+        Returns the status of the performance thread (positive at the end of
+        the score or after stop(), negative on error).
+        """
+        import asyncio
+        self.start()
+        return await asyncio.shield(self._done)
+
+    def stop(self):
+        """Stops the performance."""
+        if self.thread is not None:
+            self.thread.stop()
+
+    async def wait_until(self, double score_time) -> bool:
+        """Waits until the score time reaches score_time (in seconds).
+
+        Returns True when the time is reached, False if the performance
+        ended before.
+        """
+        import asyncio
+        if self._finished:
+            return False
+        if self.thread is not None and self.csound.get_score_time() >= score_time:
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (score_time, id(waiter), waiter))
+        self._update_wait_time()
+        return await waiter
+
+    async def messages(self):
+        """Async iterator over the messages printed by Csound.
+
+        Requires messages=True; ends with the performance.
+        """
+        if not self._messages_enabled:
+            raise RuntimeError("messages were not enabled for this instance")
+        while True:
+            event = self._event
+            while self._messages:
+                yield self._messages.popleft()
+            if self._finished:
+                return
+            await event.wait()
+
+    async def channel_changes(self):
+        """Async iterator over changes of the watched control channels.
+
+        Yields dicts mapping channel names to their new values, with the
+        channels that changed since the previous step; ends with the
+        performance.
+        """
+        cdef Py_ssize_t i
+        last = None
+        while True:
+            event = self._event
+            if self.thread is None:
+                await event.wait()
+                continue
+            values = [lf.cy_atomic_load_myflt(self.st.watch_ptrs[i])
+                      for i in range(self.st.nwatch)]
+            if last is not None:
+                changes = {name: value for name, value, old
+                           in zip(self.watched, values, last) if value != old}
+                if changes:
+                    yield changes
+            last = values
+            if self._finished:
+                return
+            await event.wait()
+
+    async def _pump(self):
+        import asyncio
+        loop = asyncio.get_running_loop()
+        try:
+            while not self._finished:
+                await loop.sock_recv(self._rsock, 4096)
+                lf.cy_atomic_store_int(&self.st.pending, 0)
+                self._dispatch(not self.thread.is_running())
+        finally:
+            if not self._finished:
+                # cancelled: the performance thread must not outlive the socket
+                self.thread.stop()
+                self.thread.join()
+            self._rsock.close()
+            self._wsock.close()
+
+    cdef _dispatch(self, bint finished):
+        """Handles a wakeup from the performance thread."""
+        cdef double now = self.csound.get_score_time()
+        while self._waiters and (finished or self._waiters[0][0] <= now):
+            score_time, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(score_time <= now)
+        self._update_wait_time()
+        if self._messages_enabled:
+            while self.csound.get_message_cnt() > 0:
+                self._messages.append(self.csound.get_first_message())
+                self.csound.pop_first_message()
+        if finished:
+            self._finished = True
+            self._status = self.thread.join()
+            self._done.set_result(self._status)
+        self._notify()
+
+    cdef _notify(self):
+        """Wakes up the iterators waiting for the next event."""
+        import asyncio
+        event = self._event
+        self._event = asyncio.Event()
+        event.set()
+
+    cdef _update_wait_time(self):
+        lf.cy_atomic_store_myflt(
+            &self.st.wait_time, self._waiters[0][0] if self._waiters else INFINITY)
+
+    @property
+    def finished(self) -> bool:
+        """True once the performance has ended."""
+        return self._finished
+
+
+## ----------------------------------------------------------------------------
+## Instance pool
+
+class CsoundPool:
+    """Pool of reusable Csound instances.
+
+    Creating a Csound instance loads all plugin opcodes, which is slow
+    compared to resetting an existing one. Instances checked in are
+    recycled with csound.reset(), and the stored options (and params) are
+    applied again, so a checked out instance is always fresh:
+
+        pool = CsoundPool(options=["-d", "-n"], max_size=4)
+        with pool.instance() as cs:
+            cs.compile_csd("score.csd")
+            cs.run()
+
+    An instance is discarded instead of recycled when checked in with
+    discard=True, when the with-block raises, when reset() fails or when
+    the optional health_check(cs) returns False. Idle instances older than
+    max_idle seconds are evicted. The pool is thread-safe.
+    """
+
+    def __init__(self, options=(), Params params = None, int max_size = 8,
+                 max_idle = None, health_check = None, int prewarm = 0):
+        """Creates the pool.
+
+        Args:
+            options: command-line options applied with set_option() to every
+                new or recycled instance.
+            params: Params applied with set_params() after the options.
+            max_size: maximum number of instances, idle and checked out.
+            max_idle: seconds after which an idle instance is evicted
+                (None: never).
+            health_check: callable taking a recycled instance and returning
+                False if it must be discarded.
+            prewarm: number of instances to create immediately.
+        """
+        import threading
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.options = tuple(options)
+        self.params = params
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.health_check = health_check
+        self._idle = []        # (checkin time, instance), most recent last
+        self._in_use = set()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stats = dict(hits=0, misses=0, created=0, resets=0, discarded=0,
+                           evicted=0, create_time=0.0, reset_time=0.0)
+        self.prewarm(prewarm)
+
+    def _configure(self, Csound cs):
+        for option in self.options:
+            if cs.set_option(option) != 0:
+                raise ValueError(f"invalid option: {option}")
+        if self.params is not None:
+            cs.set_params(self.params)
+
+    def _create(self) -> Csound:
+        start = time.perf_counter()
+        cs = Csound()
+        self._configure(cs)
+        with self._cond:
+            self._stats["created"] += 1
+            self._stats["create_time"] += time.perf_counter() - start
+        return cs
+
+    def prewarm(self, int n):
+        """Creates idle instances until n are available (within max_size)."""
+        while True:
+            with self._cond:
+                if (len(self._idle) >= n or self._closed
+                        or len(self._idle) + len(self._in_use) >= self.max_size):
+                    return
+                # reserve the slot while creating the instance
+                placeholder = object()
+                self._in_use.add(placeholder)
+            try:
+                cs = self._create()
+            finally:
+                with self._cond:
+                    self._in_use.discard(placeholder)
+            with self._cond:
+                self._idle.append((time.monotonic(), cs))
+                self._cond.notify()
+
+    def evict_idle(self) -> int:
+        """Discards the instances idle for more than max_idle seconds.
+        Returns the number of evicted instances.
+        """
+        with self._cond:
+            return self._evict_idle()
+
+    def _evict_idle(self) -> int:
+        if self.max_idle is None:
+            return 0
+        limit = time.monotonic() - self.max_idle
+        keep = [entry for entry in self._idle if entry[0] >= limit]
+        evicted = len(self._idle) - len(keep)
+        self._idle = keep
+        self._stats["evicted"] += evicted
+        return evicted
+
+    def checkout(self, timeout = None) -> Csound:
+        """Returns a fresh instance, recycled if possible.
+
+        When max_size instances are checked out, waits up to 'timeout'
+        seconds (None: forever) for one to be checked in, then raises
+        TimeoutError.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("pool is closed")
+                self._evict_idle()
+                if self._idle:
+                    cs = self._idle.pop()[1]
+                    self._in_use.add(cs)
+                    self._stats["hits"] += 1
+                    return cs
+                if len(self._in_use) < self.max_size:
+                    placeholder = object()
+                    self._in_use.add(placeholder)
+                    self._stats["misses"] += 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("no Csound instance available")
+                self._cond.wait(remaining)
+        try:
+            cs = self._create()
+        except BaseException:
+            with self._cond:
+                self._in_use.discard(placeholder)
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._in_use.discard(placeholder)
+            self._in_use.add(cs)
+        return cs
+
+    def checkin(self, Csound cs, bint discard = False):
+        """Returns an instance to the pool.
+
+        The instance is reset and reconfigured, or discarded if 'discard'
+        is True (e.g. after a failed compile) or if recycling fails.
+        """
+        with self._cond:
+            if cs not in self._in_use:
+                raise ValueError("instance was not checked out from this pool")
+        if not discard and not self._closed:
+            start = time.perf_counter()
+            try:
+                cs.reset()
+                self._configure(cs)
+                discard = self.health_check is not None and not self.health_check(cs)
+            except Exception:
+                discard = True
+            elapsed = time.perf_counter() - start
+        with self._cond:
+            self._in_use.discard(cs)
+            if discard or self._closed:
+                self._stats["discarded"] += 1
+            else:
+                self._stats["resets"] += 1
+                self._stats["reset_time"] += elapsed
+                self._idle.append((time.monotonic(), cs))
+            self._cond.notify()
+
+    def instance(self, timeout = None):
+        """Context manager checking out an instance and checking it back in,
+        discarding it if the block raises.
+        """
+        return _PooledCsound(self, timeout)
+
+    def stats(self) -> dict:
+        """Returns pool statistics: hits, misses, created, resets, discarded,
+        evicted, idle and in_use counts, and the mean creation and reset
+        times in seconds.
+        """
+        with self._cond:
+            stats = dict(self._stats)
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = len(self._in_use)
+        stats["mean_create_time"] = (
+            stats["create_time"] / stats["created"] if stats["created"] else 0.0)
+        stats["mean_reset_time"] = (
+            stats["reset_time"] / stats["resets"] if stats["resets"] else 0.0)
+        return stats
+
+    def close(self):
+        """Discards the idle instances; instances checked in later are
+        discarded too.
+        """
+        with self._cond:
+            self._closed = True
+            self._idle.clear()
+            self._cond.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class _PooledCsound:
+    """Context manager returned by CsoundPool.instance()."""
+
+    def __init__(self, pool, timeout):
+        self.pool = pool
+        self.timeout = timeout
+        self.csound = None
+
+    def __enter__(self):
+        self.csound = self.pool.checkout(self.timeout)
+        return self.csound
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.pool.checkin(self.csound, discard=exc_type is not None)
+        self.csound = None
+        return False
+
+
 ## ----------------------------------------------------------------------------
 ## Miscellaneous functions
 
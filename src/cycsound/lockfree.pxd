@@ -0,0 +1,239 @@
+"""Lock-free primitives shared by the native helpers in _core.pyx.
+
+Portable atomic load/store and read-modify-write wrappers and a
+single-producer/single-consumer ring buffer of fixed-size elements.
+Everything here is plain C and can be used without the GIL.
+"""
+
+from csound cimport MYFLT
+
+cdef extern from *:
+    """
+    #include <stdlib.h>
+    #include <string.h>
+
+    #if defined(_MSC_VER) && !defined(__clang__)
+    #ifndef WIN32_LEAN_AND_MEAN
+    #define WIN32_LEAN_AND_MEAN
+    #endif
+    #include <windows.h>
+    #define CY_ATOMIC_MSVC 1
+    #endif
+
+    /* -- atomics ------------------------------------------------------- */
+
+    static inline int cy_atomic_load_int(const int *p) {
+    #ifdef CY_ATOMIC_MSVC
+        int v = *(volatile const int *)p; MemoryBarrier(); return v;
+    #else
+        return __atomic_load_n(p, __ATOMIC_ACQUIRE);
+    #endif
+    }
+
+    static inline void cy_atomic_store_int(int *p, int v) {
+    #ifdef CY_ATOMIC_MSVC
+        MemoryBarrier(); *(volatile int *)p = v;
+    #else
+        __atomic_store_n(p, v, __ATOMIC_RELEASE);
+    #endif
+    }
+
+    static inline unsigned int cy_atomic_load_uint(const unsigned int *p) {
+    #ifdef CY_ATOMIC_MSVC
+        unsigned int v = *(volatile const unsigned int *)p; MemoryBarrier(); return v;
+    #else
+        return __atomic_load_n(p, __ATOMIC_ACQUIRE);
+    #endif
+    }
+
+    static inline void cy_atomic_store_uint(unsigned int *p, unsigned int v) {
+    #ifdef CY_ATOMIC_MSVC
+        MemoryBarrier(); *(volatile unsigned int *)p = v;
+    #else
+        __atomic_store_n(p, v, __ATOMIC_RELEASE);
+    #endif
+    }
+
+    /* read-modify-write, sequentially consistent; return the new value */
+    static inline int cy_atomic_add_int(int *p, int v) {
+    #ifdef CY_ATOMIC_MSVC
+        return InterlockedExchangeAdd((volatile LONG *)p, v) + v;
+    #else
+        return __atomic_add_fetch(p, v, __ATOMIC_SEQ_CST);
+    #endif
+    }
+
+    static inline int cy_atomic_or_int(int *p, int v) {
+    #ifdef CY_ATOMIC_MSVC
+        return InterlockedOr((volatile LONG *)p, v) | v;
+    #else
+        return __atomic_or_fetch(p, v, __ATOMIC_SEQ_CST);
+    #endif
+    }
+
+    static inline int cy_atomic_and_int(int *p, int v) {
+    #ifdef CY_ATOMIC_MSVC
+        return InterlockedAnd((volatile LONG *)p, v) & v;
+    #else
+        return __atomic_and_fetch(p, v, __ATOMIC_SEQ_CST);
+    #endif
+    }
+
+    static inline void *cy_atomic_exchange_ptr(void **p, void *v) {
+    #ifdef CY_ATOMIC_MSVC
+        return InterlockedExchangePointer((PVOID volatile *)p, v);
+    #else
+        return __atomic_exchange_n(p, v, __ATOMIC_SEQ_CST);
+    #endif
+    }
+
+    static inline void *cy_atomic_load_ptr(void **p) {
+    #ifdef CY_ATOMIC_MSVC
+        void *v = *(void * volatile *)p; MemoryBarrier(); return v;
+    #else
+        return __atomic_load_n(p, __ATOMIC_ACQUIRE);
+    #endif
+    }
+
+    /* control channels: see "threadsafe.c" in the Csound sources */
+    static inline MYFLT cy_atomic_load_myflt(const MYFLT *p) {
+        MYFLT v;
+    #ifdef CY_ATOMIC_MSVC
+        v = *(volatile const MYFLT *)p; MemoryBarrier();
+    #else
+        __atomic_load(p, &v, __ATOMIC_SEQ_CST);
+    #endif
+        return v;
+    }
+
+    static inline void cy_atomic_store_myflt(MYFLT *p, MYFLT v) {
+    #ifdef CY_ATOMIC_MSVC
+        MemoryBarrier(); *(volatile MYFLT *)p = v; MemoryBarrier();
+    #else
+        __atomic_store(p, &v, __ATOMIC_SEQ_CST);
+    #endif
+    }
+
+    /* -- single-producer / single-consumer ring ------------------------ */
+
+    typedef struct {
+        char *data;
+        unsigned int capacity;   /* number of elements, power of two */
+        unsigned int mask;
+        unsigned int elemsize;
+        unsigned int head;       /* next write position, owned by producer */
+        unsigned int tail;       /* next read position, owned by consumer */
+    } cy_ring;
+
+    static int cy_ring_init(cy_ring *r, unsigned int capacity, unsigned int elemsize) {
+        unsigned int n = 1;
+        while (n < capacity) n <<= 1;
+        r->data = (char *)calloc(n, elemsize);
+        if (r->data == NULL) return -1;
+        r->capacity = n;
+        r->mask = n - 1;
+        r->elemsize = elemsize;
+        r->head = 0;
+        r->tail = 0;
+        return 0;
+    }
+
+    static void cy_ring_free(cy_ring *r) {
+        free(r->data);
+        r->data = NULL;
+        r->capacity = r->mask = r->head = r->tail = 0;
+    }
+
+    /* number of elements ready to be read */
+    static inline unsigned int cy_ring_available(cy_ring *r) {
+        return cy_atomic_load_uint(&r->head) - cy_atomic_load_uint(&r->tail);
+    }
+
+    /* number of elements that can be written */
+    static inline unsigned int cy_ring_space(cy_ring *r) {
+        return r->capacity - cy_ring_available(r);
+    }
+
+    static void cy_ring__copy_in(cy_ring *r, unsigned int pos, const char *src, unsigned int n) {
+        unsigned int start = pos & r->mask;
+        unsigned int first = r->capacity - start;
+        if (first > n) first = n;
+        memcpy(r->data + (size_t)start * r->elemsize, src, (size_t)first * r->elemsize);
+        if (n > first)
+            memcpy(r->data, src + (size_t)first * r->elemsize, (size_t)(n - first) * r->elemsize);
+    }
+
+    static void cy_ring__copy_out(cy_ring *r, unsigned int pos, char *dst, unsigned int n) {
+        unsigned int start = pos & r->mask;
+        unsigned int first = r->capacity - start;
+        if (first > n) first = n;
+        memcpy(dst, r->data + (size_t)start * r->elemsize, (size_t)first * r->elemsize);
+        if (n > first)
+            memcpy(dst + (size_t)first * r->elemsize, r->data, (size_t)(n - first) * r->elemsize);
+    }
+
+    /* producer: write up to n elements, returns the number written */
+    static unsigned int cy_ring_write(cy_ring *r, const void *src, unsigned int n) {
+        unsigned int head = r->head;
+        unsigned int space = r->capacity - (head - cy_atomic_load_uint(&r->tail));
+        if (n > space) n = space;
+        if (n == 0) return 0;
+        cy_ring__copy_in(r, head, (const char *)src, n);
+        cy_atomic_store_uint(&r->head, head + n);
+        return n;
+    }
+
+    /* consumer: copy up to n elements without consuming them */
+    static unsigned int cy_ring_peek(cy_ring *r, void *dst, unsigned int n) {
+        unsigned int tail = r->tail;
+        unsigned int avail = cy_atomic_load_uint(&r->head) - tail;
+        if (n > avail) n = avail;
+        if (n == 0) return 0;
+        cy_ring__copy_out(r, tail, (char *)dst, n);
+        return n;
+    }
+
+    /* consumer: read up to n elements, returns the number read */
+    static unsigned int cy_ring_read(cy_ring *r, void *dst, unsigned int n) {
+        n = cy_ring_peek(r, dst, n);
+        if (n) cy_atomic_store_uint(&r->tail, r->tail + n);
+        return n;
+    }
+
+    /* consumer: discard up to n elements, returns the number skipped */
+    static unsigned int cy_ring_skip(cy_ring *r, unsigned int n) {
+        unsigned int tail = r->tail;
+        unsigned int avail = cy_atomic_load_uint(&r->head) - tail;
+        if (n > avail) n = avail;
+        if (n) cy_atomic_store_uint(&r->tail, tail + n);
+        return n;
+    }
+    """
+    int cy_atomic_load_int(const int *p) nogil
+    void cy_atomic_store_int(int *p, int v) nogil
+    unsigned int cy_atomic_load_uint(const unsigned int *p) nogil
+    void cy_atomic_store_uint(unsigned int *p, unsigned int v) nogil
+    int cy_atomic_add_int(int *p, int v) nogil
+    int cy_atomic_or_int(int *p, int v) nogil
+    int cy_atomic_and_int(int *p, int v) nogil
+    void *cy_atomic_exchange_ptr(void **p, void *v) nogil
+    void *cy_atomic_load_ptr(void **p) nogil
+    MYFLT cy_atomic_load_myflt(const MYFLT *p) nogil
+    void cy_atomic_store_myflt(MYFLT *p, MYFLT v) nogil
+
+    ctypedef struct cy_ring:
+        char *data
+        unsigned int capacity
+        unsigned int mask
+        unsigned int elemsize
+        unsigned int head
+        unsigned int tail
+
+    int cy_ring_init(cy_ring *r, unsigned int capacity, unsigned int elemsize) nogil
+    void cy_ring_free(cy_ring *r) nogil
+    unsigned int cy_ring_available(cy_ring *r) nogil
+    unsigned int cy_ring_space(cy_ring *r) nogil
+    unsigned int cy_ring_write(cy_ring *r, const void *src, unsigned int n) nogil
+    unsigned int cy_ring_peek(cy_ring *r, void *dst, unsigned int n) nogil
+    unsigned int cy_ring_read(cy_ring *r, void *dst, unsigned int n) nogil
+    unsigned int cy_ring_skip(cy_ring *r, unsigned int n) nogil
@@ -1,5 +1,6 @@
 """Tests for cycsound CLI."""
 
+import json
 import subprocess
 import tempfile
 from pathlib import Path
@@ -82,12 +83,81 @@ class TestCLI:
             assert "Rendering:" not in result.stdout
             assert "Done:" not in result.stdout
 
+    def test_render_native(self):
+        """Test render command with the in-process writer."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = Path(tmpdir) / "output.w64"
+            result = run_cli("render", "--native", "-t", "int24", "tests/test1.csd",
+                             "-o", str(output_path))
+            assert result.returncode == 0
+            assert output_path.read_bytes()[:4] == b"riff"
+
     def test_render_missing_file(self):
         """Test render command with missing file."""
         result = run_cli("render", "/nonexistent/file.csd")
         assert result.returncode == 1
         assert "Error:" in result.stderr
 
+    def test_render_parallel(self):
+        """Test rendering several files in worker processes."""
+        csd = Path("tests/test1.csd").read_text()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name in ("a", "b", "c"):
+                (Path(tmpdir) / f"{name}.csd").write_text(csd)
+            outdir = Path(tmpdir) / "out"
+            result = run_cli("render", "-j", "2", "-o", str(outdir),
+                             str(Path(tmpdir) / "*.csd"))
+            assert result.returncode == 0
+            assert "Rendered 3/3 files" in result.stdout
+            assert "realtime" in result.stdout
+            for name in ("a", "b", "c"):
+                assert (outdir / f"{name}.wav").stat().st_size > 0
+
+    def test_render_duplicate_outputs(self):
+        """Test that two inputs rendering to the same file are refused."""
+        csd = Path("tests/test1.csd").read_text()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name in ("a", "b"):
+                (Path(tmpdir) / name).mkdir()
+                (Path(tmpdir) / name / "x.csd").write_text(csd)
+            outdir = Path(tmpdir) / "out"
+            result = run_cli("render", "-j", "2", "-o", str(outdir),
+                             str(Path(tmpdir) / "*" / "x.csd"))
+            assert result.returncode == 1
+            assert "both render to" in result.stderr
+            assert not (outdir / "x.wav").exists()
+
+    def test_render_manifest_failure(self):
+        """Test that a failing job makes the batch exit non-zero."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manifest = Path(tmpdir) / "jobs.txt"
+            output = Path(tmpdir) / "ok.wav"
+            manifest.write_text(
+                f"{Path('tests/test1.csd').resolve()}\t{output}\n"
+                "# comment\n"
+                "missing.csd\n"
+            )
+            result = run_cli("render", "-j", "2", "-m", str(manifest))
+            assert result.returncode == 1
+            assert output.exists()
+            assert "FAIL" in result.stderr
+
+    def test_bench_json(self):
+        """Test bench command with JSON output."""
+        result = run_cli("bench", "--json", "-n", "2", "-w", "0", "tests/test1.csd")
+        assert result.returncode == 0
+        data = json.loads(result.stdout)
+        assert data["repeat"] == 2
+        assert data["audio_seconds"] > 0
+        assert data["realtime_factor"] > 0
+        assert 0 < data["kcycle"]["p50"] <= data["kcycle"]["p99"] <= data["kcycle"]["max"]
+
+    def test_bench_missing_file(self):
+        """Test bench command with missing file."""
+        result = run_cli("bench", "/nonexistent/file.csd")
+        assert result.returncode == 1
+        assert "Error:" in result.stderr
+
     def test_play_missing_file(self):
         """Test play command with missing file."""
         result = run_cli("play", "/nonexistent/file.csd")
@@ -1,5 +1,11 @@
 """Tests for cycsound Cython extension module."""
 
+import array
+import struct
+import wave
+
+import pytest
+
 import cycsound
 
 
@@ -139,3 +145,565 @@ def test_filetype_enum():
     assert cycsound.FileType.OGG == 22
     assert cycsound.FileType.STD_MIDI == 39
     assert cycsound.FileType.OTHER_BINARY == 65
+
+
+def test_run_budget():
+    """Test run() stops after a cycle or time budget."""
+    orc = """
+sr = 44100
+ksmps = 32
+nchnls = 2
+0dbfs = 1
+
+instr 1
+    asig oscil 0.5, 440
+    outs asig, asig
+endin
+"""
+    with cycsound.Csound() as cs:
+        cs.set_option("-n")
+        cs.set_option("-d")
+        cs.compile_orc(orc)
+        cs.read_score("i1 0 10")
+        assert cs.run(max_cycles=10) == 0
+        assert cs.get_current_time_samples() == 10 * 32
+
+    with cycsound.Csound() as cs:
+        cs.set_option("-n")
+        cs.set_option("-d")
+        cs.compile_orc(orc)
+        cs.read_score("i1 0 10")
+        assert cs.run(max_seconds=0.5, check_signals_every=1) == 0
+        assert cs.get_score_time() < 1.0
+
+
+def test_perform_ksmps_n():
+    """Test perform_ksmps_n() copies spout into a caller buffer."""
+    typecode = "d" if cycsound.get_size_of_myflt() == 8 else "f"
+    with cycsound.Csound() as cs:
+        cs.set_option("-n")
+        cs.set_option("-d")
+        cs.compile_orc("""
+sr = 44100
+ksmps = 32
+nchnls = 2
+0dbfs = 1
+
+instr 1
+    asig oscil 0.5, 440
+    outs asig, asig
+endin
+""")
+        cs.read_score("i1 0 10")
+        cs.start()
+        out = array.array(typecode, bytes(cycsound.get_size_of_myflt() * 10 * 32 * 2))
+        assert cs.perform_ksmps_n(10, out) == 10
+        assert any(out)
+        assert out[-2] == cs.get_spout_sample(31, 0)
+        assert cs.perform_ksmps_n(5) == 5
+        with pytest.raises(ValueError):
+            cs.perform_ksmps_n(20, out)
+
+
+def test_buffer_views():
+    """Test zero-copy views of spin and spout."""
+    with cycsound.Csound() as cs:
+        cs.set_host_implemented_audio_io(1, 0)
+        cs.set_option("-n")
+        cs.set_option("-d")
+        cs.compile_orc("""
+sr = 44100
+ksmps = 32
+nchnls = 2
+0dbfs = 1
+
+instr 1
+    ain inch 1
+    outs ain * 0.5, ain
+endin
+""")
+        cs.read_score("i1 0 1")
+        cs.start()
+        spin = memoryview(cs.spin_view())
+        spout = memoryview(cs.spout_view())
+        assert spout.shape == (32, 2)
+        assert spout.readonly
+        assert not spin.readonly
+        spin[3, 0] = 0.25
+        cs.perform_ksmps()
+        assert spout[3, 1] == cs.get_spout_sample(3, 1) == 0.25
+        assert spout[3, 0] == 0.125
+        with pytest.raises(BufferError):
+            cs.reset()
+        spin.release()
+        spout.release()
+        view = cs.spout_view()
+        cs.reset()
+        assert not view.valid
+        with pytest.raises(ValueError):
+            memoryview(view)
+
+
+def test_render_to_array():
+    """Test rendering a score into a numpy array."""
+    np = pytest.importorskip("numpy")
+    orc = """
+sr = 44100
+ksmps = 32
+nchnls = 2
+0dbfs = 1
+
+instr 1
+    asig oscil 0.5, 440
+    outs asig, asig
+endin
+"""
+    with cycsound.Csound() as cs:
+        cs.set_option("-d")
+        cs.compile_orc(orc)
+        cs.read_score("i1 0 1.5")
+        out, sr = cs.render_to_array()
+        assert sr == 44100
+        assert out.shape[1] == 2
+        assert out.shape[0] >= 1.5 * 44100
+        assert np.abs(out).max() == pytest.approx(0.5, abs=1e-3)
+
+    with cycsound.Csound() as cs:
+        cs.set_option("-d")
+        cs.compile_orc(orc)
+        cs.read_score("i1 0 10")
+        out, sr = cs.render_to_array(duration=0.5, dtype=np.float32)
+        assert out.dtype == np.float32
+        assert out.shape == (int(0.5 * 44100 / 32 + 0.5) * 32, 2)
+
+    with cycsound.Csound() as cs:
+        cs.compile_orc(orc)
+        cs.read_score("i1 0 0.1")
+        with pytest.raises(ValueError):
+            cs.render_to_array(duration=-1)
+        out, sr = cs.render_to_array(duration=5)
+        assert out.base is None  # trimmed copy, not a view of 5 s
+        assert out.shape[0] < 44100
+
+
+def test_render_to_file(tmp_path):
+    """Test rendering a score through the in-process sound file writer."""
+    orc = """
+sr = 44100
+ksmps = 32
+nchnls = 2
+0dbfs = 2
+
+instr 1
+    asig oscil 1, 440
+    outs asig, asig
+endin
+"""
+    path = tmp_path / "out.wav"
+    with cycsound.Csound() as cs:
+        cs.set_option("-d")
+        cs.compile_orc(orc)
+        cs.read_score("i1 0 10")
+        frames = cs.render_to_file(path, duration=0.5, sample_type="int16")
+        assert frames == int(0.5 * 44100 / 32 + 0.5) * 32
+
+    with wave.open(str(path)) as w:
+        assert w.getnchannels() == 2
+        assert w.getsampwidth() == 2
+        assert w.getframerate() == 44100
+        assert w.getnframes() == frames
+        samples = array.array("h", w.readframes(frames))
+    # 0dbfs = 2: amplitude 1 is written at half scale
+    assert max(samples) == pytest.approx(16383, abs=20)
+
+    path = tmp_path / "out.w64"
+    with cycsound.Csound() as cs:
+        cs.set_option("-d")
+        cs.compile_orc(orc)
+        cs.read_score("i1 0 0.1")
+        frames = cs.render_to_file(path, sample_type="float32")
+    data = path.read_bytes()
+    assert data[:4] == b"riff"
+    assert struct.unpack("<Q", data[16:24])[0] == len(data)
+
+
+def test_sound_file_writer(tmp_path):
+    """Test sample conversion, RF64 headers and errors of SoundFileWriter."""
+    typecode = "d" if cycsound.get_size_of_myflt() == 8 else "f"
+    block = array.array(typecode, [0.5, -0.5, 1.5, -2.0])
+    path = tmp_path / "out.rf64"
+    with cycsound.SoundFileWriter(path, 48000, 2, sample_type="int24",
+                                  buffer_size=5) as w:
+        w.write(block)
+        assert w.format == "rf64"
+        assert w.frames == 2
+    data = path.read_bytes()
+    assert data[:4] == b"RF64" and data[12:16] == b"ds64"
+    riff, size, frames = struct.unpack("<QQQ", data[20:44])
+    assert (riff, size, frames) == (len(data) - 8, 12, 2)
+    assert data[-12:] == bytes.fromhex("000040" "0000c0" "ffff7f" "010080")
+
+    with pytest.raises(ValueError):
+        w.write(block)
+    with pytest.raises(ValueError):
+        cycsound.SoundFileWriter(tmp_path / "out.mp3", 48000, 2, format="mp3")
+    with cycsound.SoundFileWriter(tmp_path / "out.aiff", 48000, 2) as w:
+        with pytest.raises(ValueError):
+            w.write(block[:3])
+
+
+def test_iter_blocks():
+    """Test streaming a performance block by block."""
+    with cycsound.Csound() as cs:
+        cs.set_host_implemented_audio_io(1, 0)
+        cs.set_option("-d")
+        cs.compile_orc("""
+sr = 44100
+ksmps = 32
+nchnls = 2
+0dbfs = 1
+
+instr 1
+    asig oscil 0.5, 440
+    outs asig, asig
+endin
+""")
+        cs.read_score("i1 0 0.1")
+        cs.start()
+        blocks = []
+        for block in cs.iter_blocks(frames=100, ring=3):
+            assert block.readonly
+            assert block.shape[1] == 2
+            blocks.append(block.shape[0])
+        assert blocks[0] == 128
+        assert all(n <= 128 for n in blocks)
+        assert sum(blocks) >= 0.1 * 44100
+
+
+def test_control_channel():
+    """Test cached control channel handles."""
+    with cycsound.Csound() as cs:
+        cs.set_option("-n")
+        cs.set_option("-d")
+        cs.compile_orc("""
+sr = 44100
+ksmps = 32
+nchnls = 2
+0dbfs = 1
+
+chn_k "amp", 3
+""")
+        cs.start()
+        amp = cs.control_channel("amp")
+        amp.value = 0.25
+        assert cs.control_channel("amp").value == pytest.approx(0.25)
+        cs.set_control_channel("amp", 0.75)
+        assert amp.value == pytest.approx(0.75)
+        assert float(amp) == pytest.approx(0.75)
+        assert amp.name == "amp"
+
+        cs.reset()
+        assert not amp.valid
+        with pytest.raises(ValueError):
+            amp.value
+
+
+def test_control_channels_bulk():
+    """Test setting and reading control channels in bulk."""
+    with cycsound.Csound() as cs:
+        cs.set_option("-n")
+        cs.set_option("-d")
+        cs.compile_orc("sr = 44100\nksmps = 32\nnchnls = 2\n0dbfs = 1\n")
+        # stored directly before start()
+        cs.set_control_channels({"amp": 0.2})
+        assert cs.get_control_channel("amp") == pytest.approx(0.2)
+        cs.start()
+        freq = cs.control_channel("freq")
+        cs.set_control_channels(["amp", freq, "pan"], [0.5, 440, 0.25])
+        # ... and at the start of the next k-cycle once started
+        assert cs.get_control_channel("amp") == pytest.approx(0.2)
+        cs.perform_ksmps()
+        values = cs.get_control_channels(["amp", "freq", "pan"])
+        assert list(values) == pytest.approx([0.5, 440, 0.25])
+
+        cs.set_control_channels({"amp": 0.1, "pan": 0.9})
+        cs.perform_ksmps()
+        assert freq.value == pytest.approx(440)
+        assert list(cs.get_control_channels({"amp": 0, "pan": 0})) == pytest.approx([0.1, 0.9])
+
+        with pytest.raises(ValueError):
+            cs.set_control_channels(["amp", "pan"], [0.1])
+
+
+def test_audio_channel():
+    """Test audio channel handles."""
+    with cycsound.Csound() as cs:
+        cs.set_host_implemented_audio_io(1, 0)
+        cs.set_option("-d")
+        cs.compile_orc("""
+sr = 44100
+ksmps = 32
+nchnls = 1
+0dbfs = 1
+
+instr 1
+    asig chnget "in"
+    chnset asig * 2, "out"
+endin
+""")
+        cs.read_score("i1 0 1")
+        cs.start()
+        src = cs.audio_channel("in", cycsound.ChannelType.INPUT)
+        dst = cs.audio_channel("out", cycsound.ChannelType.OUTPUT)
+        assert src.shape == (32,)
+
+        block = array.array("d" if cycsound.get_size_of_myflt() == 8 else "f",
+                            [i / 64 for i in range(32)])
+        src.write_from(block)
+        cs.perform_ksmps()
+        out = dst.read_into()
+        assert list(out) == pytest.approx([2 * x for x in block])
+
+        with src:
+            view = memoryview(src)
+            view[0] = 0.5
+            view.release()
+        assert src.read_into()[0] == pytest.approx(0.5)
+
+
+def test_score_events():
+    """Test numeric score events."""
+    with cycsound.Csound() as cs:
+        cs.set_host_implemented_audio_io(1, 0)
+        cs.set_option("-d")
+        cs.compile_orc("""
+sr = 44100
+ksmps = 32
+nchnls = 1
+0dbfs = 1
+
+instr 1
+    out oscil(p4, p5)
+endin
+""")
+        cs.start()
+        assert cs.score_event("i", [1, 0, 0.1, 0.25, 440]) == 0
+        events = [[1, 0.1 * i, 0.1, 0.25, 220 * (i + 1)] for i in range(8)]
+        assert cs.score_events("i", events) == 0
+        with pytest.raises(ValueError):
+            cs.score_events("i", [[1, 0, 1], [1, 0]])
+        with pytest.raises(ValueError):
+            cs.score_event("ii", [1, 0, 1])
+        # buffers of other item types are converted
+        assert cs.score_event("i", array.array("i", [1, 0, 1, 0, 110])) == 0
+        assert cs.score_events("i", memoryview(
+            array.array("f", [1, 0.5, 0.1, 0.25, 440] * 2)).cast("B").cast("f", (2, 5))) == 0
+        cs.perform_ksmps_n(100)
+        assert cs.get_score_time() > 0
+
+
+def test_message_ring():
+    """Test collecting messages through the message ring."""
+    with cycsound.Csound() as cs:
+        cs.create_message_ring(types=[cycsound.Msg.ORCH])
+        cs.set_option("-n")
+        cs.set_option("-d")
+        cs.compile_orc("""
+sr = 44100
+ksmps = 32
+nchnls = 2
+0dbfs = 1
+
+instr 1
+    printks "tick %d\\n", 0.01, timeinstk()
+endin
+""")
+        cs.read_score("i1 0 0.1")
+        cs.run()
+        messages = cs.drain_messages()
+        assert messages
+        assert all(attr & 0x7000 == cycsound.Msg.ORCH.value for attr, _ in messages)
+        assert any("tick" in text for _, text in messages)
+        stats = cs.get_message_ring_stats()
+        assert stats["received"] == len(messages)
+        assert stats["filtered"] > 0
+        assert stats["pending"] == 0
+        assert cs.drain_messages(packed=True) == b""
+
+
+def test_tables():
+    """Test function table views and bulk copies."""
+    typecode = "d" if cycsound.get_size_of_myflt() == 8 else "f"
+    with cycsound.Csound() as cs:
+        cs.set_option("-n")
+        cs.set_option("-d")
+        cs.compile_orc("""
+sr = 44100
+ksmps = 32
+nchnls = 2
+0dbfs = 1
+
+gitab ftgen 1, 0, 1024, 10, 1
+""")
+        cs.start()
+        table = cs.table(1)
+        assert len(table) == 1024
+        assert len(cs.table(1, guard_point=True)) == 1025
+
+        src = array.array(typecode, [i / 1024 for i in range(1024)])
+        cs.table_write(1, src)
+        view = memoryview(table)
+        assert view[10] == pytest.approx(10 / 1024)
+        view[10] = 0.5
+        view.release()
+        out = cs.table_read(1)
+        assert out[10] == pytest.approx(0.5)
+        assert out[11] == pytest.approx(11 / 1024)
+
+        with pytest.raises(ValueError):
+            cs.table_write(1, array.array(typecode, [0.0] * 10))
+        with pytest.raises(ValueError):
+            cs.table(99)
+
+        cs.table_write_async(1, array.array(typecode, [0.25] * 1024))
+        cs.perform_ksmps()
+        assert cs.table_get(1, 0) == pytest.approx(0.25)
+
+
+def test_csound_pool():
+    """Test recycling instances through a CsoundPool."""
+    orc = "sr = 44100\nksmps = 32\nnchnls = 2\n0dbfs = 1\ninstr 1\nendin\n"
+    with cycsound.CsoundPool(options=["-n", "-d"], max_size=2, prewarm=1) as pool:
+        assert pool.stats()["idle"] == 1
+        with pool.instance() as cs:
+            assert cs.compile_orc(orc) == 0
+        first = pool.stats()
+        assert first["hits"] == 1 and first["resets"] == 1
+
+        cs = pool.checkout()
+        other = pool.checkout()
+        with pytest.raises(TimeoutError):
+            pool.checkout(timeout=0.01)
+        pool.checkin(other, discard=True)
+        pool.checkin(cs)
+
+        stats = pool.stats()
+        assert stats["misses"] == 1
+        assert stats["discarded"] == 1
+        assert stats["idle"] == 1 and stats["in_use"] == 0
+        assert stats["mean_create_time"] > 0
+
+
+def test_parse_and_compile_tree():
+    """Test parse_orc() trees and the orchestra cache."""
+    orc = "instr 1\n    out oscil(0.1, 440)\nendin\n"
+    with cycsound.Csound() as cs:
+        cs.set_option("-n")
+        cs.set_option("-d")
+        tree = cs.parse_orc(orc)
+        assert isinstance(tree, cycsound.Tree)
+        assert tree.valid
+        assert cs.compile_tree(tree) == 0
+        cs.delete_tree(tree)
+        assert not tree.valid
+        with pytest.raises(ValueError):
+            cs.compile_tree(tree)
+
+        cs.enable_orc_cache(max_entries=2)
+        for _ in range(3):
+            assert cs.compile_orc(orc) == 0
+        assert cs.compile_orc_async(orc) == 0
+        stats = cs.get_orc_cache_stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 3
+        assert stats["entries"] == 1
+
+        cs.reset()
+        assert cs.get_orc_cache_stats()["entries"] == 0
+
+
+def test_cycle_stats():
+    """Test k-cycle timing statistics."""
+    with cycsound.Csound() as cs:
+        cs.set_option("-n")
+        cs.set_option("-d")
+        cs.compile_orc("""
+sr = 44100
+ksmps = 4096
+nchnls = 2
+0dbfs = 1
+
+instr 1
+    aout oscili 0.1, 440
+    outs aout, aout
+endin
+""")
+        cs.read_score("i1 0 10")
+        cs.start()
+        cs.perform_ksmps()
+        assert cs.get_cycle_stats()["count"] == 0
+
+        cs.enable_cycle_stats()
+        for _ in range(10):
+            cs.perform_ksmps()
+        cs.perform_ksmps_n(20)
+        stats = cs.get_cycle_stats()
+        assert stats["enabled"]
+        assert stats["count"] == 30
+        assert stats["budget"] == pytest.approx(4096 / 44100)
+        assert 0.0 <= stats["min"] <= stats["mean"] <= stats["max"]
+        assert sum(count for _, count in stats["histogram"]) == 30
+
+        # every k-cycle (4096 samples) misses a one nanosecond deadline
+        cs.reset_cycle_stats()
+        cs.enable_cycle_stats(budget=1e-9)
+        cs.perform_ksmps_n(5)
+        stats = cs.get_cycle_stats()
+        assert stats["count"] == 5
+        assert stats["misses"] == 5
+
+        # a uniform sample of the k-cycle durations
+        cs.enable_cycle_stats(samples=8)
+        cs.perform_ksmps_n(3)
+        assert len(cs.get_cycle_times()) == 3
+        cs.perform_ksmps_n(20)
+        times = cs.get_cycle_times()
+        assert len(times) == 8
+        assert all(0.0 <= t <= cs.get_cycle_stats()["max"] for t in times)
+
+        cs.enable_cycle_stats(False)
+        cs.perform_ksmps()
+        assert cs.get_cycle_stats()["count"] == 28
+
+
+def test_circular_buffer():
+    """Test bulk and blocking transfers through a CircularBuffer."""
+    import threading
+    import time
+
+    typecode = "d" if cycsound.get_size_of_myflt() == 8 else "f"
+    cs = cycsound.Csound()
+    ring = cs.circular_buffer(8)
+    assert ring.size == 8
+    assert ring.write(array.array(typecode, range(10))) == 8
+    assert list(ring.peek(3)) == [0.0, 1.0, 2.0]
+    assert list(ring.read(5)) == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert list(ring.read(10)) == [5.0, 6.0, 7.0]
+    assert len(ring.read(2, timeout=0.01)) == 0
+
+    def producer():
+        for i in range(4):
+            time.sleep(0.01)
+            ring.write(array.array(typecode, [i] * 3))
+
+    thread = threading.Thread(target=producer)
+    thread.start()
+    data = ring.read(12, timeout=5)
+    thread.join()
+    assert list(data) == [i for i in range(4) for _ in range(3)]
+
+    raw = cs.circular_buffer(4, itemsize=2)
+    assert raw.write(b"abcdef") == 3
+    assert raw.read(4) == bytearray(b"abcdef")
+    with pytest.raises(ValueError):
+        raw.write(b"abc")
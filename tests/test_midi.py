@@ -17,9 +17,11 @@ import os, sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 
+import array
 from random import randint
 
 import cycsound
+import pytest
 
 
 def midi2pch(num):
@@ -89,3 +91,82 @@ def test_midi():
       pass
 
     c.stop()
+
+
+def test_midi_input_queue():
+    c = cycsound.Csound()
+    c.set_option("-n")
+    c.set_option("-d")
+    queue = c.midi_input_queue(size=1024)
+    c.compile_orc("""
+sr=44100
+ksmps=32
+nchnls=2
+0dbfs=1
+
+massign 0, 1
+gicount init 0
+
+instr 1
+gicount = gicount + 1
+chnset gicount, "count"
+chnset notnum(), "note"
+chnset veloc(), "velocity"
+endin""")
+    c.start()
+    assert queue.opened
+    # three note-ons with running status, in one push
+    assert queue.push(bytes([0x90, 60, 100, 64, 90, 67, 80])) == 7
+    for _ in range(4):
+        c.perform_ksmps()
+    assert c.get_control_channel("count") == 3
+    assert c.get_control_channel("note") in (60, 64, 67)
+    stats = queue.get_stats()
+    assert stats["pushed"] == stats["delivered"] == 7
+    assert queue.pending == 0
+    assert queue.push(bytes(2000)) == 0
+    assert queue.get_stats()["dropped"] == 2000
+    with pytest.raises(TypeError):
+        queue.push(array.array("i", [0x90, 60, 100]))
+    c.cleanup()
+
+
+def test_midi_output_capture(tmp_path):
+    c = cycsound.Csound()
+    c.set_option("-n")
+    c.set_option("-d")
+    capture = c.midi_output_capture()
+    c.compile_orc("""
+sr=44100
+ksmps=32
+nchnls=2
+0dbfs=1
+
+instr 1
+noteon 1, p4, 100
+endin""")
+    c.read_score("i1 0 0.1 60\ni1 0.5 0.1 64")
+    c.start()
+    assert capture.opened
+    while c.perform_ksmps() == 0:
+        pass
+    events = [(t, data) for t, data in capture.drain() if data[0] == 0x90]
+    assert [data[1:] for _, data in events] == [bytes([60, 100]), bytes([64, 100])]
+    assert events[0][0] == 0
+    assert events[1][0] == pytest.approx(0.5 * 44100, abs=32)
+    assert capture.get_stats()["dropped"] == 0
+    c.cleanup()
+
+    path = tmp_path / "out.mid"
+    assert capture.write_midi_file(path, events, ticks_per_beat=480, bpm=60) == 2
+    data = path.read_bytes()
+    assert data[:4] == b"MThd" and data[14:18] == b"MTrk"
+    # second note-on half a second (240 ticks) after the first
+    assert bytes([0x81, 0x70, 0x90, 64, 100]) in data
+
+    # system common messages are kept as escape events, real-time skipped
+    events = [(0, bytes([0xf2, 0x10, 0x02])), (0, bytes([0xf8])), (0, bytes([0xf3, 5]))]
+    assert capture.write_midi_file(path, events) == 2
+    data = path.read_bytes()
+    assert bytes([0x00, 0xf7, 3, 0xf2, 0x10, 0x02, 0x00, 0xf7, 2, 0xf3, 5]) in data
+    assert 0xf8 not in data[22:]
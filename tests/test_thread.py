@@ -43,3 +43,133 @@ def test_thread():
     t.join()
     c.stop()
     c.cleanup()
+
+
+@pytest.mark.skipif(not hasattr(cycsound, 'CsoundPerformanceThread'),
+                    reason="requires the CsoundPerformanceThread class")
+def test_thread_events():
+    c = cycsound.Csound()
+    c.set_option("-n")
+    c.set_option("-d")
+    c.compile_orc(orc)
+    c.start()
+    amp = c.control_channel("amp")
+    t = cycsound.CsoundPerformanceThread(c)
+    assert t.is_running()
+    t.play()
+    t.score_event(False, "i", [1, 0, 0.1])
+    t.input_message("i1 0 0.1")
+    t.flush_message_queue()
+    t.stop()
+    assert t.join() > 0
+    assert not t.is_running()
+    # the performance thread cleaned up the instance
+    assert not amp.valid
+
+
+def test_async_csound():
+    import asyncio
+
+    async def main():
+        c = cycsound.Csound()
+        c.set_option("-n")
+        c.set_option("-d")
+        ac = cycsound.AsyncCsound(c, watch=["pos"], messages=True)
+        c.compile_orc(orc + """
+instr 2
+kpos timeinsts
+chnset kpos, "pos"
+prints "done\\n"
+endin""")
+        c.read_score("i2 0 0.5")
+        task = asyncio.create_task(ac.perform())
+        assert await ac.wait_until(0.25)
+        assert c.get_score_time() >= 0.25
+        changes = []
+        async for change in ac.channel_changes():
+            changes.append(change["pos"])
+        assert changes and changes == sorted(changes)
+        assert await task > 0
+        assert ac.finished
+        assert not await ac.wait_until(10)
+        messages = [m async for m in ac.messages()]
+        assert any("done" in m for m in messages)
+
+    asyncio.run(main())
+
+
+def test_csound_group():
+    import array
+    typecode = "d" if cycsound.get_size_of_myflt() == 8 else "f"
+    instances = []
+    for amp in (0.1, 0.2, 0.3):
+        c = cycsound.Csound()
+        c.set_option("-n")
+        c.set_option("-d")
+        c.compile_orc(f"""
+sr=44100
+ksmps=32
+nchnls=2
+0dbfs=1
+
+instr 1
+aout = {amp}
+outs aout, -aout
+endin""")
+        c.read_score(f"i1 0 {amp}")
+        c.start()
+        instances.append(c)
+
+    with cycsound.CsoundGroup(instances, cycles_per_step=4) as group:
+        assert len(group) == 3
+        assert group.nchnls == 2
+        assert group.frames_per_step == 128
+        out = array.array(typecode, [0.0] * (10 * 128 * 2))
+        assert group.perform(10, out) == 10
+        assert out[0] == pytest.approx(0.6)
+        assert out[1] == pytest.approx(-0.6)
+        group.perform(1000)
+        assert group.finished
+
+    with pytest.raises(ValueError):
+        cycsound.CsoundGroup([instances[0], instances[0]])
+    with pytest.raises(ValueError):
+        cycsound.CsoundGroup(instances[:1], routing=[[0, 2]])
+
+
+def test_ring_audio():
+    c = cycsound.Csound()
+    c.set_option("-odac")
+    c.set_option("-d")
+    audio = c.ring_audio(frames=4096)
+    c.compile_orc("""
+sr=44100
+ksmps=32
+nchnls=2
+0dbfs=1
+
+instr 1
+aout = 0.25
+outs aout, -aout
+endin""")
+    c.read_score("i1 0 0.1")
+    assert audio.output_channels == 0
+    c.start()
+    assert audio.playing
+    assert audio.output_channels == 2
+    t = cycsound.CsoundPerformanceThread(c)
+    t.play()
+    blocks = []
+    while True:
+        block = audio.read(256, timeout=2.0)
+        if not block:
+            break
+        blocks.append(block)
+    assert t.join() > 0
+    assert not audio.playing
+    frames = sum(len(b) for b in blocks) // 2
+    stats = audio.get_stats()
+    assert frames == stats["played"] >= 4410
+    assert stats["overruns"] == 0
+    assert blocks[0][0] == pytest.approx(0.25)
+    assert blocks[0][1] == pytest.approx(-0.25)